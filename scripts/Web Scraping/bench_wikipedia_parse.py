@@ -0,0 +1,130 @@
+"""
+Benchmark the Wikipedia infobox extraction over saved article pages.
+
+Compares the targeted parser in wikipedia_fallback.py with the old full-page
+BeautifulSoup parse (html.parser, and lxml when installed), checks that they
+extract the same CAS numbers and names, and prints per-page timings.
+
+    python bench_wikipedia_parse.py fixtures/
+    python bench_wikipedia_parse.py saved/ --save Fentanyl Carfentanil Acetylfentanyl
+    python bench_wikipedia_parse.py saved/ --repeat 20 --json report.json
+
+fixtures/ ships four synthetic Wikipedia-layout pages (see fixtures/README.md).
+They check that the parsers agree, but their timings say nothing about real
+articles. `--save` downloads the named articles into the directory first;
+after that the benchmark runs offline on real pages.
+"""
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+import requests
+
+from wikipedia_fallback import article_url, parse_infobox
+
+
+def bs4_parser(features: str):
+    try:
+        from bs4 import BeautifulSoup, FeatureNotFound
+    except ImportError:
+        return None
+
+    def parse(html):
+        soup = BeautifulSoup(html, features)
+        infobox = soup.find('table', {'class': 'infobox'})
+        if not infobox:
+            return None
+        cas_number = "N/A"
+        synonyms = []
+        for row in infobox.find_all('tr'):
+            header = row.find('th')
+            cell = row.find('td')
+            if header and cell:
+                if 'CAS Number' in header.text:
+                    cas_number = cell.text.strip()
+                if 'Other names' in header.text:
+                    synonyms = cell.text.strip().split(', ')
+        return cas_number, synonyms
+
+    try:
+        BeautifulSoup("<p></p>", features)
+    except FeatureNotFound:
+        return None
+    return parse
+
+
+def save_pages(directory: Path, substance_names):
+    directory.mkdir(parents=True, exist_ok=True)
+    for name in substance_names:
+        response = requests.get(article_url(name), timeout=30)
+        response.raise_for_status()
+        path = directory / f"{name.replace(' ', '_')}.html"
+        path.write_text(response.text, encoding="utf-8")
+        print(f"Saved {path} ({len(response.text) // 1024} KB)")
+
+
+def time_parser(parse, html: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        parse(html)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Wikipedia infobox extraction over saved pages.")
+    parser.add_argument("fixtures", help="Directory of saved article .html pages")
+    parser.add_argument("--save", nargs="+", metavar="NAME", help="Download these articles into the directory first")
+    parser.add_argument("--repeat", type=int, default=10, help="Parses per page (median is reported)")
+    parser.add_argument("--json", default=None, help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    directory = Path(args.fixtures)
+    if args.save:
+        save_pages(directory, args.save)
+    pages = sorted(directory.glob("*.html"))
+    if not pages:
+        parser.error(f"no .html pages in {directory}")
+
+    parsers = {"targeted": parse_infobox}
+    for name, features in (("bs4 html.parser", "html.parser"), ("bs4 lxml", "lxml")):
+        parse = bs4_parser(features)
+        if parse is None:
+            print(f"⚠️ {name} not available, skipped")
+        else:
+            parsers[name] = parse
+
+    report = {"repeat": args.repeat, "pages": []}
+    totals = dict.fromkeys(parsers, 0.0)
+    for page in pages:
+        html = page.read_text(encoding="utf-8")
+        expected = parse_infobox(html)
+        entry = {"page": page.name, "kb": len(html) // 1024, "result": expected, "median_ms": {}, "mismatches": []}
+        for name, parse in parsers.items():
+            seconds = time_parser(parse, html, args.repeat)
+            totals[name] += seconds
+            entry["median_ms"][name] = round(seconds * 1000, 3)
+            if parse(html) != expected:
+                entry["mismatches"].append(name)
+        report["pages"].append(entry)
+        timings = "  ".join(f"{name} {ms:.2f} ms" for name, ms in entry["median_ms"].items())
+        flag = f"  ❌ differs: {', '.join(entry['mismatches'])}" if entry["mismatches"] else ""
+        print(f"{page.name} ({entry['kb']} KB): {timings}{flag}")
+
+    report["total_ms"] = {name: round(seconds * 1000, 3) for name, seconds in totals.items()}
+    baseline = totals.get("bs4 html.parser")
+    if baseline:
+        report["speedup_vs_html_parser"] = round(baseline / totals["targeted"], 1)
+    print("Total: " + "  ".join(f"{name} {ms:.1f} ms" for name, ms in report["total_ms"].items()))
+    if "speedup_vs_html_parser" in report:
+        print(f"✅ targeted parser is {report['speedup_vs_html_parser']}x faster than bs4 html.parser")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Persistent HTTP response cache for the scraper fetches.
+
+Responses are stored on disk keyed by method + URL (+ POST body). A stored
+response younger than `max_age` is returned without touching the network;
+an older one is revalidated with If-None-Match / If-Modified-Since, and a 304
+refreshes it in place. Once the cache grows past `max_bytes` the least
+recently used entries are evicted.
+
+    from http_cache import cached_get
+    response = cached_get("https://pubchem.ncbi.nlm.nih.gov/rest/pug_view/index/compound/3345/JSON")
+
+Settings: SCRAPER_CACHE_DIR, SCRAPER_CACHE_MAX_AGE (seconds), SCRAPER_CACHE_MAX_BYTES;
+SCRAPER_CACHE_MAX_AGE=0 always revalidates.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+CACHE_DIR = Path(os.getenv("SCRAPER_CACHE_DIR", REPO_ROOT / "Data" / ".cache" / "http"))
+CACHE_MAX_AGE = float(os.getenv("SCRAPER_CACHE_MAX_AGE", str(7 * 24 * 3600)))
+CACHE_MAX_BYTES = int(os.getenv("SCRAPER_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Response headers kept with each entry (validators + what callers read back)
+_KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+class HttpCache:
+    def __init__(self, directory: Path = CACHE_DIR, max_age: float = CACHE_MAX_AGE, max_bytes: int = CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._sizes: Optional[Dict[str, int]] = None  # key -> body bytes, loaded on first store
+
+    @staticmethod
+    def key(method: str, url: str, data=None) -> str:
+        body = json.dumps(data, sort_keys=True) if data else ""
+        return hashlib.sha256(f"{method.upper()} {url}\n{body}".encode("utf-8")).hexdigest()
+
+    def request(self, session: requests.Session, method: str, url: str, data=None,
+                before_network: Optional[Callable[[], None]] = None, **kwargs) -> requests.Response:
+        """
+        session.request(...) behind the cache. `before_network` runs right before a
+        request actually goes out (e.g. a rate limiter), never on a fresh hit.
+        Cached responses carry `from_cache = True`.
+        """
+        key = self.key(method, url, data)
+        entry = self._load(key)
+        if entry is not None and time.time() - entry["stored_at"] < self.max_age:
+            self.hits += 1
+            return self._response(key, entry)
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry is not None:
+            if entry["headers"].get("ETag"):
+                headers["If-None-Match"] = entry["headers"]["ETag"]
+            if entry["headers"].get("Last-Modified"):
+                headers["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+        if before_network is not None:
+            before_network()
+        response = session.request(method, url, data=data, headers=headers, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            self.revalidated += 1
+            entry["stored_at"] = time.time()
+            self._write_meta(key, entry)
+            return self._response(key, entry)
+        self.misses += 1
+        if response.status_code == 200:
+            self._store(key, url, response)
+        return response
+
+    def get(self, session: requests.Session, url: str, **kwargs) -> requests.Response:
+        return self.request(session, "GET", url, **kwargs)
+
+    # ---------- Storage ----------
+    def _paths(self, key: str):
+        folder = self.directory / key[:2]
+        return folder / f"{key}.json", folder / f"{key}.body"
+
+    def _load(self, key: str) -> Optional[dict]:
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, encoding="utf-8") as handle:
+                entry = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        return entry if body_path.exists() else None
+
+    def _response(self, key: str, entry: dict) -> requests.Response:
+        _, body_path = self._paths(key)
+        response = requests.Response()
+        response._content = body_path.read_bytes()
+        response.status_code = 200
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response.url = entry["url"]
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.from_cache = True
+        os.utime(body_path)  # recency for LRU eviction
+        return response
+
+    def _write_meta(self, key: str, entry: dict):
+        meta_path, _ = self._paths(key)
+        _atomic_write(meta_path, json.dumps(entry).encode("utf-8"))
+
+    def _store(self, key: str, url: str, response: requests.Response):
+        meta_path, body_path = self._paths(key)
+        body_path.parent.mkdir(parents=True, exist_ok=True)
+        _atomic_write(body_path, response.content)
+        self._write_meta(key, {
+            "url": url,
+            "stored_at": time.time(),
+            "headers": {name: response.headers[name] for name in _KEPT_HEADERS if name in response.headers},
+        })
+        with self._lock:
+            sizes = self._entry_sizes()
+            sizes[key] = len(response.content)
+            if sum(sizes.values()) > self.max_bytes:
+                self._evict(sizes)
+
+    def _entry_sizes(self) -> Dict[str, int]:
+        if self._sizes is None:
+            self._sizes = {path.stem: path.stat().st_size for path in self.directory.glob("*/*.body")}
+        return self._sizes
+
+    def _evict(self, sizes: Dict[str, int]):
+        # Least recently used first (body mtime is bumped on every hit), down to 90% of the budget
+        by_recency = sorted(sizes, key=lambda key: _mtime(self._paths(key)[1]))
+        total = sum(sizes.values())
+        for key in by_recency:
+            if total <= self.max_bytes * 0.9:
+                break
+            for path in self._paths(key):
+                path.unlink(missing_ok=True)
+            total -= sizes.pop(key)
+
+
+def _atomic_write(path: Path, content: bytes):
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_bytes(content)
+    os.replace(tmp_path, path)
+
+
+def _mtime(path: Path) -> float:
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return 0.0
+
+
+_default_cache = None
+_default_session = None
+
+
+def default_cache() -> HttpCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = HttpCache()
+    return _default_cache
+
+
+def cached_get(url: str, session: Optional[requests.Session] = None, **kwargs) -> requests.Response:
+    """Drop-in for requests.get(url) through the default cache (and one shared session)."""
+    global _default_session
+    if session is None:
+        if _default_session is None:
+            _default_session = requests.Session()
+        session = _default_session
+    return default_cache().get(session, url, **kwargs)
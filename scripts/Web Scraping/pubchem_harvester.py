@@ -0,0 +1,327 @@
+"""
+Concurrent PubChem harvester.
+
+Looks substances up on PubChem PUG REST from a thread pool that shares one
+pooled requests.Session. A token bucket keeps the whole pool under PubChem's
+5 requests/second guideline, and throttled or failed requests (429/5xx,
+timeouts) are retried with exponential backoff. Names are resolved to CIDs one
+request each (PUG REST takes one name per request); properties and synonyms are
+then fetched for up to CID_BATCH_SIZE CIDs per POST. Responses go through the
+on-disk HTTP cache (http_cache.py), so a re-run only spends the rate limit on
+lookups it has not seen. Results are appended to an NDJSON file batch by batch,
+so an interrupted run resumes where it stopped.
+
+    python pubchem_harvester.py substances.txt --output harvest.ndjson
+    python pubchem_harvester.py substances.csv --column "Substance Name" --output harvest.ndjson --workers 8
+    python pubchem_harvester.py substances.txt --output harvest.ndjson --base-url http://127.0.0.1:8999/rest/pug
+
+`--base-url` points the harvester at another PUG REST host, e.g. a local stub server
+(test_pubchem_harvester.py runs one in a thread).
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import quote
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from http_cache import HttpCache, default_cache
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "ui"))  # CAS validation shared with the backend
+from cas_number import find_cas  # noqa: E402
+
+PUBCHEM_BASE_URL = "https://pubchem.ncbi.nlm.nih.gov/rest/pug"
+PUBCHEM_COMPOUND_URL = "https://pubchem.ncbi.nlm.nih.gov/compound"
+# Synonym citations follow the workbook's convention (name/{CAS}), whatever host was queried
+PUBCHEM_SYNONYM_SOURCE = PUBCHEM_BASE_URL + "/compound/name/{cas}/synonyms/JSON"
+PUBCHEM_RATE = 5.0  # requests per second, PubChem's usage policy
+PROPERTIES = "IUPACName,MolecularFormula,MolecularWeight,CanonicalSMILES,IsomericSMILES"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+CID_BATCH_SIZE = 100  # CIDs per property/synonym POST
+
+
+class HarvestError(Exception):
+    """A request still failing after every retry."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket: acquire() blocks until a request may be sent."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class PubChemClient:
+    """
+    PUG REST client: pooled session, shared rate limit, retries with backoff.
+    `cache` defaults to the shared on-disk HTTP cache; pass cache=False to always hit the network.
+    """
+
+    def __init__(self, base_url: str = PUBCHEM_BASE_URL, rate: float = PUBCHEM_RATE, max_retries: int = 4,
+                 backoff: float = 0.5, timeout: float = 30, pool_size: int = 16, cache=None):
+        self.base_url = base_url.rstrip("/")
+        self.bucket = TokenBucket(rate)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.cache: Optional[HttpCache] = default_cache() if cache is None else (cache or None)
+        self.request_count = 0  # requests that actually went out (cache hits are free)
+
+    def get_json(self, path: str) -> Optional[dict]:
+        """GET base_url + path; None when PubChem has no such record (404/400)."""
+        return self._request_json("GET", path)
+
+    def post_json(self, path: str, data: dict) -> Optional[dict]:
+        """POST form data (e.g. a long `cid` list) to base_url + path."""
+        return self._request_json("POST", path, data)
+
+    def _request_json(self, method: str, path: str, data: Optional[dict] = None) -> Optional[dict]:
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        for attempt in range(self.max_retries + 1):
+            try:
+                if self.cache is not None:
+                    response = self.cache.request(self.session, method, url, data=data,
+                                                  before_network=self._before_network, timeout=self.timeout)
+                else:
+                    self._before_network()
+                    response = self.session.request(method, url, data=data, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = str(e)
+            else:
+                if response.status_code == 200:
+                    return response.json()
+                if response.status_code in (400, 404):
+                    return None
+                if response.status_code not in RETRY_STATUSES:
+                    raise HarvestError(f"{url}: HTTP {response.status_code}")
+                error = f"HTTP {response.status_code}"
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit() and attempt < self.max_retries:
+                    time.sleep(int(retry_after))
+                    continue
+            if attempt < self.max_retries:
+                time.sleep(self.backoff * 2 ** attempt * (1 + random.random() / 2))
+        raise HarvestError(f"{url}: {error} after {self.max_retries + 1} attempts")
+
+    def _before_network(self):
+        self.bucket.acquire()
+        self.request_count += 1
+
+    def resolve_cid(self, substance_name: str) -> Optional[int]:
+        # PUG REST takes a single name per request, so this is the one per-substance call
+        data = self.get_json(f"compound/name/{quote(substance_name, safe='')}/cids/JSON")
+        try:
+            return data["IdentifierList"]["CID"][0]
+        except (KeyError, IndexError, TypeError):
+            return None
+
+    def properties_for(self, cids: List[int]) -> Dict[int, dict]:
+        properties = {}
+        for batch in _chunks(cids, CID_BATCH_SIZE):
+            data = self.post_json(f"compound/cid/property/{PROPERTIES}/JSON", {"cid": ",".join(map(str, batch))})
+            for entry in (data or {}).get("PropertyTable", {}).get("Properties", []):
+                properties[entry["CID"]] = entry
+        return properties
+
+    def synonyms_for(self, cids: List[int]) -> Dict[int, List[str]]:
+        synonyms = {}
+        for batch in _chunks(cids, CID_BATCH_SIZE):
+            data = self.post_json("compound/cid/synonyms/JSON", {"cid": ",".join(map(str, batch))})
+            for entry in (data or {}).get("InformationList", {}).get("Information", []):
+                synonyms[entry["CID"]] = entry.get("Synonym", [])
+        return synonyms
+
+    def lookup_many(self, substance_names: List[str], pool: Optional[ThreadPoolExecutor] = None) -> List[dict]:
+        """
+        Names -> CIDs (one request each, concurrently on `pool`), then properties and
+        synonyms for all distinct CIDs in batched POSTs. Never raises: failures are
+        recorded in each record's Status.
+        """
+        records = [empty_record(name) for name in substance_names]
+        resolved = list((pool.map if pool else map)(self._resolve_or_error, substance_names))
+        cids = sorted({cid for cid in resolved if isinstance(cid, int)})
+        try:
+            properties = self.properties_for(cids)
+            synonyms = self.synonyms_for(cids)
+        except HarvestError as e:
+            resolved = [f"error: {e}" if isinstance(cid, int) else cid for cid in resolved]
+            properties, synonyms = {}, {}
+
+        for record, cid in zip(records, resolved):
+            if cid is None:
+                record["Status"] = "not found"
+            elif isinstance(cid, str):
+                record["Status"] = cid
+            else:
+                cid_synonyms = synonyms.get(cid, [])
+                cas_number = find_cas(cid_synonyms)
+                record.update({
+                    "CAS Number": cas_number,
+                    "Synonyms": cid_synonyms,
+                    "PubChem CID": cid,
+                    "Properties": {k: v for k, v in properties.get(cid, {}).items() if k != "CID"},
+                    "Compound Source": f"{PUBCHEM_COMPOUND_URL}/{cid}",
+                    "Synonym Source": synonym_source(cas_number, cid),
+                    "Status": "ok",
+                })
+        return records
+
+    def lookup(self, substance_name: str) -> dict:
+        """Name -> CID -> properties and synonyms; the CAS number is the first synonym that is a valid one."""
+        return self.lookup_many([substance_name])[0]
+
+    def _resolve_or_error(self, substance_name: str):
+        try:
+            return self.resolve_cid(substance_name)
+        except HarvestError as e:
+            return f"error: {e}"
+
+
+def synonym_source(cas_number: Optional[str], cid: int) -> str:
+    """Where a record's synonyms are cited from: name/{CAS}, like the workbook and the notebooks, else the CID."""
+    if cas_number:
+        return PUBCHEM_SYNONYM_SOURCE.format(cas=cas_number)
+    return f"{PUBCHEM_BASE_URL}/compound/cid/{cid}/synonyms/JSON"
+
+
+def empty_record(substance_name: str) -> dict:
+    return {
+        "Substance": substance_name,
+        "CAS Number": None,
+        "Synonyms": None,
+        "PubChem CID": None,
+        "Properties": None,
+        "Compound Source": None,
+        "Synonym Source": None,
+        "Status": None,
+    }
+
+
+def harvest_one(client: PubChemClient, substance_name: str) -> dict:
+    return client.lookup(substance_name)
+
+
+def _chunks(items: List, size: int) -> Iterable[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def fetch_all(substances: Iterable[str], client: Optional[PubChemClient] = None, workers: int = 8,
+              batch_size: int = CID_BATCH_SIZE) -> List[dict]:
+    """Looks every substance up (batched, concurrent name resolution); records come back in input order."""
+    client = client or PubChemClient()
+    substances = list(substances)
+    records = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for batch in _chunks(substances, batch_size):
+            records.extend(client.lookup_many(batch, pool))
+    return records
+
+
+def completed_substances(output_path: str) -> set:
+    """Substances already resolved in a previous run (errors are retried)."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short by an interrupted run
+            if record.get("Status") in ("ok", "not found"):
+                done.add(record["Substance"])
+    return done
+
+
+def harvest(substances: Iterable[str], output_path: str, client: Optional[PubChemClient] = None,
+            workers: int = 8, batch_size: int = CID_BATCH_SIZE) -> dict:
+    """
+    Looks up every substance not already in `output_path`, `batch_size` names at a
+    time, and appends one NDJSON record per substance as each batch completes.
+    Safe to re-run after an interruption.
+    """
+    client = client or PubChemClient()
+    done = completed_substances(output_path)
+    pending = list(dict.fromkeys(name for name in substances if name and name not in done))
+    counts = {"skipped": len(done), "ok": 0, "not found": 0, "error": 0}
+    started = time.perf_counter()
+
+    with open(output_path, "a+", encoding="utf-8") as handle, ThreadPoolExecutor(max_workers=workers) as pool:
+        if handle.tell() > 0:
+            handle.seek(handle.tell() - 1)
+            if handle.read(1) != "\n":
+                handle.write("\n")  # finish a line cut short by an interrupted run
+        position = 0
+        for batch in _chunks(pending, batch_size):
+            for record in client.lookup_many(batch, pool):
+                handle.write(json.dumps(record) + "\n")
+                counts["error" if record["Status"].startswith("error") else record["Status"]] += 1
+            handle.flush()
+            position += len(batch)
+            print(f"Harvested {position}/{len(pending)} ({time.perf_counter() - started:.1f}s, "
+                  f"{client.request_count} requests)")
+    return counts
+
+
+def read_substances(path: str, column: Optional[str] = None) -> List[str]:
+    """One name per line (.txt) or a column of a CSV/XLSX file."""
+    if path.lower().endswith((".csv", ".xlsx", ".xls")):
+        frame = pd.read_csv(path, dtype=str) if path.lower().endswith(".csv") else pd.read_excel(path, dtype=str)
+        return frame[column or frame.columns[0]].dropna().str.strip().tolist()
+    with open(path, encoding="utf-8") as handle:
+        return [line.strip() for line in handle if line.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Harvest CAS numbers and synonyms from PubChem concurrently.")
+    parser.add_argument("input", help="Substance list (.txt, one per line, or .csv/.xlsx)")
+    parser.add_argument("--column", default=None, help="Column holding the names (default: first column)")
+    parser.add_argument("--output", required=True, help="NDJSON output, appended to and resumed from")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent lookups")
+    parser.add_argument("--rate", type=float, default=PUBCHEM_RATE, help="Maximum requests per second")
+    parser.add_argument("--base-url", default=PUBCHEM_BASE_URL, help="PUG REST base URL")
+    parser.add_argument("--batch-size", type=int, default=CID_BATCH_SIZE,
+                        help="Substances per batch (their CIDs share one property and one synonym request)")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the on-disk HTTP cache")
+    args = parser.parse_args(argv)
+
+    client = PubChemClient(base_url=args.base_url, rate=args.rate, pool_size=max(args.workers, 1),
+                           cache=False if args.no_cache else None)
+    counts = harvest(read_substances(args.input, args.column), args.output, client=client,
+                     workers=args.workers, batch_size=args.batch_size)
+    print(f"✅ {counts['ok']} found, {counts['not found']} not found, {counts['error']} failed, "
+          f"{counts['skipped']} already harvested -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Append-only, checkpointed CSV output for the scraper notebooks.
+
+Rows are written substance by substance as each lookup completes, so memory
+does not grow with the substance list and a crash loses at most the substance
+in flight. After each substance's rows are flushed, a checkpoint line records
+the substance and the CSV's byte offset; on restart the CSV is truncated back
+to the last checkpoint (dropping a half-written substance) and completed
+substances are skipped. A substance without rows (no lookup found anything, or
+a request failed) is not checkpointed, so the next run tries it again.
+
+    with CheckpointedCsvWriter("substance_data.csv", FIELDNAMES) as writer:
+        for substance in substances:
+            if substance in writer.completed:
+                continue
+            if not writer.write_substance(substance, rows_for(substance)):
+                retry.append(substance)
+"""
+import csv
+import io
+import json
+import os
+from typing import Iterable, List, Optional
+
+
+class CheckpointedCsvWriter:
+    def __init__(self, path: str, fieldnames: List[str], checkpoint_path: Optional[str] = None):
+        self.path = path
+        self.fieldnames = list(fieldnames)
+        self.checkpoint_path = checkpoint_path or f"{path}.checkpoint"
+        self.completed = set()
+        self.rows_written = 0
+        self._handle = None
+        self._checkpoint = None
+
+    def __enter__(self):
+        offset = self._recover()
+        self._handle = open(self.path, "r+b" if offset else "wb")
+        self._handle.truncate(offset)
+        self._handle.seek(offset)
+        if offset == 0:
+            # No usable checkpoint: start a fresh file (like the old end-of-run to_csv)
+            self._handle.write(self._encode([self.fieldnames]))
+            self._handle.flush()
+            open(self.checkpoint_path, "w").close()
+        self._checkpoint = open(self.checkpoint_path, "a", encoding="utf-8")
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for handle in (self._handle, self._checkpoint):
+            if handle is not None:
+                handle.close()
+        self._handle = self._checkpoint = None
+
+    def write_substance(self, substance: str, rows: Iterable[dict]) -> bool:
+        """Appends one substance's rows in a single write, then checkpoints it; False (nothing written) without rows."""
+        records = [[row.get(name, "") for name in self.fieldnames] for row in rows]
+        if not records:
+            return False
+        self._handle.write(self._encode(records))
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+        self._checkpoint.write(json.dumps({"substance": substance, "offset": self._handle.tell()}) + "\n")
+        self._checkpoint.flush()
+        self.completed.add(substance)
+        self.rows_written += len(records)
+        return True
+
+    def _recover(self) -> int:
+        """Completed substances and the CSV offset they end at (0 = nothing to resume)."""
+        if not (os.path.exists(self.path) and os.path.exists(self.checkpoint_path)):
+            return 0
+        offset = valid = 0
+        with open(self.checkpoint_path, "r+b") as handle:
+            for line in handle:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # a checkpoint cut short by an interrupted run
+                if not line.endswith(b"\n"):
+                    break
+                self.completed.add(entry["substance"])
+                offset = entry["offset"]
+                valid += len(line)
+            handle.truncate(valid)
+        if offset > os.path.getsize(self.path):
+            self.completed.clear()
+            return 0
+        return offset
+
+    @staticmethod
+    def _encode(records: List[list]) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(records)
+        return buffer.getvalue().encode("utf-8")
@@ -1,37 +1,29 @@
-import requests
 import pandas as pd
 from bs4 import BeautifulSoup
 
+from http_cache import cached_get
+from pubchem_harvester import PubChemClient, fetch_all, harvest_one
+
+SCRAPER_COLUMNS = ["Substance", "CAS Number", "Synonyms", "PubChem CID"]
+
+_pubchem_client = None
+
+def pubchem_client():
+    """Shared PubChemClient (pooled session + PubChem rate limit) for one-off lookups."""
+    global _pubchem_client
+    if _pubchem_client is None:
+        _pubchem_client = PubChemClient()
+    return _pubchem_client
+
 def fetch_pubchem_data(substance_name):
     """Fetch CAS number, synonyms, and sources from PubChem API."""
-    base_url = "https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/name/"
-    url = f"{base_url}{substance_name}/property/IUPACName,MolecularFormula,MolecularWeight,CanonicalSMILES,IsomericSMILES/JSON"
-    
-    response = requests.get(url)
-    if response.status_code == 200:
-        data = response.json()
-        try:
-            compound_id = data['PropertyTable']['Properties'][0]['CID']
-            cas_url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/cid/{compound_id}/synonyms/JSON"
-            cas_response = requests.get(cas_url)
-            if cas_response.status_code == 200:
-                synonyms_data = cas_response.json()
-                synonyms = synonyms_data['InformationList']['Information'][0]['Synonym']
-                cas_number = next((s for s in synonyms if s.count('-') == 2 and s.replace('-', '').isdigit()), None)
-                return {
-                    "Substance": substance_name,
-                    "CAS Number": cas_number,
-                    "Synonyms": synonyms,
-                    "PubChem CID": compound_id
-                }
-        except KeyError:
-            return {"Substance": substance_name, "CAS Number": None, "Synonyms": None, "PubChem CID": None}
-    return {"Substance": substance_name, "CAS Number": None, "Synonyms": None, "PubChem CID": None}
+    record = harvest_one(pubchem_client(), substance_name)
+    return {key: record[key] for key in SCRAPER_COLUMNS}
 
 def scrape_dea_scheduled_substances():
     """Scrape the DEA Controlled Substance List from their website."""
     url = "https://www.deadiversion.usdoj.gov/schedules/orangebook/orangebook.pdf"
-    response = requests.get(url)
+    response = cached_get(url)
     if response.status_code == 200:
         with open("data/orangebook.pdf", "wb") as file:
             file.write(response.content)
@@ -40,11 +32,10 @@ def scrape_dea_scheduled_substances():
 
 def main():
     substances = ["Fentanyl", "Acetylfentanyl", "Carfentanil"]  # Example substances
-    results = []
-    for substance in substances:
-        results.append(fetch_pubchem_data(substance))
+    # Concurrent and rate-limited, see pubchem_harvester.py (its CLI resumes long runs)
+    results = fetch_all(substances, client=pubchem_client())
     
-    df = pd.DataFrame(results)
+    df = pd.DataFrame(results, columns=SCRAPER_COLUMNS)
     df.to_csv("data/chemical_identifiers.csv", index=False)
     print("Data saved to data/chemical_identifiers.csv")
     
@@ -0,0 +1,208 @@
+"""
+pubchem_harvester.py against a local PUG REST stub (http.server in a thread):
+rate limiting, retries with backoff, batched CID POSTs and resuming a harvest.
+
+    cd "scripts/Web Scraping" && python -m pytest -q test_pubchem_harvester.py
+"""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import pytest
+
+import pubchem_harvester
+from pubchem_harvester import PUBCHEM_SYNONYM_SOURCE, PubChemClient, TokenBucket, harvest
+
+COMPOUNDS = {  # name -> (CID, CAS number)
+    "fentanyl": (3345, "437-38-7"),
+    "carfentanil": (62156, "59708-52-0"),
+    "acetylfentanyl": (49791, "3258-84-2"),
+    "formaldehyde": (712, "50-00-0"),
+    "benzene": (241, "71-43-2"),
+    "ethanol": (702, "64-17-5"),
+}
+CAS_BY_CID = dict(COMPOUNDS.values())
+
+
+class StubPubChem(BaseHTTPRequestHandler):
+    """Just enough PUG REST for PubChemClient; `server.failures` queues error statuses to answer first."""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._handle({})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+        self._handle(parse_qs(body))
+
+    def _handle(self, form):
+        server = self.server
+        with server.lock:
+            server.log.append((time.monotonic(), self.command, unquote(urlparse(self.path).path), form))
+            failure = server.failures.pop(0) if server.failures else None
+        if failure:
+            status, headers = failure
+            return self._send(status, {"Fault": {"Code": "PUGREST.ServerBusy"}}, headers)
+
+        parts = unquote(urlparse(self.path).path).split("/")
+        if parts[4] == "name":
+            compound = COMPOUNDS.get(parts[5].lower())
+            if compound is None:
+                return self._send(404, {"Fault": {"Code": "PUGREST.NotFound"}})
+            return self._send(200, {"IdentifierList": {"CID": [compound[0]]}})
+        cids = [int(cid) for cid in form["cid"][0].split(",")]
+        if parts[5] == "synonyms":
+            return self._send(200, {"InformationList": {"Information": [
+                {"CID": cid, "Synonym": [f"compound {cid}", CAS_BY_CID[cid]]} for cid in cids
+            ]}})
+        return self._send(200, {"PropertyTable": {"Properties": [
+            {"CID": cid, "MolecularFormula": "C1", "IUPACName": f"iupac {cid}"} for cid in cids
+        ]}})
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubPubChem)
+    server.lock = threading.Lock()
+    server.log = []
+    server.failures = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def client_for(stub, **kwargs):
+    options = {"rate": 1000, "backoff": 0.01, "cache": False, **kwargs}
+    return PubChemClient(base_url=f"http://127.0.0.1:{stub.server_port}/rest/pug", **options)
+
+
+def requests_to(stub, fragment):
+    return [entry for entry in stub.log if fragment in entry[2]]
+
+
+# ---------- Rate limiting ----------
+def test_token_bucket_spaces_acquisitions():
+    bucket = TokenBucket(rate=50)
+    started = time.monotonic()
+    for _ in range(11):
+        bucket.acquire()
+    assert time.monotonic() - started >= 10 / 50 * 0.9  # the first token is already in the bucket
+
+
+def test_client_stays_under_the_rate_limit(stub):
+    client = client_for(stub, rate=20)
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        client.lookup_many(list(COMPOUNDS), pool)
+    sent = sorted(entry[0] for entry in stub.log)
+    assert len(sent) == client.request_count == len(COMPOUNDS) + 2
+    assert sent[-1] - sent[0] >= (len(sent) - 1) / 20 * 0.9
+
+
+# ---------- Retries ----------
+@pytest.mark.parametrize("status", [429, 500, 502, 503, 504])
+def test_retries_throttled_and_failed_requests_with_backoff(stub, status):
+    stub.failures = [(status, {}), (status, {})]
+    record = client_for(stub, backoff=0.05).lookup("Fentanyl")
+    assert record["Status"] == "ok" and record["PubChem CID"] == 3345
+    attempts = [entry[0] for entry in requests_to(stub, "/name/")]
+    assert len(attempts) == 3
+    assert attempts[1] - attempts[0] >= 0.05 and attempts[2] - attempts[1] >= 0.1  # backoff doubles
+
+
+def test_retry_after_is_honoured(stub):
+    stub.failures = [(429, {"Retry-After": "1"})]
+    client_for(stub, backoff=0).lookup("Fentanyl")
+    first, second = [entry[0] for entry in requests_to(stub, "/name/")]
+    assert second - first >= 1
+
+
+def test_gives_up_after_max_retries(stub):
+    stub.failures = [(503, {})] * 3
+    record = client_for(stub, max_retries=2).lookup("Fentanyl")
+    assert record["Status"].startswith("error: ") and "HTTP 503 after 3 attempts" in record["Status"]
+    assert len(stub.log) == 3
+
+
+def test_client_errors_are_not_retried(stub):
+    stub.failures = [(403, {})]
+    record = client_for(stub).lookup("Fentanyl")
+    assert record["Status"].startswith("error: ") and "HTTP 403" in record["Status"]
+    assert len(stub.log) == 1
+
+
+# ---------- Batched CID requests ----------
+def test_properties_and_synonyms_are_posted_for_cid_batches(stub, monkeypatch):
+    monkeypatch.setattr(pubchem_harvester, "CID_BATCH_SIZE", 4)
+    names = list(COMPOUNDS) + ["no such substance"]
+    records = client_for(stub).lookup_many(names)
+
+    assert len(requests_to(stub, "/name/")) == len(names)  # one per name, PUG REST takes no name lists
+    for path in ("/cid/property/", "/cid/synonyms/"):
+        posts = requests_to(stub, path)
+        assert [entry[1] for entry in posts] == ["POST", "POST"]
+        batches = [entry[3]["cid"][0].split(",") for entry in posts]
+        assert [len(batch) for batch in batches] == [4, 2]
+        assert sorted(int(cid) for batch in batches for cid in batch) == sorted(cid for cid, _ in COMPOUNDS.values())
+
+    by_name = {record["Substance"]: record for record in records}
+    assert by_name["fentanyl"]["CAS Number"] == "437-38-7"
+    assert by_name["fentanyl"]["Synonym Source"] == PUBCHEM_SYNONYM_SOURCE.format(cas="437-38-7")
+    assert by_name["benzene"]["Properties"] == {"MolecularFormula": "C1", "IUPACName": "iupac 241"}
+    assert by_name["no such substance"]["Status"] == "not found"
+
+
+# ---------- Resuming ----------
+def read_records(path):
+    with open(path, encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle]
+
+
+def test_harvest_resumes_from_its_output(stub, tmp_path):
+    output = tmp_path / "harvest.ndjson"
+    names = list(COMPOUNDS)
+    harvest(names[:3], str(output), client=client_for(stub), workers=2, batch_size=2)
+    with open(output, "a", encoding="utf-8") as handle:
+        handle.write('{"Substance": "formaldehyde", "Sta')  # a run killed mid-write
+    stub.log.clear()
+
+    counts = harvest(names, str(output), client=client_for(stub), workers=2, batch_size=2)
+    assert counts == {"skipped": 3, "ok": 3, "not found": 0, "error": 0}
+    resolved = sorted(entry[2].split("/")[5] for entry in requests_to(stub, "/name/"))
+    assert resolved == sorted(names[3:])
+
+    lines = open(output, encoding="utf-8").read().splitlines()
+    assert lines[3].startswith('{"Substance": "formaldehyde", "Sta') and not lines[3].endswith("}")
+    records = [json.loads(line) for position, line in enumerate(lines) if position != 3]
+    assert [record["Substance"] for record in records] == names
+    assert all(record["Status"] == "ok" for record in records)
+
+
+def test_harvest_retries_failed_lookups_on_resume(stub, tmp_path):
+    output = tmp_path / "harvest.ndjson"
+    stub.failures = [(503, {})] * 2  # both attempts at resolving "fentanyl"
+    first = harvest(["fentanyl", "no such substance"], str(output), client=client_for(stub, max_retries=1),
+                    workers=1, batch_size=1)
+    assert first == {"skipped": 0, "ok": 0, "not found": 1, "error": 1}
+
+    second = harvest(["fentanyl", "no such substance"], str(output), client=client_for(stub), workers=1)
+    assert second == {"skipped": 1, "ok": 1, "not found": 0, "error": 0}
+    statuses = [(record["Substance"], record["Status"][:5]) for record in read_records(output)]
+    assert statuses == [("fentanyl", "error"), ("no such substance", "not f"), ("fentanyl", "ok")]
@@ -0,0 +1,118 @@
+"""
+scrape_output.CheckpointedCsvWriter: resuming after a crash or a half-written
+line, and never checkpointing a substance that got no rows.
+
+    cd "scripts/Web Scraping" && python -m pytest -q test_scrape_output.py
+"""
+import csv
+import json
+
+import pytest
+
+from scrape_output import CheckpointedCsvWriter
+
+FIELDNAMES = ["Substance Name", "CAS Number", "Synonym"]
+
+
+def rows(substance, count=2):
+    return [{"Substance Name": substance, "CAS Number": "50-00-0", "Synonym": f"{substance} {i}"} for i in range(count)]
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as handle:
+        return list(csv.reader(handle))
+
+
+def checkpoints(path):
+    with open(f"{path}.checkpoint", encoding="utf-8") as handle:
+        return [json.loads(line)["substance"] for line in handle]
+
+
+@pytest.fixture
+def output(tmp_path):
+    return str(tmp_path / "substance_data.csv")
+
+
+def test_writes_rows_and_checkpoints_each_substance(output):
+    with CheckpointedCsvWriter(output, FIELDNAMES) as writer:
+        assert writer.write_substance("Fentanyl", rows("Fentanyl"))
+        assert writer.write_substance("Carfentanil", rows("Carfentanil", 1))
+    assert writer.completed == {"Fentanyl", "Carfentanil"} and writer.rows_written == 3
+    assert read_csv(output) == [FIELDNAMES, ["Fentanyl", "50-00-0", "Fentanyl 0"], ["Fentanyl", "50-00-0", "Fentanyl 1"],
+                                ["Carfentanil", "50-00-0", "Carfentanil 0"]]
+    assert checkpoints(output) == ["Fentanyl", "Carfentanil"]
+
+
+def test_resume_skips_completed_substances_and_appends(output):
+    with CheckpointedCsvWriter(output, FIELDNAMES) as writer:
+        writer.write_substance("Fentanyl", rows("Fentanyl"))
+    with CheckpointedCsvWriter(output, FIELDNAMES) as writer:
+        assert writer.completed == {"Fentanyl"}
+        writer.write_substance("Carfentanil", rows("Carfentanil"))
+    table = read_csv(output)
+    assert table[0] == FIELDNAMES and table.count(FIELDNAMES) == 1
+    assert [row[2] for row in table[1:]] == ["Fentanyl 0", "Fentanyl 1", "Carfentanil 0", "Carfentanil 1"]
+
+
+def test_crash_mid_substance_drops_its_rows(output):
+    with CheckpointedCsvWriter(output, FIELDNAMES) as writer:
+        writer.write_substance("Fentanyl", rows("Fentanyl"))
+    with open(output, "a", encoding="utf-8") as handle:
+        handle.write("Carfentanil,59708-52-0,Carfentanil 0\r\nCarfentanil,597")  # killed before the checkpoint
+
+    with CheckpointedCsvWriter(output, FIELDNAMES) as writer:
+        assert writer.completed == {"Fentanyl"}
+        writer.write_substance("Carfentanil", rows("Carfentanil", 1))
+    assert read_csv(output)[1:] == [["Fentanyl", "50-00-0", "Fentanyl 0"], ["Fentanyl", "50-00-0", "Fentanyl 1"],
+                                    ["Carfentanil", "50-00-0", "Carfentanil 0"]]
+
+
+@pytest.mark.parametrize("partial", ['{"substance": "Carfentanil", "off', '{"substance": "Carfentanil", "offset": 1}'])
+def test_partial_checkpoint_line_is_ignored(output, partial):
+    with CheckpointedCsvWriter(output, FIELDNAMES) as writer:
+        writer.write_substance("Fentanyl", rows("Fentanyl"))
+    size = len(open(output, "rb").read())
+    with open(output, "a", encoding="utf-8") as handle:
+        handle.write("Carfentanil,50-00-0,Carfentanil 0\r\n")
+    with open(f"{output}.checkpoint", "a", encoding="utf-8") as handle:
+        handle.write(partial)  # no newline: the checkpoint write itself was cut short
+
+    with CheckpointedCsvWriter(output, FIELDNAMES) as writer:
+        assert writer.completed == {"Fentanyl"}
+    assert len(open(output, "rb").read()) == size
+    assert checkpoints(output) == ["Fentanyl"]
+
+
+def test_checkpoint_past_the_end_of_the_csv_starts_over(output):
+    with CheckpointedCsvWriter(output, FIELDNAMES) as writer:
+        writer.write_substance("Fentanyl", rows("Fentanyl"))
+    with open(output, "w", encoding="utf-8") as handle:
+        handle.write("Substance Name\r\n")  # the CSV was replaced behind the checkpoint's back
+
+    with CheckpointedCsvWriter(output, FIELDNAMES) as writer:
+        assert writer.completed == set()
+    assert read_csv(output) == [FIELDNAMES]
+    assert checkpoints(output) == []
+
+
+def test_missing_checkpoint_starts_a_fresh_file(output):
+    with open(output, "w", encoding="utf-8") as handle:
+        handle.write("left over,from,an old run\r\n")
+    with CheckpointedCsvWriter(output, FIELDNAMES) as writer:
+        assert writer.completed == set()
+    assert read_csv(output) == [FIELDNAMES]
+
+
+# ---------- Substances without results ----------
+def test_substance_without_rows_is_not_checkpointed(output):
+    with CheckpointedCsvWriter(output, FIELDNAMES) as writer:
+        writer.write_substance("Fentanyl", rows("Fentanyl"))
+        assert writer.write_substance("Unknownium", iter([])) is False
+        assert "Unknownium" not in writer.completed and writer.rows_written == 2
+    assert checkpoints(output) == ["Fentanyl"]
+    assert len(read_csv(output)) == 3
+
+    with CheckpointedCsvWriter(output, FIELDNAMES) as writer:
+        assert writer.completed == {"Fentanyl"}  # the next run retries it
+        assert writer.write_substance("Unknownium", rows("Unknownium", 1))
+    assert checkpoints(output) == ["Fentanyl", "Unknownium"]
@@ -0,0 +1,134 @@
+"""
+Wikipedia fallback for substances PubChem does not know.
+
+Only the infobox's "CAS Number" and "Other names" rows are needed, so instead
+of building a full BeautifulSoup tree for the whole article, `parse_infobox`
+jumps to the first `<table class="... infobox ...">` and runs the stdlib
+HTMLParser over that table alone, stopping at its closing tag. The result
+matches the old `soup.find('table', {'class': 'infobox'})` row loop: the first
+<th>/<td> of each row, the last matching row wins.
+
+`lookup_many` runs the fallback for many substances on a bounded thread pool
+sharing one pooled session; pages go through the on-disk HTTP cache.
+
+    from wikipedia_fallback import lookup, lookup_many
+    cas, synonyms, url = lookup("Carfentanil")
+"""
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from typing import List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from http_cache import cached_get
+
+WIKIPEDIA_URL = "https://en.wikipedia.org/wiki/"
+WIKIPEDIA_WORKERS = int(os.getenv("WIKIPEDIA_WORKERS", "4"))
+NOT_FOUND = ("N/A", [], "N/A")
+
+_INFOBOX_START = re.compile(r"<table\b[^>]*\bclass\s*=\s*[\"'][^\"']*\binfobox\b", re.IGNORECASE)
+_FEED_CHUNK = 16 * 1024
+
+
+class _InfoboxParser(HTMLParser):
+    """Collects (first <th> text, first <td> text) per <tr> of one table, then stops."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.depth = 0
+        self.done = False
+        self.rows = []
+        self._open_rows = []
+        self._cells = []  # [buffer, tag, nesting] for each first-th/td being collected
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == "table":
+            self.depth += 1
+        elif tag == "tr":
+            self._open_rows.append({"th": None, "td": None})
+        elif tag in ("th", "td"):
+            for cell in self._cells:
+                if cell[1] == tag:
+                    cell[2] += 1
+            if self._open_rows and self._open_rows[-1][tag] is None:
+                buffer = []
+                self._open_rows[-1][tag] = buffer
+                self._cells.append([buffer, tag, 0])
+
+    def handle_endtag(self, tag):
+        if self.done:
+            return
+        if tag in ("th", "td"):
+            for cell in list(self._cells):
+                if cell[1] == tag:
+                    if cell[2]:
+                        cell[2] -= 1
+                    else:
+                        self._cells.remove(cell)
+        elif tag == "tr" and self._open_rows:
+            row = self._open_rows.pop()
+            self.rows.append(tuple(None if row[kind] is None else "".join(row[kind]) for kind in ("th", "td")))
+        elif tag == "table":
+            self.depth -= 1
+            self.done = self.depth == 0
+
+    def handle_data(self, data):
+        for cell in self._cells:
+            cell[0].append(data)
+
+
+def parse_infobox(html: str) -> Optional[Tuple[str, List[str]]]:
+    """(CAS number, other names) from the article's first infobox; None when there is no infobox."""
+    match = _INFOBOX_START.search(html)
+    if match is None:
+        return None
+    parser = _InfoboxParser()
+    for start in range(match.start(), len(html), _FEED_CHUNK):
+        parser.feed(html[start:start + _FEED_CHUNK])
+        if parser.done:
+            break
+
+    cas_number = "N/A"
+    synonyms = []
+    for header, cell in parser.rows:
+        if header is None or cell is None:
+            continue
+        if "CAS Number" in header:
+            cas_number = cell.strip()
+        if "Other names" in header:
+            synonyms = cell.strip().split(", ")
+    return cas_number, synonyms
+
+
+def article_url(substance_name: str) -> str:
+    return f"{WIKIPEDIA_URL}{substance_name.replace(' ', '_')}"
+
+
+def lookup(substance_name: str, session: Optional[requests.Session] = None) -> Tuple[str, List[str], str]:
+    """(CAS number, synonyms, article URL), or ("N/A", [], "N/A") without an article or infobox."""
+    url = article_url(substance_name)
+    try:
+        response = cached_get(url, session=session, timeout=30)
+    except requests.RequestException:
+        return NOT_FOUND
+    if response.status_code != 200:
+        return NOT_FOUND
+    infobox = parse_infobox(response.text)
+    if infobox is None:
+        return NOT_FOUND
+    return infobox[0], infobox[1], url
+
+
+def lookup_many(substance_names: List[str], workers: int = WIKIPEDIA_WORKERS) -> List[Tuple[str, List[str], str]]:
+    """`lookup` for every name on a bounded thread pool; results in input order."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        return list(pool.map(lambda name: lookup(name, session=session), substance_names))
@@ -1,12 +1,30 @@
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import pandas as pd
-from fuzzywuzzy import process
 import traceback
+import csv
+import hashlib
+import json
+import threading
 import numpy as np
-from typing import List, Optional
+import os
+import time
+from collections import deque
+from typing import List, Optional, Tuple
+from cas_number import CasNumber, near_cas, parse_cas
+from lookup_index import normalize_key
+from data_loader import data_model_version, load_data_model, workbook_source
+from data_snapshot import DataSnapshot, EditValidationError
+from match_cache import MatchCache
+from metrics import (METRICS_ENABLED, HTTP_LATENCY, HTTP_REQUESTS, MATCH_QUERIES, MATCH_SCENARIO_HITS,
+                     MATCH_STAGE_LATENCY, registry)
+from harvest_sync import HARVEST_COLUMNS, sync_harvest
+import profiling
+from profiling import PROFILING_ENABLED, profiled
  
  
 app = FastAPI()
@@ -20,42 +38,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
  
-# Load Excel
-file_path = "https://www.dropbox.com/scl/fi/gf21i2qf3ffioy958448x/Data-Model-Tables.xlsx?rlkey=4ovpu5v0l7ri0zp3bi5wx3u0t&st=6xle6bd9&dl=1"
-#file_path = 'Data Model Tables.xlsx'
-ref_df = pd.read_excel(file_path, sheet_name="Substance_Reference")
-source_df = pd.read_excel(file_path, sheet_name="Substance_Sourcing")
-weight_df = pd.read_excel(file_path, sheet_name="Weighting_Tag").apply(lambda x: x.astype(str).str.strip())
-substance_type_df = pd.read_excel(file_path, sheet_name="Substance_Type").apply(lambda x: x.astype(str).str.strip())
- 
-# Clean and standardize IDs
-ref_df["Substance_Reference_ID"] = ref_df["Substance_Reference_ID"].astype(str).str.strip().str.replace('.0', '', regex=False)
-ref_df["Substance_ID"] = ref_df["Substance_ID"].astype(str).str.strip()
-ref_df["Substance_Name"] = ref_df["Substance_Name"].astype(str).fillna("Not Available").str.strip()
-ref_df["Substance_Description"] = ref_df["Substance_Description"].astype(str).fillna("Not Available").str.strip()
-ref_df["Substance_Weight"] = ref_df.get("Substance_Weight", "Not Available").astype(str).fillna("Not Available").str.strip()
-ref_df["(FK) Weighting_Tag_ID"] = ref_df["(FK) Weighting_Tag_ID"].astype(str).str.strip()
- 
-source_df["(FK) Substance_ID"] = source_df["(FK) Substance_ID"].astype(str).str.strip().str.replace('.0', '', regex=False)
-source_df["Substance_Sourcing_Local_Name"] = source_df["Substance_Sourcing_Local_Name"].astype(str).str.strip()
- 
-weight_df["Weighting_Tag_ID"] = weight_df["Weighting_Tag_ID"].astype(str).str.strip()
- 
-ref_with_weight_title_df = ref_df.merge(
-    weight_df[["Weighting_Tag_ID", "Weighting_Tag_Title"]],
-    left_on="(FK) Weighting_Tag_ID",
-    right_on="Weighting_Tag_ID",
-    how="left"
-).fillna("Not Available")
- 
-ref_df = ref_with_weight_title_df
-combined_df = pd.merge(
-    source_df,
-    ref_df,
-    left_on="(FK) Substance_ID",
-    right_on="Substance_Reference_ID",
-    how="left"
-).fillna("Not Available")
+# Load the data model (local snapshot of the workbook, see data_loader.py; DATA_MODEL_PATH overrides the source)
+# DataSnapshot holds the cleaned frames, lookup indexes, fuzzy pools and synonym aggregates in memory;
+# STORAGE_BACKEND=sqlite serves the same lookups from a shared SQLite file instead (see sqlite_store.py)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "memory").lower()
+if STORAGE_BACKEND == "sqlite":
+    from sqlite_store import StoreSnapshot, open_store
+ 
+ 
+def load_snapshot():
+    if STORAGE_BACKEND == "sqlite":
+        return StoreSnapshot(open_store())
+    return DataSnapshot(load_data_model())
+ 
+ 
+# The snapshot serving requests. Reloads and edits build a new one and swap this reference;
+# request handlers read it once and pass it down, so a request never mixes two snapshots.
+snapshot = load_snapshot()
  
 class MatchResult(BaseModel):
     substance_reference_id: str
@@ -73,357 +72,954 @@ class MatchResult(BaseModel):
  
  
  
-@app.get("/match", response_model=List[MatchResult])
-def match_substance(query: str = Query(...)):
-    query_lower = query.strip().lower()
-    results = []
-    seen_ref_ids = set()
+class FullMatchResult(MatchResult):
+    synonyms: List[str] = []  # every synonym of the substance (what /synonyms_lookup returns for the card)
  
-    def get_synonym_count(sub_ref_id: str) -> int:
-        try:
-            sub_ref_id = str(sub_ref_id).strip()
-            filtered = combined_df[
-                combined_df["Substance_Reference_ID"].astype(str).str.strip() == sub_ref_id
-            ]
-            return int(filtered["Substance_Sourcing_Local_Name"].nunique())
-        except Exception:
-            return 0
-        
-    #def get_first_synonym_source(sub_ref_id: str) -> str:
-       # filtered = source_df[source_df["(FK) Substance_ID"].astype(str).str.strip() == sub_ref_id]
-       # source_values = filtered["Substance_Sourcing_Mapping_Reference"].dropna().unique()
-       # return source_values[0] if len(source_values) > 0 else "Not Available"
-    
-    def get_all_synonym_sources(sub_ref_id: str) -> List[str]:
-        filtered = source_df[source_df["(FK) Substance_ID"].astype(str).str.strip() == sub_ref_id]
-        return filtered["Substance_Sourcing_Mapping_Reference"].dropna().unique().tolist()
- 
-    def get_synonym_source_pairs(sub_ref_id: str) -> List[dict]:
-       filtered = source_df[source_df["(FK) Substance_ID"].astype(str).str.strip() == sub_ref_id]
-       return [
-            {
-                "synonym": row["Substance_Sourcing_Local_Name"],
-                "source": row.get("Substance_Sourcing_Mapping_Reference", "Not Available")
-            }
-            for _, row in filtered.iterrows()
-        ]
+ 
+class BatchMatchRequest(BaseModel):
+    queries: List[str]
+ 
+ 
+class BatchMatchResult(BaseModel):
+    query: str
+    results: List[MatchResult]
+ 
+ 
+def build_match_result(sub_ref_id: str, matched_text: str, match_type: str, score: int, snap=None) -> MatchResult:
+    snap = snap or snapshot
+    started = time.perf_counter()
+    row = snap.index.reference(sub_ref_id)
+    # Precomputed per-substance record (see SubstanceIndex.records)
+    record = snap.index.record(sub_ref_id)
+    result = MatchResult(
+        substance_reference_id=row["Substance_Reference_ID"],
+        substance_id=row["Substance_ID"],
+        matched_text=matched_text,
+        match_type=match_type,
+        score=score,
+        substance_name=row["Substance_Name"],
+        description=row["Substance_Description"],
+        weight=row["Substance_Weight"],
+        total_synonyms_matched=record.synonym_count,
+        weight_tag_title=row["Weighting_Tag_Title"],
+        synonym_source=record.synonym_source_pairs,
+        synonym_sources=record.synonym_sources
+    )
+    MATCH_STAGE_LATENCY.observe(time.perf_counter() - started, "build_result")
+    return result
+ 
+ 
+def no_match_result(query: str) -> MatchResult:
+    return MatchResult(
+        substance_reference_id="NOT FOUND",
+        substance_id="NOT FOUND",
+        matched_text=query,
+        match_type="no match",
+        score=0,
+        substance_name="Not Available",
+        description="Not Available",
+        weight="Not Available",
+        total_synonyms_matched=0,
+        weight_tag_title="Not Available",
+        synonym_source=[],
+        synonym_sources=[]
+    )
+ 
+ 
+def exact_matches(query: str, seen_ref_ids: set, snap=None) -> List[MatchResult]:
+    snap = snap or snapshot
+    query_lower = normalize_key(query)
+    results = []
  
     # --------- Exact CAS match ----------
-    for _, row in ref_df[ref_df["Substance_ID"].str.lower() == query_lower].iterrows():
-        if row["Substance_Reference_ID"] not in seen_ref_ids:
-            results.append(MatchResult(
-                substance_reference_id=row["Substance_Reference_ID"],
-                substance_id=row["Substance_ID"],
-                matched_text=query,
-                match_type="exact-CAS",
-                score=100,
-                substance_name=row["Substance_Name"],
-                description=row["Substance_Description"],
-                weight=row["Substance_Weight"],
-                total_synonyms_matched=get_synonym_count(row["Substance_Reference_ID"]),
-                weight_tag_title=row["Weighting_Tag_Title"],
-                synonym_source=get_synonym_source_pairs(row["Substance_Reference_ID"]),
-                synonym_sources=get_all_synonym_sources(row["Substance_Reference_ID"])
-            ))
-            seen_ref_ids.add(row["Substance_Reference_ID"])
+    with MATCH_STAGE_LATENCY.time("exact_cas"):
+        for sub_ref_id in snap.index.lookup_cas(query_lower):
+            if sub_ref_id not in seen_ref_ids:
+                results.append(build_match_result(sub_ref_id, query, "exact-CAS", 100, snap))
+                seen_ref_ids.add(sub_ref_id)
  
     # --------- Exact Substance Name match ----------
-    for _, row in ref_df[ref_df["Substance_Name"].str.lower() == query_lower].iterrows():
-        if row["Substance_Reference_ID"] not in seen_ref_ids:
-            results.append(MatchResult(
-                substance_reference_id=row["Substance_Reference_ID"],
-                substance_id=row["Substance_ID"],
-                matched_text=query,
-                match_type="exact-substance name",
-                score=100,
-                substance_name=row["Substance_Name"],
-                description=row["Substance_Description"],
-                weight=row["Substance_Weight"],
-                total_synonyms_matched=get_synonym_count(row["Substance_Reference_ID"]),
-                weight_tag_title=row["Weighting_Tag_Title"],
-                synonym_source=get_synonym_source_pairs(row["Substance_Reference_ID"]),
-                synonym_sources=get_all_synonym_sources(row["Substance_Reference_ID"])
-            ))
-            seen_ref_ids.add(row["Substance_Reference_ID"])
+    with MATCH_STAGE_LATENCY.time("exact_name"):
+        for sub_ref_id in snap.index.lookup_name(query_lower, query):
+            if sub_ref_id not in seen_ref_ids:
+                results.append(build_match_result(sub_ref_id, query, "exact-substance name", 100, snap))
+                seen_ref_ids.add(sub_ref_id)
  
     # --------- Exact Synonym match ----------
-    synonym_matches = combined_df[combined_df["Substance_Sourcing_Local_Name"].str.lower() == query_lower]
-    for _, row in synonym_matches.head(3).iterrows():
-        if row["Substance_Reference_ID"] != "Not Available" and row["Substance_Reference_ID"] not in seen_ref_ids:
-            results.append(MatchResult(
-                substance_reference_id=row["Substance_Reference_ID"],
-                substance_id=row["Substance_ID"],
-                matched_text=row["Substance_Sourcing_Local_Name"],
-                match_type="exact-synonym",
-                score=100,
-                substance_name=row["Substance_Name"],
-                description=row["Substance_Description"],
-                weight=row["Substance_Weight"],
-                total_synonyms_matched=get_synonym_count(row["Substance_Reference_ID"]),
-                weight_tag_title=row["Weighting_Tag_Title"],
-                synonym_source=get_synonym_source_pairs(row["Substance_Reference_ID"]),
-                synonym_sources=get_all_synonym_sources(row["Substance_Reference_ID"]),
-            ))
-            seen_ref_ids.add(row["Substance_Reference_ID"])
+    with MATCH_STAGE_LATENCY.time("exact_synonym"):
+        for sub_ref_id, synonym in snap.index.lookup_synonym(query_lower, query)[:3]:
+            if sub_ref_id != "Not Available" and sub_ref_id not in seen_ref_ids:
+                results.append(build_match_result(sub_ref_id, synonym, "exact-synonym", 100, snap))
+                seen_ref_ids.add(sub_ref_id)
+ 
+    return results
+ 
+ 
+def cas_matches(query: str, cas: CasNumber, snap=None) -> Tuple[List[MatchResult], str]:
+    """
+    Matching for CAS-shaped queries (see cas_number.py), returning (results, outcome):
+    the CAS index on the canonical number, then CAS numbers stored as synonyms, then,
+    for a wrong check digit only, the valid CAS numbers one typo away. The name and
+    fuzzy scans are skipped, they cannot find a CAS number.
+    """
+    snap = snap or snapshot
+    seen_ref_ids = set()
+    results = []
+ 
+    with MATCH_STAGE_LATENCY.time("exact_cas"):
+        for sub_ref_id in snap.index.lookup_cas(cas.canonical):
+            if sub_ref_id not in seen_ref_ids:
+                results.append(build_match_result(sub_ref_id, query, "exact-CAS", 100, snap))
+                seen_ref_ids.add(sub_ref_id)
+    if results:
+        return results, "exact"
+ 
+    with MATCH_STAGE_LATENCY.time("exact_synonym"):
+        for key in dict.fromkeys([cas.canonical, normalize_key(query)]):
+            for sub_ref_id, synonym in snap.index.lookup_synonym(key, query)[:3]:
+                if sub_ref_id != "Not Available" and sub_ref_id not in seen_ref_ids:
+                    results.append(build_match_result(sub_ref_id, synonym, "exact-synonym", 100, snap))
+                    seen_ref_ids.add(sub_ref_id)
+    if results or cas.valid:
+        return results, "exact" if results else "no match"
+ 
+    # --------- Near-CAS: bounded typo candidates, best first ----------
+    with MATCH_STAGE_LATENCY.time("near_cas"):
+        for candidate, score in near_cas(cas):
+            for sub_ref_id in snap.index.lookup_cas(candidate):
+                if sub_ref_id not in seen_ref_ids:
+                    results.append(build_match_result(sub_ref_id, candidate, "near-CAS", score, snap))
+                    seen_ref_ids.add(sub_ref_id)
+            if len(results) >= 3:
+                break
+    return results[:3], "near cas" if results else "no match"
+ 
+ 
+def fuzzy_hits(query: str, snap=None):
+    snap = snap or snapshot
+    with MATCH_STAGE_LATENCY.time("fuzzy_name"):
+        name_hits = snap.substance_name_engine.extract(query, limit=10)
+    with MATCH_STAGE_LATENCY.time("fuzzy_synonym"):
+        synonym_hits = snap.synonym_engine.extract(query, limit=10)
+    return name_hits, synonym_hits
+ 
  
+def fuzzy_hits_many(queries: List[str], snap=None):
+    snap = snap or snapshot
+    with MATCH_STAGE_LATENCY.time("fuzzy_name"):
+        name_hits = snap.substance_name_engine.extract_many(queries, limit=10)
+    with MATCH_STAGE_LATENCY.time("fuzzy_synonym"):
+        synonym_hits = snap.synonym_engine.extract_many(queries, limit=10)
+    return list(zip(name_hits, synonym_hits))
+ 
+ 
+def fuzzy_matches(fuzzy_name_matches, fuzzy_synonym_matches, seen_ref_ids: set, snap=None) -> List[MatchResult]:
+    with MATCH_STAGE_LATENCY.time("fuzzy_rank"):
+        return _fuzzy_matches(fuzzy_name_matches, fuzzy_synonym_matches, seen_ref_ids, snap or snapshot)
+ 
+ 
+def _fuzzy_matches(fuzzy_name_matches, fuzzy_synonym_matches, seen_ref_ids: set, snap) -> List[MatchResult]:
     # --------- Fuzzy Matching with score-first, then type-priority ---------
-    if not results:
-        substance_name_pool = ref_df["Substance_Name"].dropna().unique()
-        synonym_pool = combined_df["Substance_Sourcing_Local_Name"].dropna().unique()
+    fuzzy_candidates = []
  
-        fuzzy_candidates = []
+    # Fuzzy match on Substance Name
+    for match_text, score in fuzzy_name_matches:
+        for sub_ref_id in snap.index.lookup_name(normalize_key(match_text), match_text):
+            fuzzy_candidates.append({
+                "type": "fuzzy-substance name",
+                "score": score,
+                "text": match_text,
+                "sub_ref_id": sub_ref_id
+            })
  
-        # Fuzzy match on Substance Name
-        fuzzy_name_matches = process.extract(query, substance_name_pool, limit=10)
-        for match_text, score in fuzzy_name_matches:
-            match_text_lower = match_text.lower()
-            matched_rows = ref_df[ref_df["Substance_Name"].str.lower() == match_text_lower]
-            for _, r in matched_rows.iterrows():
+    # Fuzzy match on Synonym
+    for match_text, score in fuzzy_synonym_matches:
+        for sub_ref_id, _ in snap.index.lookup_synonym(normalize_key(match_text), match_text):
+            if sub_ref_id != "Not Available":
                 fuzzy_candidates.append({
-                    "type": "fuzzy-substance name",
+                    "type": "fuzzy-synonym",
                     "score": score,
                     "text": match_text,
-                    "sub_ref_id": r["Substance_Reference_ID"],
-                    "sub_id": r["Substance_ID"],
-                    "name": r["Substance_Name"],
-                    "desc": r["Substance_Description"],
-                    "weight": r["Substance_Weight"],
-                    "tag_title": r["Weighting_Tag_Title"]
+                    "sub_ref_id": sub_ref_id
                 })
  
-        # Fuzzy match on Synonym
-        fuzzy_synonym_matches = process.extract(query, synonym_pool, limit=10)
-        for match_text, score in fuzzy_synonym_matches:
-            match_text_lower = match_text.lower()
-            matched_rows = combined_df[combined_df["Substance_Sourcing_Local_Name"].str.lower() == match_text_lower]
-            for _, r in matched_rows.iterrows():
-                if r["Substance_Reference_ID"] != "Not Available":
-                    fuzzy_candidates.append({
-                        "type": "fuzzy-synonym",
-                        "score": score,
-                        "text": match_text,
-                        "sub_ref_id": r["Substance_Reference_ID"],
-                        "sub_id": r["Substance_ID"],
-                        "name": r["Substance_Name"],
-                        "desc": r["Substance_Description"],
-                        "weight": r["Substance_Weight"],
-                        "tag_title": r["Weighting_Tag_Title"]
-                    })
- 
-        # Sort by score descending, then by type priority
-        type_priority = {
-            "fuzzy-substance name": 1,
-            "fuzzy-synonym": 2
-        }
- 
-        fuzzy_sorted = sorted(
-            fuzzy_candidates,
-            key=lambda x: (-x["score"], type_priority.get(x["type"], 99))
-        )
- 
-        fuzzy_results_added = 0
-        for item in fuzzy_sorted:
-            if item["sub_ref_id"] in seen_ref_ids:
+    # Sort by score descending, then by type priority
+    type_priority = {
+        "fuzzy-substance name": 1,
+        "fuzzy-synonym": 2
+    }
+ 
+    fuzzy_sorted = sorted(
+        fuzzy_candidates,
+        key=lambda x: (-x["score"], type_priority.get(x["type"], 99))
+    )
+ 
+    results = []
+    for item in fuzzy_sorted:
+        if item["sub_ref_id"] in seen_ref_ids:
+            continue
+        results.append(build_match_result(item["sub_ref_id"], item["text"], item["type"], item["score"], snap))
+        seen_ref_ids.add(item["sub_ref_id"])
+        if len(results) >= 3:
+            break
+    return results
+ 
+ 
+def match_query(query: str, hits=None, snap=None) -> List[MatchResult]:
+    """
+    Runs the six matching scenarios for one query (CAS-shaped queries take the
+    cas_matches fast path instead). `hits` lets batch callers pass fuzzy (name,
+    synonym) hits computed up front instead of scoring here.
+    """
+    snap = snap or snapshot
+    cas = parse_cas(query)
+    if cas is not None:
+        results, outcome = cas_matches(query, cas, snap)
+    else:
+        seen_ref_ids = set()
+        results = exact_matches(query, seen_ref_ids, snap)
+        outcome = "exact"
+ 
+        if not results:
+            outcome = "fuzzy"
+            fuzzy_name_matches, fuzzy_synonym_matches = hits if hits is not None else fuzzy_hits(query, snap)
+            results = fuzzy_matches(fuzzy_name_matches, fuzzy_synonym_matches, seen_ref_ids, snap)
+ 
+    # --------- No Match Fallback ----------
+    if not results:
+        outcome = "no match"
+        with MATCH_STAGE_LATENCY.time("fallback"):
+            results = [no_match_result(query)]
+    record_match_outcome(outcome, results)
+    return results
+ 
+ 
+def record_match_outcome(outcome: str, results: List[MatchResult]):
+    MATCH_QUERIES.inc(outcome)
+    for match_type in {result.match_type for result in results}:
+        MATCH_SCENARIO_HITS.inc(match_type)
+ 
+ 
+def match_queries(queries: List[str], fuzzy_map=None, snap=None) -> List[List[MatchResult]]:
+    """
+    Batch version of match_query. Duplicate queries are resolved once, the exact
+    scenarios run first for everything, and only the misses go to `fuzzy_map`
+    (queries -> [(name hits, synonym hits), ...], default fuzzy_hits_many) in a single call.
+    """
+    snap = snap or snapshot
+    fuzzy_map = fuzzy_map or (lambda misses: fuzzy_hits_many(misses, snap))
+    unique_queries = list(dict.fromkeys(queries))
+    resolved = {}
+    misses = []
+    for query in unique_queries:
+        if parse_cas(query) is not None:
+            resolved[query] = match_query(query, snap=snap)  # CAS fast path, never scored fuzzily
+            continue
+        exact = exact_matches(query, set(), snap)
+        if exact:
+            resolved[query] = exact
+            record_match_outcome("exact", exact)
+        else:
+            misses.append(query)
+ 
+    if misses:
+        for query, hits in zip(misses, fuzzy_map(misses)):
+            resolved[query] = match_query(query, hits=hits, snap=snap)  # re-runs the (cheap, missing) exact stages
+ 
+    return [resolved[query] for query in queries]
+ 
+ 
+# --------- Result cache for interactive /match calls ----------
+match_cache = MatchCache()
+# matched_text echoes the caller's query for these types; the others carry a stored name/synonym
+QUERY_STAMPED_TYPES = {"exact-CAS", "exact-substance name", "no match"}
+ 
+ 
+def cached_match_query(query: str, snap=None) -> List[MatchResult]:
+    """match_query memoized on the case-folded query and the data version (see match_cache.py)."""
+    snap = snap or snapshot
+    version = snap.version  # read once: the results are stored under the version they were computed on
+    # Not the canonical key: spelling variants of one key can report different synonyms (see literal_first)
+    key = query.strip().casefold()
+    results = match_cache.get(version, key)
+    if results is None:
+        results = match_query(query, snap=snap)
+        match_cache.put(version, key, results)
+        return results
+    return [
+        result.model_copy(update={"matched_text": query}) if result.match_type in QUERY_STAMPED_TYPES else result
+        for result in results
+    ]
+ 
+ 
+# --------- Metrics (Prometheus text format, see metrics.py) ----------
+if METRICS_ENABLED:
+    @app.middleware("http")
+    async def record_request_metrics(request: Request, call_next):
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # Route templates (not raw paths) keep the label set bounded
+            route = request.scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            HTTP_LATENCY.observe(time.perf_counter() - started, request.method, path)
+            HTTP_REQUESTS.inc(request.method, path, str(status))
+ 
+ 
+@registry.collector
+def collect_cache_and_pool_metrics():
+    stats = match_cache.stats()
+    yield "match_cache_hits_total", "counter", "/match result cache hits.", [({}, stats["hits"])]
+    yield "match_cache_misses_total", "counter", "/match result cache misses.", [({}, stats["misses"])]
+    yield "match_cache_evictions_total", "counter", "/match result cache LRU evictions.", [({}, stats["evictions"])]
+    yield "match_cache_entries", "gauge", "Entries in the /match result cache.", [({}, stats["entries"])]
+    snap = snapshot
+    pools = {"substance_name": snap.substance_name_engine, "synonym": snap.synonym_engine}
+    yield ("fuzzy_candidates_scored_total", "counter",
+           "Fuzzy candidates scored, by pool (resets when a reload swaps the snapshot).",
+           [({"pool": pool}, engine.candidates_scored) for pool, engine in pools.items()])
+    yield ("fuzzy_pool_size", "gauge", "Choices in each fuzzy pool.",
+           [({"pool": pool}, len(engine)) for pool, engine in pools.items()])
+ 
+ 
+# --------- Profiling (opt-in with PROFILING_ENABLED=1, see profiling.py) ----------
+if PROFILING_ENABLED:
+    @app.middleware("http")
+    async def profile_request(request: Request, call_next):
+        if not profiling.requested(request.url.path, request.headers, request.query_params):
+            return await call_next(request)
+        token = profiling.start()
+        started = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            label = f"{request.method} {request.url.path}?{request.url.query}"
+            profile_id = profiling.finish(token, label)
+        response.headers["X-Profile-Id"] = profile_id
+        response.headers["X-Profile-Seconds"] = f"{time.perf_counter() - started:.6f}"
+        print(f"⏱️ Profiled {label} -> {profile_id}")
+        return response
+ 
+    @app.get("/debug/profiles")
+    def list_profiles():
+        return profiling.list_profiles()
+ 
+    @app.get("/debug/profiles/{profile_id}")
+    def get_profile(profile_id: str, format: str = Query("prof")):
+        path = profiling.profile_path(profile_id, format)
+        if path is None:
+            raise HTTPException(status_code=404, detail=f"No {format} profile '{profile_id}'")
+        media_type = "text/plain" if format == "collapsed" else "application/octet-stream"
+        return FileResponse(path, media_type=media_type, filename=path.name)
+ 
+ 
+@app.get("/metrics")
+def get_metrics():
+    return Response(content=registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+ 
+ 
+@app.get("/version")
+def get_data_version():
+    """Data version of the loaded model; changes on every edit or reload (clients key their caches on it)."""
+    return {"data_version": snapshot.version, "storage_backend": STORAGE_BACKEND}
+ 
+ 
+@app.get("/match", response_model=List[MatchResult])
+@profiled
+def match_substance(query: str = Query(...)):
+    if PROFILING_ENABLED and profiling.active():
+        return match_query(query)  # a cache hit would leave nothing to profile
+    return cached_match_query(query)
+ 
+ 
+@app.get("/match/full", response_model=List[FullMatchResult])
+def match_substance_full(query: str = Query(...)):
+    """/match plus each card's synonym list, so the frontend renders a search with one round-trip."""
+    snap = snapshot
+    synonyms_by_id = {}
+    results = []
+    for result in cached_match_query(query, snap):
+        ref_id = result.substance_reference_id
+        if ref_id not in synonyms_by_id:
+            # The card's own group of /synonyms_lookup?term=<name> (several substances can share a name)
+            related = snap.related_synonyms([ref_id]) if result.match_type != "no match" else []
+            synonyms_by_id[ref_id] = related[0]["Substance_Sourcing_Local_Name"] if related else []
+        results.append(FullMatchResult(**result.model_dump(), synonyms=synonyms_by_id[ref_id]))
+    return results
+ 
+ 
+@app.post("/match/batch", response_model=List[BatchMatchResult])
+def match_substance_batch(request: BatchMatchRequest):
+    return [
+        BatchMatchResult(query=query, results=results)
+        for query, results in zip(request.queries, match_queries(request.queries))
+    ]
+ 
+ 
+class _LineFeed:
+    """Lines pushed in as the body arrives, pulled by the one csv.reader of an upload."""
+ 
+    def __init__(self):
+        self.lines = deque()
+ 
+    def __iter__(self):
+        return self
+ 
+    def __next__(self):
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+ 
+ 
+def _upload_error(line_number: int, message: str) -> HTTPException:
+    return HTTPException(status_code=422, detail=f"Line {line_number}: {message}")
+ 
+ 
+JSON_TYPE_NAMES = {bool: "boolean", int: "number", float: "number", type(None): "null", list: "array", dict: "object"}
+ 
+ 
+def _upload_query(value, line_number: int) -> str:
+    # Same rule as /match/batch, whose List[str] body rejects numbers, nulls and objects
+    if not isinstance(value, str):
+        raise _upload_error(line_number, f"query must be a string, got {JSON_TYPE_NAMES.get(type(value), 'a non-string')}")
+    return value
+ 
+ 
+async def _iter_upload_lines(request: Request):
+    """Yields (line number, decoded line with its line ending) as the body arrives."""
+    buffer = b""
+    line_number = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *complete, buffer = buffer.split(b"\n")
+        for line in complete:
+            line_number += 1
+            yield line_number, _decode_upload_line(line + b"\n", line_number)
+    if buffer:
+        yield line_number + 1, _decode_upload_line(buffer, line_number + 1)
+ 
+ 
+def _decode_upload_line(line: bytes, line_number: int) -> str:
+    try:
+        return line.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise _upload_error(line_number, "not valid UTF-8")
+ 
+ 
+async def _iter_upload_queries(request: Request):
+    """
+    Yields queries from a streamed CSV (`query` column, else the first column) or NDJSON body.
+    Malformed lines and non-string queries raise a 422 HTTPException naming the line.
+    """
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        async for line_number, line in _iter_upload_lines(request):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise _upload_error(line_number, f"invalid JSON ({e.msg})")
+            if isinstance(item, dict):
+                if "query" not in item:
+                    raise _upload_error(line_number, 'expected a "query" field')
+                item = item["query"]
+            yield _upload_query(item, line_number)
+        return
+ 
+    # One reader over the whole body, so quoted fields may span lines. It is only advanced
+    # once the lines fed to it close every quote, i.e. end on a record boundary.
+    feed = _LineFeed()
+    reader = csv.reader(feed)
+    query_column = None
+    quotes = 0
+    last_line = 0
+    async for last_line, line in _iter_upload_lines(request):
+        feed.lines.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+        quotes = 0
+        while feed.lines:
+            line_number = reader.line_num + 1
+            try:
+                row = next(reader, None)
+            except csv.Error as e:
+                raise _upload_error(line_number, f"invalid CSV ({e})")
+            if not row or not any(cell.strip() for cell in row):
+                continue
+            if query_column is None:
+                normalized = [normalize_key(col) for col in row]
+                query_column = normalized.index("query") if "query" in normalized else 0
                 continue
-            results.append(MatchResult(
-                substance_reference_id=item["sub_ref_id"],
-                substance_id=item["sub_id"],
-                matched_text=item["text"],
-                match_type=item["type"],
-                score=item["score"],
-                substance_name=item["name"],
-                description=item["desc"],
-                weight=item["weight"],
-                total_synonyms_matched=get_synonym_count(item["sub_ref_id"]),
-                weight_tag_title=item["tag_title"],
-                synonym_source=get_synonym_source_pairs(item["sub_ref_id"]) ,
-                synonym_sources=get_all_synonym_sources(item["sub_ref_id"])
-            ))
-            seen_ref_ids.add(item["sub_ref_id"])
-            fuzzy_results_added += 1
-            if fuzzy_results_added >= 3:
+            yield row[query_column].strip() if query_column < len(row) else ""
+    if quotes % 2:
+        raise _upload_error(reader.line_num + 1 if feed.lines else last_line, "unterminated quoted field")
+ 
+ 
+async def _read_upload_chunk(queries, size: int) -> Tuple[List[str], Optional[HTTPException]]:
+    """Up to `size` queries from the upload, and the error that cut the chunk short (if any)."""
+    chunk = []
+    try:
+        while len(chunk) < size:
+            chunk.append(await queries.__anext__())
+    except StopAsyncIteration:
+        pass
+    except HTTPException as e:
+        return chunk, e
+    return chunk, None
+ 
+ 
+class _UploadResponse(StreamingResponse):
+    """
+    StreamingResponse whose body generator reads the request body while it streams.
+    The stock response listens for http.disconnect on `receive` meanwhile (ASGI spec < 2.4),
+    which would swallow the body chunks; here the generator's own reads notice a disconnect.
+    """
+ 
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+ 
+ 
+@app.post("/match/batch/upload")
+async def match_substance_batch_upload(request: Request, chunk_size: int = Query(500, ge=1)):
+    """
+    Streamed variant of /match/batch: the body is a CSV with a header row or NDJSON
+    ({"query": ...} or a JSON string per line), parsed as it arrives. Every `chunk_size`
+    queries are matched and their results streamed back as NDJSON, one {"query", "results"}
+    object per input line, while the rest of the body is still being read.
+ 
+    A malformed line or non-string query in the first chunk is a 422 naming the line.
+    Once results are streaming the status is already sent, so a later one ends the
+    stream with an {"error", "status_code"} line after the results of the lines before it.
+    """
+    queries = _iter_upload_queries(request)
+    chunk, error = await _read_upload_chunk(queries, chunk_size)
+    if error is not None:
+        raise error
+    snap = snapshot
+ 
+    async def stream_results():
+        nonlocal chunk, error
+        while chunk:
+            results = await run_in_threadpool(match_queries, chunk, None, snap)
+            yield "".join(
+                BatchMatchResult(query=query, results=query_results).model_dump_json() + "\n"
+                for query, query_results in zip(chunk, results)
+            )
+            if error is not None or len(chunk) < chunk_size:
                 break
-    # -------------------- source ----------------------
-    
-    # --------- Final priority-based sorting ----------
-    if results:
-        return results
+            chunk, error = await _read_upload_chunk(queries, chunk_size)
+        if error is not None:
+            yield json.dumps({"error": error.detail, "status_code": error.status_code}) + "\n"
  
-    # --------- No Match Fallback ----------
-    return [MatchResult(
-        substance_reference_id="NOT FOUND",
-        substance_id="NOT FOUND",
-        matched_text=query,
-        match_type="no match",
-        score=0,
-        substance_name="Not Available",
-        description="Not Available",
-        weight="Not Available",
-        total_synonyms_matched=0,
-        weight_tag_title="Not Available",
-        synonym_source="Not Available",
-        synonym_sources="Not Available"
-        
-    )]
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
 #------------------Synonyms------------------------------
+def related_synonyms_for(term: str, snap=None) -> List[dict]:
+    """Synonym groups of every substance whose name or synonym equals `term`."""
+    snap = snap or snapshot
+    key = normalize_key(term)
+ 
+    matched_ref_ids = snap.index.lookup_name(key, term)
+    synonym_matched_ids = [sub_ref_id for sub_ref_id, _ in snap.index.lookup_synonym(key, term)]
+ 
+    all_ids = list(set(matched_ref_ids + synonym_matched_ids))
+    return snap.related_synonyms(all_ids) if all_ids else []
+ 
+ 
 @app.get("/synonyms_lookup")
 def get_related_synonyms(term: str = Query(...)):
-    term = term.strip().lower()
+    related = related_synonyms_for(term)
+    if not related:
+        return {"found": False, "term": normalize_key(term), "synonyms": []}
+    return related
  
-    matched_ref_ids = ref_df[ref_df["Substance_Name"].str.lower() == term]["Substance_Reference_ID"].tolist()
-    synonym_matched_ids = combined_df[combined_df["Substance_Sourcing_Local_Name"].str.lower() == term]["Substance_Reference_ID"].tolist()
  
-    all_ids = list(set(matched_ref_ids + synonym_matched_ids))
+@app.get("/cache/stats")
+def get_cache_stats():
+    return {"match": match_cache.stats()}
+ 
+ 
+#------------------Token search (SQLite FTS5)------------------------------
+@app.get("/search")
+def token_search(q: str = Query(...), limit: int = Query(20, ge=1, le=200)):
+    if STORAGE_BACKEND != "sqlite":
+        raise HTTPException(status_code=501, detail="Token search needs STORAGE_BACKEND=sqlite")
+    return snapshot.store.search(q, limit=limit)
+ 
+ 
+def compute_synonym_insights(snap=None) -> dict:
+    """Builds the /synonyms analytics payload from the loaded tables."""
+    snap = snap or snapshot
+    tables = snap.tables
+    ref_df = snap.ref_df.copy()
+ 
+    # Per-synonym / per-substance counts are maintained incrementally by SynonymStats
+    # (same frames the groupbys on Substance_Sourcing produced)
+    synonyms_per_substance = snap.stats.synonyms_per_substance_frame(unique=False)
+ 
+    # Unique synonym → # of unique substances it maps to
+    synonym_counts = snap.stats.synonym_counts_frame()
+ 
+    multi_substance_synonyms = synonym_counts[synonym_counts["Distinct Substance Count"] > 1]
+    single_substance_synonyms = synonym_counts[synonym_counts["Distinct Substance Count"] == 1]
+ 
+    top_ambiguous = multi_substance_synonyms.sort_values("Distinct Substance Count", ascending=False).head(10)
+ 
+    # Synonym Distribution by how many substances they map to
+    dist_df = synonym_counts["Distinct Substance Count"].value_counts().reset_index()
+    dist_df.columns = ["Mapped Substances", "Synonym Count"]
+    dist_df = dist_df.sort_values("Mapped Substances")
+ 
+    # Substances with Most Synonyms
+    top_substances = (
+        snap.stats.synonyms_per_substance_frame(unique=True)
+        .sort_values("Synonym Count", ascending=False)
+        .merge(ref_df, left_on="(FK) Substance_ID", right_on="Substance_Reference_ID", how="left")
+        [["Substance_ID", "Substance_Name", "Synonym Count"]]
+        .head(10)
+    )
+    # Sheets from the already-loaded data model
+    substance_type_df = tables["Substance_Type"].apply(lambda x: x.astype(str).str.strip())  # Correct sheet
+    source_type_df = tables["Substance_Sourcing_Type"].apply(lambda x: x.astype(str).str.strip())
+    weight_df = tables["Substance_Weighting_Tag"].apply(lambda x: x.astype(str).str.strip())
+    tag_map_df = tables["Weighting_Tag"].apply(lambda x: x.astype(str).str.strip())
+ 
+    # Ensure the 'Substance_Type_Title' exists in the Substance_Type sheet
+    if "Substance_Type_Title" not in substance_type_df.columns:
+        raise ValueError("'Substance_Type_Title' column is missing from Substance_Type sheet")
+ 
+    # Now referencing the correct sheet for Substance_Type_ID and Substance_Type_Title
+    substance_type_df["Substance_Type_ID"] = substance_type_df["Substance_Type_ID"].astype(str).str.strip()
+ 
+    # Now proceed with your analysis
+    ref_df["_Substance_Type_ID"] = ref_df.get("(FK) Substance_Type_ID", "Not Available").astype(str).str.strip()
+ 
+    # Merge the data based on the correct reference
+    ref_with_type = ref_df.merge(
+        substance_type_df,
+        left_on="_Substance_Type_ID",
+        right_on="Substance_Type_ID",
+        how="left"
+    )
+ 
+    substances_per_type = (
+        ref_with_type["Substance_Type_Title"]  # Correct column for title
+        .value_counts()
+        .reset_index()
+        .rename(columns={"index": "Substance Type", "Substance_Type_Title": "Count"})
+    )
+ 
+    # Continue with the rest of the analysis...
+    top_synonyms = (
+        synonyms_per_substance
+        .sort_values("Synonym Count", ascending=False)
+        .head(10)
+        .merge(ref_df, left_on="(FK) Substance_ID", right_on="Substance_Reference_ID", how="left")
+        [["Substance_ID", "Substance_Name", "Synonym Count"]]
+    )
+ 
+    # Substances per Weight Tag
+    tag_counts = weight_df["(FK) Weighting_Tag_ID"].value_counts().reset_index()
+    tag_counts.columns = ["Weighting_Tag_ID", "Count"]
+ 
+    weights_per_tag = tag_counts.merge(
+        tag_map_df[["Weighting_Tag_ID", "Weighting_Tag_Title"]],
+        on="Weighting_Tag_ID",
+        how="left"
+    ).rename(columns={"Weighting_Tag_Title": "Weight Tag"})
+ 
+    # Substances with Multiple Synonyms
+    multi_synonym_substances = (
+        synonyms_per_substance
+        .query("`Synonym Count` > 1")
+        .merge(ref_df, left_on="(FK) Substance_ID", right_on="Substance_Reference_ID", how="left")
+        [["Substance_ID", "Substance_Name", "Synonym Count"]]
+    ).pipe(lambda frame: frame.sample(n=min(10, len(frame)), random_state=1))
+ 
+    # Substances with Only One Synonym
+    single_synonym_substances = (
+        synonyms_per_substance
+        .query("`Synonym Count` == 1")
+        .merge(ref_df, left_on="(FK) Substance_ID", right_on="Substance_Reference_ID", how="left")
+        [["Substance_ID", "Substance_Name", "Synonym Count"]]
+    ).pipe(lambda frame: frame.sample(n=min(10, len(frame)), random_state=1))
+ 
+    # Calculate Synonym Count per Substance Type
+    ref_with_type["Synonym Count"] = ref_with_type["Substance_Reference_ID"].map(
+        synonyms_per_substance.set_index("(FK) Substance_ID")["Synonym Count"]
+    )
+ 
+    # Calculate Average Synonym Count per Type
+    avg_synonym_count_per_type = (
+        ref_with_type.groupby("Substance_Type_Title")["Synonym Count"]
+        .mean()
+        .reset_index(name="Synonym Count")
+    )
+ 
+    return {
+        "substances_per_type": substances_per_type.replace([pd.NA, None, float('inf'), float('-inf')], "Not Available").to_dict(orient="records"),
+        "top_synonyms": top_synonyms.replace([pd.NA, None, float('inf'), float('-inf')], "Not Available").to_dict(orient="records"),
+        "weights_per_tag": weights_per_tag.replace([pd.NA, None, float('inf'), float('-inf')], "Not Available").to_dict(orient="records"),
+        "multi_synonym_substances": multi_synonym_substances.replace([pd.NA, None, float('inf'), float('-inf')], "Not Available").to_dict(orient="records"),
+        "single_synonym_substances": single_synonym_substances.replace([pd.NA, None, float('inf'), float('-inf')], "Not Available").to_dict(orient="records"),
+        "avg_synonym_count_per_type": avg_synonym_count_per_type.replace([pd.NA, None, float('inf'), float('-inf')], "Not Available").to_dict(orient="records"),
+        "multi_substance_synonyms": multi_substance_synonyms.to_dict(orient="records"),
+        "single_substance_synonyms_count": int(single_substance_synonyms.shape[0]),
+        "multi_substance_synonyms_count": int(multi_substance_synonyms.shape[0]),
+        "ambiguous_top_10": top_ambiguous.to_dict(orient="records"),
+        "total_synonyms": int(synonym_counts.shape[0]),
+        "distribution": dist_df.to_dict(orient="records"),
+        "top_substances_by_synonyms": top_substances.to_dict(orient="records")
+    }
+ 
+ 
+# /synonyms payload, computed once per data version (serialized body + ETag)
+_insights_cache = {"version": None, "body": None, "etag": None}
+_insights_lock = threading.Lock()
+ 
+ 
+def invalidate_insights_cache():
+    """Drops the cached /synonyms payload; call whenever the data model changes."""
+    with _insights_lock:
+        _insights_cache.update(version=None, body=None, etag=None)
  
-    if not all_ids:
-        return {"found": False, "term": term, "synonyms": []}
  
-    related = combined_df[combined_df["Substance_Reference_ID"].isin(all_ids)]
+def cached_synonym_insights():
+    with _insights_lock:
+        snap = snapshot
+        if _insights_cache["version"] != snap.version or _insights_cache["body"] is None:
+            body = json.dumps(jsonable_encoder(compute_synonym_insights(snap))).encode("utf-8")
+            _insights_cache.update(
+                version=snap.version,
+                body=body,
+                etag='"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+            )
+        return _insights_cache["body"], _insights_cache["etag"]
  
-    grouped = related.groupby("Substance_Reference_ID").agg({
-        "Substance_Sourcing_Local_Name": lambda x: sorted(set(x.dropna())),
-        "Substance_ID": "first",
-        "Substance_Name": "first"
-    }).reset_index()
  
-    return grouped.to_dict(orient="records")
 @app.get("/synonyms")
-def get_synonym_insights():
-    
+@profiled
+def get_synonym_insights(request: Request):
     try:
- 
-        # Unique synonym → # of unique substances it maps to
-        synonym_counts = (
-            source_df.groupby("Substance_Sourcing_Local_Name")["(FK) Substance_ID"]
-            .nunique()
-            .reset_index(name="Distinct Substance Count")
-        )
- 
-        multi_substance_synonyms = synonym_counts[synonym_counts["Distinct Substance Count"] > 1]
-        single_substance_synonyms = synonym_counts[synonym_counts["Distinct Substance Count"] == 1]
- 
-        top_ambiguous = multi_substance_synonyms.sort_values("Distinct Substance Count", ascending=False).head(10)
- 
-        # Synonym Distribution by how many substances they map to
-        dist_df = synonym_counts["Distinct Substance Count"].value_counts().reset_index()
-        dist_df.columns = ["Mapped Substances", "Synonym Count"]
-        dist_df = dist_df.sort_values("Mapped Substances")
- 
-        # Substances with Most Synonyms
-        top_substances = (
-            source_df.groupby("(FK) Substance_ID")["Substance_Sourcing_Local_Name"]
-            .nunique()
-            .reset_index(name="Synonym Count")
-            .sort_values("Synonym Count", ascending=False)
-            .merge(ref_df, left_on="(FK) Substance_ID", right_on="Substance_Reference_ID", how="left")
-            [["Substance_ID", "Substance_Name", "Synonym Count"]]
-            .head(10)
-        )
-        # Load the correct sheets
-        substance_type_df = pd.read_excel(file_path, sheet_name="Substance_Type").apply(lambda x: x.astype(str).str.strip())  # Correct sheet
-        source_type_df = pd.read_excel(file_path, sheet_name="Substance_Sourcing_Type").apply(lambda x: x.astype(str).str.strip())
-        weight_df = pd.read_excel(file_path, sheet_name="Substance_Weighting_Tag").apply(lambda x: x.astype(str).str.strip())
-        tag_map_df = pd.read_excel(file_path, sheet_name="Weighting_Tag").apply(lambda x: x.astype(str).str.strip())
- 
-        # Ensure the 'Substance_Type_Title' exists in the Substance_Type sheet
-        if "Substance_Type_Title" not in substance_type_df.columns:
-            return JSONResponse(content={"error": "'Substance_Type_Title' column is missing from Substance_Type sheet"}, status_code=500)
- 
-        # Now referencing the correct sheet for Substance_Type_ID and Substance_Type_Title
-        substance_type_df["Substance_Type_ID"] = substance_type_df["Substance_Type_ID"].astype(str).str.strip()
- 
-        # Now proceed with your analysis
-        ref_df["_Substance_Type_ID"] = ref_df.get("(FK) Substance_Type_ID", "Not Available").astype(str).str.strip()
- 
-        # Merge the data based on the correct reference
-        ref_with_type = ref_df.merge(
-            substance_type_df,
-            left_on="_Substance_Type_ID",
-            right_on="Substance_Type_ID",
-            how="left"
-        )
- 
-        substances_per_type = (
-            ref_with_type["Substance_Type_Title"]  # Correct column for title
-            .value_counts()
-            .reset_index()
-            .rename(columns={"index": "Substance Type", "Substance_Type_Title": "Count"})
-        )
- 
-        # Continue with the rest of the analysis...
-        top_synonyms = (
-            source_df.groupby("(FK) Substance_ID")["Substance_Sourcing_Local_Name"]
-            .count()
-            .reset_index(name="Synonym Count")
-            .sort_values("Synonym Count", ascending=False)
-            .head(10)
-            .merge(ref_df, left_on="(FK) Substance_ID", right_on="Substance_Reference_ID", how="left")
-            [["Substance_ID", "Substance_Name", "Synonym Count"]]
-        )
- 
-        # Substances per Weight Tag
-        tag_counts = weight_df["(FK) Weighting_Tag_ID"].value_counts().reset_index()
-        tag_counts.columns = ["Weighting_Tag_ID", "Count"]
- 
-        weights_per_tag = tag_counts.merge(
-            tag_map_df[["Weighting_Tag_ID", "Weighting_Tag_Title"]],
-            on="Weighting_Tag_ID",
-            how="left"
-        ).rename(columns={"Weighting_Tag_Title": "Weight Tag"})
- 
-        # Substances with Multiple Synonyms
-        multi_synonym_substances = (
-            source_df.groupby("(FK) Substance_ID")["Substance_Sourcing_Local_Name"]
-            .count()
-            .reset_index(name="Synonym Count")
-            .query("`Synonym Count` > 1")
-            .merge(ref_df, left_on="(FK) Substance_ID", right_on="Substance_Reference_ID", how="left")
-            [["Substance_ID", "Substance_Name", "Synonym Count"]]
-        ).sample(n=min(10, len(source_df)), random_state=1)
- 
-        # Substances with Only One Synonym
-        single_synonym_substances = (
-            source_df.groupby("(FK) Substance_ID")["Substance_Sourcing_Local_Name"]
-            .count()
-            .reset_index(name="Synonym Count")
-            .query("`Synonym Count` == 1")
-            .merge(ref_df, left_on="(FK) Substance_ID", right_on="Substance_Reference_ID", how="left")
-            [["Substance_ID", "Substance_Name", "Synonym Count"]]
-        ).sample(n=min(10, len(source_df)), random_state=1)
- 
-        # Calculate Synonym Count per Substance Type
-        ref_with_type["Synonym Count"] = ref_with_type["Substance_Reference_ID"].map(
-            combined_df.groupby("(FK) Substance_ID")["Substance_Sourcing_Local_Name"].count()
-        )
- 
-        # Calculate Average Synonym Count per Type
-        avg_synonym_count_per_type = (
-            ref_with_type.groupby("Substance_Type_Title")["Synonym Count"]
-            .mean()
-            .reset_index(name="Synonym Count")
-        )
- 
-        return {
-            "substances_per_type": substances_per_type.replace([pd.NA, None, float('inf'), float('-inf')], "Not Available").to_dict(orient="records"),
-            "top_synonyms": top_synonyms.replace([pd.NA, None, float('inf'), float('-inf')], "Not Available").to_dict(orient="records"),
-            "weights_per_tag": weights_per_tag.replace([pd.NA, None, float('inf'), float('-inf')], "Not Available").to_dict(orient="records"),
-            "multi_synonym_substances": multi_synonym_substances.replace([pd.NA, None, float('inf'), float('-inf')], "Not Available").to_dict(orient="records"),
-            "single_synonym_substances": single_synonym_substances.replace([pd.NA, None, float('inf'), float('-inf')], "Not Available").to_dict(orient="records"),
-            "avg_synonym_count_per_type": avg_synonym_count_per_type.replace([pd.NA, None, float('inf'), float('-inf')], "Not Available").to_dict(orient="records"),
-            "multi_substance_synonyms": multi_substance_synonyms.to_dict(orient="records"),
-            "single_substance_synonyms_count": int(single_substance_synonyms.shape[0]),
-            "multi_substance_synonyms_count": int(multi_substance_synonyms.shape[0]),
-            "ambiguous_top_10": top_ambiguous.to_dict(orient="records"),
-            "total_synonyms": int(synonym_counts.shape[0]),
-            "distribution": dist_df.to_dict(orient="records"),
-            "top_substances_by_synonyms": top_substances.to_dict(orient="records")
- 
-            }
- 
- 
-        
+        if PROFILING_ENABLED and profiling.active():
+            # A cache hit would leave nothing to profile: compute (and serialize) this version afresh
+            body = json.dumps(jsonable_encoder(compute_synonym_insights())).encode("utf-8")
+            return Response(content=body, media_type="application/json", headers={"Cache-Control": "no-cache"})
+        body, etag = cached_synonym_insights()
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
  
     except Exception as e:
         print("❌ Error in /synonyms:", e)
         traceback.print_exc()
         return JSONResponse(status_code=500, content={"error": str(e)})
+ 
+ 
+# --------- Curation edits (applied incrementally, see data_snapshot.py) ----------
+class SynonymCreate(BaseModel):
+    substance_reference_id: str
+    synonym: str
+    source: Optional[str] = None
+ 
+ 
+class SynonymUpdate(BaseModel):
+    substance_reference_id: str
+    synonym: str
+    new_synonym: Optional[str] = None
+    new_source: Optional[str] = None
+ 
+ 
+class SubstanceCreate(BaseModel):
+    substance_id: str
+    substance_name: str
+    description: Optional[str] = None
+    weight: Optional[str] = None
+    weighting_tag_id: Optional[str] = None
+    substance_type_id: Optional[str] = None
+    substance_reference_id: Optional[str] = None
+ 
+ 
+class SubstanceUpdate(BaseModel):
+    substance_id: Optional[str] = None
+    substance_name: Optional[str] = None
+    description: Optional[str] = None
+    weight: Optional[str] = None
+    weighting_tag_id: Optional[str] = None
+    substance_type_id: Optional[str] = None
+ 
+ 
+# Serializes edits, and the reload swap, so an edit never builds on a replaced snapshot
+_edit_lock = threading.Lock()
+ 
+ 
+def edit_snapshot(edit):
+    """
+    Copy-on-write: runs `edit(draft)` on a draft of the serving snapshot and swaps the
+    draft in once it succeeds. Requests keep reading the snapshot they started with,
+    which an edit never touches; if `edit` raises, nothing is swapped in.
+    """
+    global snapshot
+    with _edit_lock:
+        draft = snapshot.draft()
+        result = edit(draft)
+        draft.flush()
+        snapshot = draft
+        return draft, result
+ 
+ 
+def apply_edit(edit: str, *args, **kwargs):
+    """Runs a DataSnapshot edit, maps its errors to HTTP codes and drops the cached insights."""
+    if not snapshot.editable:
+        raise HTTPException(status_code=501, detail=f"Edits are not supported with STORAGE_BACKEND={STORAGE_BACKEND}")
+    try:
+        snap, result = edit_snapshot(lambda draft: getattr(draft, edit)(*args, **kwargs))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    except EditValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    invalidate_insights_cache()
+    if isinstance(result, (dict, list)):
+        # Edited rows come straight from the tables; NaN cells are returned as null
+        rows = pd.DataFrame(result if isinstance(result, list) else [result]).astype(object)
+        rows = rows.where(rows.notna(), None).to_dict(orient="records")
+        result = rows if isinstance(result, list) else rows[0]
+    return {"data_version": snap.version, "result": jsonable_encoder(result)}
+ 
+ 
+@app.post("/synonyms/records")
+def add_synonym_record(record: SynonymCreate):
+    return apply_edit("add_synonym", record.substance_reference_id, record.synonym, record.source)
+ 
+ 
+@app.put("/synonyms/records")
+def update_synonym_record(update: SynonymUpdate):
+    return apply_edit(
+        "update_synonym", update.substance_reference_id, update.synonym,
+        new_synonym=update.new_synonym, new_source=update.new_source
+    )
+ 
+ 
+@app.delete("/synonyms/records")
+def delete_synonym_record(substance_reference_id: str = Query(...), synonym: str = Query(...)):
+    return apply_edit("delete_synonym", substance_reference_id, synonym)
+ 
+ 
+@app.post("/substances")
+def add_substance(record: SubstanceCreate):
+    return apply_edit(
+        "add_substance", record.substance_id, record.substance_name,
+        description=record.description, weight=record.weight, weighting_tag_id=record.weighting_tag_id,
+        substance_type_id=record.substance_type_id, sub_ref_id=record.substance_reference_id
+    )
+ 
+ 
+@app.put("/substances/{substance_reference_id}")
+def update_substance(substance_reference_id: str, update: SubstanceUpdate):
+    return apply_edit("update_substance", substance_reference_id, **update.model_dump())
+ 
+ 
+@app.delete("/substances/{substance_reference_id}")
+def delete_substance(substance_reference_id: str):
+    return apply_edit("delete_substance", substance_reference_id)
+ 
+ 
+# --------- Harvest sync (scraper output diffed into the model, see harvest_sync.py) ----------
+class HarvestRecord(BaseModel):
+    substance: str
+    synonym: str
+    cas: Optional[str] = None
+    source: Optional[str] = None
+ 
+ 
+class HarvestSyncRequest(BaseModel):
+    records: List[HarvestRecord]
+ 
+ 
+@app.post("/harvest/sync")
+def sync_harvest_records(request: HarvestSyncRequest, dry_run: bool = Query(False)):
+    if not snapshot.editable:
+        raise HTTPException(status_code=501, detail=f"Harvest sync is not supported with STORAGE_BACKEND={STORAGE_BACKEND}")
+    harvest = pd.DataFrame([record.model_dump() for record in request.records], columns=HARVEST_COLUMNS)
+    if dry_run:
+        return sync_harvest(snapshot, harvest, dry_run=True)
+    _, result = edit_snapshot(lambda draft: sync_harvest(draft, harvest))
+    if result["applied"]:
+        invalidate_insights_cache()
+    return result
+ 
+ 
+# --------- Hot reload (a new snapshot is built off to the side, then swapped in) ----------
+# Poll the workbook every DATA_MODEL_WATCH_SECONDS and reload when it changes (0 = off)
+DATA_MODEL_WATCH_SECONDS = float(os.getenv("DATA_MODEL_WATCH_SECONDS", "0"))
+_reload_lock = threading.Lock()
+ 
+ 
+def reload_snapshot(force: bool = False) -> dict:
+    """
+    Builds a snapshot from the current workbook and swaps it in with one reference
+    assignment; requests already running finish on the snapshot they started with.
+    Unless `force`, nothing is rebuilt while the workbook version is unchanged.
+    A reload drops in-memory curation edits (they are not written to the workbook).
+    """
+    global snapshot
+    if not _reload_lock.acquire(blocking=False):
+        raise RuntimeError("A reload is already in progress")
+    try:
+        started = time.perf_counter()
+        previous = snapshot
+        if not force and data_model_version() == previous.base_version:
+            return {"reloaded": False, "data_version": previous.version}
+ 
+        reloaded = load_snapshot()
+        with _edit_lock:
+            snapshot = reloaded
+        invalidate_insights_cache()
+        match_cache.clear(snapshot.version)
+        seconds = round(time.perf_counter() - started, 3)
+        print(f"✅ Reloaded data model {previous.version} -> {snapshot.version} in {seconds}s")
+        return {"reloaded": True, "data_version": snapshot.version, "previous_version": previous.version, "seconds": seconds}
+    finally:
+        _reload_lock.release()
+ 
+ 
+@app.post("/reload")
+def reload_data_model(force: bool = Query(False)):
+    try:
+        return reload_snapshot(force=force)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        # The previous snapshot stays in service
+        print("❌ Error in /reload:", e)
+        traceback.print_exc()
+        return JSONResponse(status_code=500, content={"error": str(e)})
+ 
+ 
+def _watch_workbook(interval: float):
+    source = workbook_source()
+    if source.startswith(("http://", "https://")):
+        print(f"⚠️ DATA_MODEL_WATCH_SECONDS ignored: {source} is not a local file")
+        return
+    last_mtime = os.stat(source).st_mtime
+    while True:
+        time.sleep(interval)
+        try:
+            mtime = os.stat(source).st_mtime
+            if mtime != last_mtime:
+                reload_snapshot()
+                last_mtime = mtime  # only after a successful reload, so a half-written file is retried
+        except Exception as e:
+            print(f"⚠️ Workbook watcher: {e}")
+ 
+ 
+if DATA_MODEL_WATCH_SECONDS > 0:
+    threading.Thread(target=_watch_workbook, args=(DATA_MODEL_WATCH_SECONDS,), daemon=True, name="workbook-watcher").start()
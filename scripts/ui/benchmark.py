@@ -0,0 +1,264 @@
+"""
+Benchmark suite for backend.py over synthetic data models.
+
+For each scale (Substance_Sourcing rows) a synthetic workbook is generated once
+(synthetic_data.py, cached under Data/.cache/bench) and the backend is measured
+in a fresh interpreter, so every scale gets a true cold start:
+
+- data_model_load_seconds: data_loader on its own (workbook parse + snapshot
+  write on the first run for a scale, unpickling afterwards)
+- cold_start_seconds: `import backend` in a fresh process (model load + indexes)
+- rss_mb / rss_startup_mb / peak_rss_mb: resident memory after startup, what
+  startup added, and the peak over the run
+- latency per endpoint and /match scenario (exact-CAS hit, synonym hit,
+  fuzzy (typo) miss, no-match), in-process through the FastAPI TestClient with
+  the /match result cache disabled
+
+    python benchmark.py --scales 1000,10000,100000 --output bench.json
+    python benchmark.py --scales 10000 --storage sqlite --compare bench.json
+
+The JSON report is meant to be kept and compared across commits (--compare).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+UI_DIR = Path(__file__).resolve().parent
+REPO_ROOT = UI_DIR.parents[1]
+BENCH_DIR = Path(os.getenv("BENCH_CACHE_DIR", REPO_ROOT / "Data" / ".cache" / "bench"))
+
+SCENARIOS = ["exact_cas", "synonym_hit", "fuzzy_miss", "no_match"]
+
+
+# ---------- Parent: one subprocess per scale ----------
+def prepare_scale(scale: int, query_count: int, seed: int) -> Path:
+    """Writes the synthetic workbook (once) and the scenario queries; returns the queries file."""
+    from synthetic_data import generate_tables, write_workbook
+
+    BENCH_DIR.mkdir(parents=True, exist_ok=True)
+    tables = generate_tables(scale, seed=seed)  # deterministic, so the cached workbook holds the same tables
+    path = BENCH_DIR / f"synthetic-{scale}-seed{seed}.xlsx"
+    if not path.exists():
+        started = time.perf_counter()
+        tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp.xlsx")
+        write_workbook(tables, str(tmp_path))
+        os.replace(tmp_path, path)
+        print(f"   generated {path.name} in {time.perf_counter() - started:.1f}s")
+    queries_path = BENCH_DIR / f"queries-{scale}-seed{seed}-{query_count}.json"
+    with open(queries_path, "w", encoding="utf-8") as handle:
+        json.dump(scenario_queries(tables, query_count, seed), handle)
+    return queries_path
+
+
+def run_child(step: str, queries_path: Path, env: dict) -> dict:
+    command = [sys.executable, __file__, "--child", step, "--child-queries", str(queries_path)]
+    completed = subprocess.run(command, env=env, cwd=UI_DIR, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"benchmark step '{step}' failed:\n{completed.stderr[-4000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run_scale(scale: int, args) -> dict:
+    queries_path = prepare_scale(scale, args.queries, args.seed)
+    workbook = BENCH_DIR / f"synthetic-{scale}-seed{args.seed}.xlsx"
+    env = dict(
+        os.environ,
+        DATA_MODEL_PATH=str(workbook),
+        DATA_MODEL_CACHE_DIR=str(BENCH_DIR / f"model-{scale}-seed{args.seed}"),
+        SQLITE_STORE_PATH=str(BENCH_DIR / f"store-{scale}-seed{args.seed}.sqlite"),
+        STORAGE_BACKEND=args.storage,
+        MATCH_CACHE_SIZE="0",
+        DATA_MODEL_WATCH_SECONDS="0",
+    )
+    # Two fresh interpreters: the data-model load (workbook parse on the first run), then the service
+    loaded = run_child("load", queries_path, env)
+    return {**run_child("serve", queries_path, env), **loaded}
+
+
+# ---------- Child: measure one scale ----------
+def percentiles(samples: list) -> dict:
+    ordered = sorted(samples)
+
+    def at(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": round(at(0.50), 3),
+        "p95_ms": round(at(0.95), 3),
+        "p99_ms": round(at(0.99), 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def typo(rng: random.Random, text: str) -> str:
+    """One or two character edits: misses the exact indexes, should still fuzzy-match."""
+    chars = list(text)
+    for _ in range(rng.randint(1, 2)):
+        position = rng.randrange(len(chars))
+        chars[position] = rng.choice("aeioulnrst")
+    return "".join(chars)
+
+
+def scenario_queries(tables, count: int, seed: int) -> dict:
+    rng = random.Random(seed + 1)
+    cas_numbers = tables["Substance_Reference"]["Substance_ID"].astype(str).tolist()
+    synonyms = tables["Substance_Sourcing"]["Substance_Sourcing_Local_Name"].astype(str).tolist()
+    return {
+        "exact_cas": [rng.choice(cas_numbers) for _ in range(count)],
+        "synonym_hit": [rng.choice(synonyms) for _ in range(count)],
+        "fuzzy_miss": [typo(rng, rng.choice(synonyms)) for _ in range(count)],
+        "no_match": ["".join(rng.choice("qxzjkvw") for _ in range(12)) for _ in range(count)],
+    }
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as handle:
+        for line in handle:
+            if line.startswith("VmRSS:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    return 0.0
+
+
+def timed_requests(client, path: str, param: str, values: list):
+    timings, match_types = [], {}
+    for value in values:
+        started = time.perf_counter()
+        response = client.get(path, params={param: value})
+        timings.append(time.perf_counter() - started)
+        response.raise_for_status()
+        if path == "/match":
+            for result in response.json():
+                match_types[result["match_type"]] = match_types.get(result["match_type"], 0) + 1
+    return timings, match_types
+
+
+def measure_load() -> dict:
+    from data_loader import load_data_model
+
+    started = time.perf_counter()
+    model = load_data_model()  # parses the workbook and writes the snapshot the first time, unpickles afterwards
+    return {
+        "synonyms": len(model.tables["Substance_Sourcing"]),
+        "substances": len(model.tables["Substance_Reference"]),
+        "data_model_load_seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def measure_service(queries: dict) -> dict:
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    import backend
+    cold_start = time.perf_counter() - started
+    from fastapi.testclient import TestClient
+
+    client = TestClient(backend.app)
+    query_count = len(queries["exact_cas"])
+    report = {
+        "storage_backend": backend.STORAGE_BACKEND,
+        "cold_start_seconds": round(cold_start, 3),
+        "rss_mb": rss_mb(),
+        "rss_startup_mb": round(rss_mb() - rss_before, 1),
+        "endpoints": {},
+    }
+
+    for scenario in SCENARIOS:
+        timings, match_types = timed_requests(client, "/match", "query", queries[scenario])
+        report["endpoints"][f"match_{scenario}"] = {**percentiles(timings), "match_types": match_types}
+
+    timings, _ = timed_requests(client, "/synonyms_lookup", "term", queries["synonym_hit"])
+    report["endpoints"]["synonyms_lookup"] = percentiles(timings)
+
+    started = time.perf_counter()
+    response = client.get("/synonyms")
+    report["endpoints"]["synonyms_first"] = {"ms": round((time.perf_counter() - started) * 1000, 3),
+                                             "bytes": len(response.content)}
+    timings, _ = timed_requests(client, "/synonyms", "_", [""] * min(query_count, 50))
+    report["endpoints"]["synonyms_cached"] = percentiles(timings)
+
+    report["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return report
+
+
+# ---------- Reporting ----------
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return "unknown"
+
+
+def print_scale(result: dict, baseline: dict = None):
+    print(f"✅ {result['synonyms']} synonyms / {result['substances']} substances ({result['storage_backend']}): "
+          f"data model load {result['data_model_load_seconds']}s, cold start {result['cold_start_seconds']}s, "
+          f"RSS {result['rss_mb']} MB (startup +{result['rss_startup_mb']} MB, peak {result['peak_rss_mb']} MB)")
+    for name, stats in result["endpoints"].items():
+        if "p50_ms" not in stats:
+            print(f"   {name:<18} {stats['ms']:>9.2f} ms  ({stats['bytes']} bytes)")
+            continue
+        line = f"   {name:<18} p50 {stats['p50_ms']:>8.2f} ms  p95 {stats['p95_ms']:>8.2f} ms  p99 {stats['p99_ms']:>8.2f} ms"
+        old = (baseline or {}).get("endpoints", {}).get(name)
+        if old and old.get("p50_ms"):
+            line += f"  ({stats['p50_ms'] / old['p50_ms']:.2f}x p50 vs baseline)"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark backend.py over synthetic data models.")
+    parser.add_argument("--scales", default="1000,10000,100000", help="Comma-separated synonym counts (1k to 1M)")
+    parser.add_argument("--queries", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--storage", default="memory", choices=["memory", "sqlite"], help="STORAGE_BACKEND to measure")
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    parser.add_argument("--compare", default=None, help="Earlier JSON report to compare p50 latencies against")
+    parser.add_argument("--child", choices=["load", "serve"], default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--child-queries", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child == "load":
+        print(json.dumps(measure_load()))
+        return
+    if args.child == "serve":
+        with open(args.child_queries, encoding="utf-8") as handle:
+            print(json.dumps(measure_service(json.load(handle))))
+        return
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            baseline = {result["synonyms"]: result for result in json.load(handle)["scales"]}
+
+    report = {
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "queries_per_scenario": args.queries,
+        "seed": args.seed,
+        "scales": [],
+    }
+    for scale in (int(value) for value in args.scales.split(",")):
+        print(f"⏱️ {scale} synonyms ...")
+        result = run_scale(scale, args)
+        report["scales"].append(result)
+        print_scale(result, baseline.get(result["synonyms"]))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Offline bulk resolution with the same matcher the API uses.
+
+Loads the data model once (by importing backend), reads a column of names or
+CAS numbers from a CSV/XLSX file in chunks, and streams one output row per
+MatchResult to CSV or NDJSON, so memory stays bounded by the chunk size.
+
+    python bulk_match.py manifest.csv --column "Chemical Name" --output resolved.csv
+    python bulk_match.py seizures.xlsx --column CAS --sheet Sheet1 --output resolved.ndjson --workers 8
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List
+
+import pandas as pd
+
+import backend
+
+MATCH_FIELDS = list(backend.MatchResult.model_fields)
+OUTPUT_FIELDS = ["input_row", "query", "rank"] + MATCH_FIELDS
+
+
+def _fuzzy_worker(query: str):
+    return backend.fuzzy_hits(query)
+
+
+def read_queries(path: str, column: str, sheet=None, chunk_size: int = 5000) -> Iterator[List[str]]:
+    """Yields the values of `column` in chunks without loading the whole file."""
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        worksheet = workbook[sheet] if sheet else workbook.active
+        rows = worksheet.iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else "" for cell in next(rows, [])]
+        if column not in header:
+            raise SystemExit(f"Column '{column}' not found in {path} (columns: {header})")
+        position = header.index(column)
+        chunk = []
+        for row in rows:
+            value = row[position] if position < len(row) else None
+            chunk.append("" if value is None else str(value))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+        workbook.close()
+        return
+
+    for frame in pd.read_csv(path, usecols=[column], dtype=str, chunksize=chunk_size, keep_default_na=False):
+        yield frame[column].tolist()
+
+
+class ResultWriter:
+    """Appends match rows to CSV or NDJSON (chosen by the output extension)."""
+
+    def __init__(self, path: str):
+        self.ndjson = path.lower().endswith((".ndjson", ".jsonl"))
+        self.handle = open(path, "w", newline="", encoding="utf-8")
+        if not self.ndjson:
+            self.writer = csv.DictWriter(self.handle, fieldnames=OUTPUT_FIELDS)
+            self.writer.writeheader()
+
+    def write(self, input_row: int, query: str, results: List[backend.MatchResult]):
+        for rank, result in enumerate(results, start=1):
+            row = {"input_row": input_row, "query": query, "rank": rank, **result.model_dump()}
+            if self.ndjson:
+                self.handle.write(json.dumps(row, default=str) + "\n")
+            else:
+                for field in ("synonym_source", "synonym_sources"):
+                    row[field] = json.dumps(row[field], default=str)
+                self.writer.writerow(row)
+
+    def close(self):
+        self.handle.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resolve a column of substance names/CAS numbers with the /match matcher.")
+    parser.add_argument("input", help="Input .csv or .xlsx file")
+    parser.add_argument("--column", required=True, help="Column holding the names or CAS numbers")
+    parser.add_argument("--output", required=True, help="Output file (.csv, or .ndjson/.jsonl)")
+    parser.add_argument("--sheet", default=None, help="Worksheet name for .xlsx input (default: active sheet)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Rows resolved per batch")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Processes for the fuzzy stage (0 = score in this process)")
+    args = parser.parse_args(argv)
+
+    pool = None
+    fuzzy_map = backend.fuzzy_hits_many
+    if args.workers > 0:
+        # fork shares the loaded data model with the workers; spawn re-imports it in each one
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+        pool = ProcessPoolExecutor(max_workers=args.workers, mp_context=context)
+
+        def pooled_fuzzy_map(misses):
+            return list(pool.map(_fuzzy_worker, misses, chunksize=max(1, len(misses) // (args.workers * 4))))
+        fuzzy_map = pooled_fuzzy_map
+
+    writer = ResultWriter(args.output)
+    started = time.perf_counter()
+    resolved = 0
+    try:
+        for chunk in read_queries(args.input, args.column, sheet=args.sheet, chunk_size=args.chunk_size):
+            for offset, (query, results) in enumerate(zip(chunk, backend.match_queries(chunk, fuzzy_map=fuzzy_map))):
+                writer.write(resolved + offset + 1, query, results)
+            resolved += len(chunk)
+            print(f"Resolved {resolved} rows ({time.perf_counter() - started:.1f}s)", file=sys.stderr)
+    finally:
+        writer.close()
+        if pool is not None:
+            pool.shutdown()
+
+    print(f"✅ Wrote matches for {resolved} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
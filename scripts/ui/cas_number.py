@@ -0,0 +1,100 @@
+"""
+CAS Registry Number detection, canonicalization and check-digit validation.
+
+A CAS number is 2-7 digits, 2 digits and a check digit ("50-00-0"); the check
+digit is the sum of the other digits, each multiplied by its position counted
+from the right, modulo 10. Queries are accepted the way people type them
+(no hyphens, Unicode dashes or spaces instead of hyphens, leading zeros, a
+"CAS"/"CAS RN" prefix, stray quotes) and reduced to the canonical form the
+CAS index is keyed on.
+
+Shared with the scrapers (scripts/Web Scraping), which put scripts/ui on sys.path.
+"""
+import re
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+_PREFIX = re.compile(r"^\s*cas(?:\s*(?:rn|no\.?|number|#))?\s*[:#]?\s*", re.IGNORECASE)
+_SEPARATED = re.compile(r"^(\d{2,10})\s*[-‐-―−\s]\s*(\d{2})\s*[-‐-―−\s]\s*(\d)$")
+_BARE = re.compile(r"^\d{5,10}$")
+_STRICT = re.compile(r"^\d{2,7}-\d{2}-\d$")
+_STRIP = " \t\r\n'\"`‘’“”.,;"
+
+
+class CasNumber(NamedTuple):
+    canonical: str  # "50-00-0": no leading zeros, hyphenated
+    valid: bool  # check digit matches
+
+    @property
+    def digits(self) -> str:
+        return self.canonical.replace("-", "")
+
+
+def check_digit(body: str) -> int:
+    """Check digit for the CAS digits before it."""
+    return sum(int(digit) * position for position, digit in enumerate(reversed(body), start=1)) % 10
+
+
+def format_cas(digits: str) -> str:
+    return f"{digits[:-3]}-{digits[-3:-1]}-{digits[-1]}"
+
+
+def parse_cas(text) -> Optional[CasNumber]:
+    """The canonical CAS number if `text` is shaped like one (valid check digit or not), else None."""
+    if text is None:
+        return None
+    text = _PREFIX.sub("", str(text)).strip(_STRIP)
+    match = _SEPARATED.match(text)
+    if match:
+        digits = "".join(match.groups())
+    elif _BARE.match(text):
+        digits = text
+    else:
+        return None
+    digits = digits.lstrip("0")
+    if not 5 <= len(digits) <= 10:
+        return None
+    return CasNumber(format_cas(digits), check_digit(digits[:-1]) == int(digits[-1]))
+
+
+def is_valid_cas(text, strict: bool = False) -> bool:
+    """
+    True for a CAS number with a correct check digit. `strict` only accepts the
+    hyphenated form ("50-00-0"), for picking CAS numbers out of synonym lists
+    where bare digit strings are usually other identifiers.
+    """
+    if strict and not _STRICT.match(str(text).strip()):
+        return False
+    cas = parse_cas(text)
+    return cas is not None and cas.valid
+
+
+def find_cas(texts: Iterable, default=None):
+    """The first valid, hyphenated CAS number in `texts` (e.g. a PubChem synonym list), canonicalized."""
+    for text in texts:
+        if isinstance(text, str) and is_valid_cas(text, strict=True):
+            return parse_cas(text).canonical
+    return default
+
+
+def near_cas(cas: CasNumber) -> List[Tuple[str, int]]:
+    """
+    Valid CAS numbers one typo away from `cas`, as (canonical, score), most likely first:
+    a corrected check digit (95), two swapped neighbouring digits (90), one other
+    wrong digit (85). At most ~100 candidates for the longest CAS numbers.
+    """
+    digits = cas.digits
+    candidates = {}
+
+    def consider(candidate: str, score: int):
+        candidate = candidate.lstrip("0")
+        if (5 <= len(candidate) <= 10 and candidate != digits and candidate not in candidates
+                and check_digit(candidate[:-1]) == int(candidate[-1])):
+            candidates[candidate] = score
+
+    consider(digits[:-1] + str(check_digit(digits[:-1])), 95)
+    for position in range(len(digits) - 1):
+        consider(digits[:position] + digits[position + 1] + digits[position] + digits[position + 2:], 90)
+    for position in range(len(digits) - 1):
+        for replacement in "0123456789":
+            consider(digits[:position] + replacement + digits[position + 1:], 85)
+    return [(format_cas(candidate), score) for candidate, score in candidates.items()]
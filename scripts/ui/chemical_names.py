@@ -0,0 +1,77 @@
+"""
+Canonical form of chemical names, used as the exact-match key for names,
+synonyms and queries (lookup_index.normalize_key).
+
+Spelling variants of the same name reduce to one key, so they are dictionary
+hits instead of fuzzy-stage lookups:
+
+    (2-Bromoethyl)Benzene, (2-bromoethyl)-benzene, (2-bromoethyl) benzene,
+    [2-bromoethyl]benzene, Benzene, (2-bromoethyl)-     -> (2-bromoethyl)benzene
+    α-Methylfentanyl, alpha‐methylfentanyl              -> alpha methylfentanyl
+    Δ9-THC, delta-9-THC                                 -> delta9-thc
+    Ketamine, (S)-, (S)-Ketamine, ketamine (S)          -> (s)ketamine
+    (+/-)-Ketamine, (±)-ketamine                        -> (±)ketamine
+    Acetyl-fentanyl, acetyl  fentanyl                   -> acetyl fentanyl
+
+Steps: Unicode NFKC and case folding; Greek letters spelled out; Unicode
+dashes, primes, bracket styles and racemate markers unified; whitespace and
+spacing around punctuation collapsed; CAS-style inverted names ("Benzene,
+1,2-dichloro-") and trailing stereo descriptors ("ketamine (S)") put back in
+front; a hyphen or space after a closing bracket dropped, and a hyphen between
+two words treated as a space. Plain names (ASCII letters, digits and single
+spaces) skip the pipeline.
+
+Where the workbook links two spellings of one key to different substances
+("China-White" and "China White"), the lookups keep them apart (lookup_index.split_keys).
+"""
+import re
+import unicodedata
+
+GREEK_LETTERS = {
+    "α": "alpha", "β": "beta", "γ": "gamma", "δ": "delta", "ε": "epsilon", "ζ": "zeta", "η": "eta",
+    "θ": "theta", "ι": "iota", "κ": "kappa", "λ": "lambda", "μ": "mu", "ν": "nu", "ξ": "xi", "ο": "omicron",
+    "π": "pi", "ρ": "rho", "σ": "sigma", "τ": "tau", "υ": "upsilon", "φ": "phi", "χ": "chi", "ψ": "psi",
+    "ω": "omega",
+}
+_CHARACTERS = str.maketrans({
+    **GREEK_LETTERS,
+    **dict.fromkeys("‐‑‒–—―−﹘﹣－", "-"),
+    **dict.fromkeys("′’‘`´", "'"),
+    **dict.fromkeys("″“”", '"'),
+    "[": "(", "{": "(", "]": ")", "}": ")",
+})
+
+_GREEK_LOCANT = re.compile(rf"\b({'|'.join(GREEK_LETTERS.values())})-(?=\d)")  # delta-9 -> delta9, as Δ9
+_RACEMIC = re.compile(r"\(\+/?-\)")
+_PLAIN = re.compile(r"^[a-z0-9]+(?: [a-z0-9]+)*$")
+_SPACES = re.compile(r"\s+")
+_PUNCTUATION_SPACING = re.compile(r"\s*([-,()])\s*")
+_INVERTED = re.compile(r"^([^,()]+),(.+)-$")  # "benzene,(2-bromoethyl)-"
+_STEREO = r"\((?:r|s|rs|sr|r\*|s\*|e|z|\+|-|±|\+/-|[rs],[rs](?:,[rs])*)\)"
+_TRAILING_STEREO = re.compile(rf"^(.+?),?({_STEREO})-?$")
+_AFTER_BRACKET = re.compile(r"\)[- ](?=[a-z0-9])")
+_WORD_HYPHEN = re.compile(r"(?<=[a-z]{2})-(?=[a-z]{2})")
+_EDGE_PUNCTUATION = " .,;:'\""
+
+
+def canonical_name(text) -> str:
+    """The canonical exact-match key for a chemical name, synonym or query."""
+    text = str(text).strip().lower()
+    if _PLAIN.match(text):
+        return text  # nothing to canonicalize (most synonyms and queries)
+
+    text = unicodedata.normalize("NFKC", text).casefold().translate(_CHARACTERS)
+    text = _SPACES.sub(" ", text).strip(_EDGE_PUNCTUATION)
+    text = _PUNCTUATION_SPACING.sub(r"\1", text)
+    text = _RACEMIC.sub("(±)", _GREEK_LOCANT.sub(r"\1", text))
+
+    inverted = _INVERTED.match(text)
+    if inverted:
+        text = inverted.group(2) + inverted.group(1)
+        text += ")" * (text.count("(") - text.count(")"))  # "azobis(2-methyl-" + "propanenitrile"
+    stereo = _TRAILING_STEREO.match(text)
+    if stereo:
+        text = stereo.group(2) + stereo.group(1)
+
+    text = _AFTER_BRACKET.sub(")", text)
+    return _WORD_HYPHEN.sub(" ", text)
@@ -0,0 +1,33 @@
+"""
+Fixtures shared by the scripts/ui tests: the data-model workbook shipped in Data/,
+fresh DataSnapshots built from it, and a TestClient on backend.py.
+"""
+import pytest
+
+from data_loader import DEFAULT_WORKBOOK, load_data_model
+from data_snapshot import DataSnapshot
+
+
+@pytest.fixture(scope="session")
+def data_model():
+    if not DEFAULT_WORKBOOK.exists():
+        pytest.skip(f"{DEFAULT_WORKBOOK} is not checked out")
+    return load_data_model(str(DEFAULT_WORKBOOK))
+
+
+@pytest.fixture
+def snapshot(data_model):
+    """A snapshot of its own per test, so edits never leak between tests."""
+    return DataSnapshot(data_model)
+
+
+@pytest.fixture(scope="session")
+def backend(data_model):
+    import backend  # loads the workbook at import time
+    return backend
+
+
+@pytest.fixture(scope="session")
+def client(backend):
+    from fastapi.testclient import TestClient
+    return TestClient(backend.app)
@@ -0,0 +1,133 @@
+"""
+Loads the data-model workbook through a local binary snapshot.
+
+The first load parses every sheet of the workbook once (a single openpyxl pass)
+and pickles the resulting DataFrames under Data/.cache, keyed by the SHA-256 of
+the workbook bytes. Later loads hash the workbook and unpickle the matching
+snapshot, so startup is sub-second and needs no network. Editing the workbook
+changes its hash, which rebuilds the snapshot on the next load.
+"""
+import hashlib
+import io
+import os
+import pickle
+import urllib.request
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_WORKBOOK = REPO_ROOT / "Data" / "Data Model Tables.xlsx"
+REMOTE_WORKBOOK_URL = "https://www.dropbox.com/scl/fi/gf21i2qf3ffioy958448x/Data-Model-Tables.xlsx?rlkey=4ovpu5v0l7ri0zp3bi5wx3u0t&st=6xle6bd9&dl=1"
+CACHE_DIR = Path(os.getenv("DATA_MODEL_CACHE_DIR", REPO_ROOT / "Data" / ".cache"))
+SNAPSHOT_FORMAT = 1  # bump when the normalization below changes
+
+SHEETS = [
+    "Substance_Reference",
+    "Substance_Sourcing",
+    "Substance_Type",
+    "Substance_Sourcing_Type",
+    "Substance_Weighting_Tag",
+    "Weighting_Tag",
+]
+
+# The workbook in Data/ uses a few misspelled headers; the backend expects these names
+COLUMN_ALIASES = {
+    "Substance_Reference": {"Substance_Referece_ID": "Substance_Reference_ID"},
+    "Substance_Sourcing": {
+        "Susbtance_Sourcing_ID": "Substance_Sourcing_ID",
+        "(FK) Substance_Referece_ID": "(FK) Substance_ID",
+        "(FK) Substance_Reference_ID": "(FK) Substance_ID",
+    },
+}
+
+
+class DataModel(NamedTuple):
+    version: str
+    tables: Dict[str, pd.DataFrame]
+
+
+def workbook_source() -> str:
+    return os.getenv("DATA_MODEL_PATH", str(DEFAULT_WORKBOOK))
+
+
+def _read_source_bytes(source: str) -> bytes:
+    if source.startswith(("http://", "https://")):
+        with urllib.request.urlopen(source) as response:
+            return response.read()
+    return Path(source).read_bytes()
+
+
+def _normalize_tables(tables: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    missing = [sheet for sheet in SHEETS if sheet not in tables]
+    if missing:
+        raise ValueError(f"Data model workbook is missing sheets: {missing}")
+
+    tables = {sheet: tables[sheet].rename(columns=COLUMN_ALIASES.get(sheet, {})) for sheet in SHEETS}
+
+    # Older workbooks keep the weighting tag on Substance_Reference; newer ones only
+    # have the Substance_Weighting_Tag link table, so take the first tag per substance
+    ref_df = tables["Substance_Reference"]
+    if "(FK) Weighting_Tag_ID" not in ref_df.columns:
+        links = tables["Substance_Weighting_Tag"].drop_duplicates("(FK) Substance_Reference_ID")
+        first_tag = links.set_index("(FK) Substance_Reference_ID")["(FK) Weighting_Tag_ID"]
+        ref_df = ref_df.copy()
+        ref_df["(FK) Weighting_Tag_ID"] = ref_df["Substance_Reference_ID"].map(first_tag).astype("Int64")
+        tables["Substance_Reference"] = ref_df
+    return tables
+
+
+def _snapshot_path(version: str) -> Path:
+    return CACHE_DIR / f"data_model-v{SNAPSHOT_FORMAT}-{version}.pkl"
+
+
+def _write_snapshot(version: str, tables: Dict[str, pd.DataFrame]):
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = _snapshot_path(version)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as handle:
+        pickle.dump(tables, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    # Only the snapshot for the current workbook is kept
+    for stale in CACHE_DIR.glob("data_model-*.pkl"):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+
+
+def _version(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+def data_model_version(source: Optional[str] = None) -> str:
+    """The version load_data_model would report, without parsing or unpickling any tables."""
+    return _version(_read_source_bytes(source or workbook_source()))
+
+
+def load_data_model(source: Optional[str] = None) -> DataModel:
+    """Returns every data-model sheet as a DataFrame, from the snapshot when it is current."""
+    source = source or workbook_source()
+    raw = _read_source_bytes(source)
+    version = _version(raw)
+
+    snapshot = _snapshot_path(version)
+    if snapshot.exists():
+        try:
+            with open(snapshot, "rb") as handle:
+                return DataModel(version, pickle.load(handle))
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable data-model snapshot {snapshot}: {e}")
+
+    tables = _normalize_tables(pd.read_excel(io.BytesIO(raw), sheet_name=None))
+    try:
+        _write_snapshot(version, tables)
+    except OSError as e:
+        print(f"⚠️ Could not write data-model snapshot to {CACHE_DIR}: {e}")
+    return DataModel(version, tables)
+
+
+if __name__ == "__main__":
+    model = load_data_model()
+    print(f"✅ Data model {model.version} from {workbook_source()}")
+    for name, table in model.tables.items():
+        print(f"   {name}: {len(table)} rows")
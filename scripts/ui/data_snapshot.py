@@ -0,0 +1,384 @@
+import copy
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+from data_loader import DataModel
+from fuzzy_engine import FuzzyEngine
+from lookup_index import SubstanceIndex, normalize_key
+from synonym_stats import SynonymStats
+
+NOT_AVAILABLE = "Not Available"
+
+
+class EditValidationError(ValueError):
+    """Edit input that is invalid in itself (e.g. a blank synonym), as opposed to a conflict with the data."""
+
+
+class PreparedFrames(NamedTuple):
+    ref_df: pd.DataFrame
+    source_df: pd.DataFrame
+    weight_df: pd.DataFrame
+    substance_type_df: pd.DataFrame
+    combined_df: pd.DataFrame
+
+
+class DataSnapshot:
+    """
+    Everything the API serves from one load of the data model: the cleaned and
+    merged frames, the lookup indexes, the fuzzy pools and the synonym aggregates.
+
+    Curation edits (add/update/delete of substances and synonym rows) are applied
+    to all of those incrementally under `lock`, without re-reading the workbook.
+    Each edit bumps `version`. A snapshot that is serving requests is never edited:
+    the backend applies edits to a draft() and swaps the draft in once it is done,
+    the same way a reload swaps in a freshly loaded snapshot.
+    """
+
+    editable = True
+
+    def __init__(self, data_model: DataModel):
+        self.base_version = data_model.version
+        self.edit_count = 0
+        self.lock = threading.RLock()
+        self.tables = data_model.tables
+
+        frames = prepare_frames(self.tables)
+        self.ref_df = frames.ref_df
+        self.source_df = frames.source_df
+        self.weight_df = frames.weight_df
+        self.substance_type_df = frames.substance_type_df
+        self.combined_df = frames.combined_df
+
+        # Lookup indexes for the exact scenarios (built once, reused by every request)
+        self.index = SubstanceIndex(self.ref_df, self.source_df, self.combined_df)
+
+        # Fuzzy candidate pools (preprocessed once, see fuzzy_engine.py for backend/score settings)
+        self.substance_name_engine = FuzzyEngine(self.ref_df["Substance_Name"].dropna().unique())
+        self.synonym_engine = FuzzyEngine(self.combined_df["Substance_Sourcing_Local_Name"].dropna().unique())
+
+        # Synonym aggregates for /synonyms
+        self.stats = SynonymStats(self.source_df)
+
+    @property
+    def version(self) -> str:
+        return self.base_version if self.edit_count == 0 else f"{self.base_version}.{self.edit_count}"
+
+    def _bump(self):
+        self.edit_count += 1
+
+    def draft(self) -> "DataSnapshot":
+        """
+        A copy to apply edits to while this snapshot keeps serving. Edits replace
+        frames, index lists and aggregates rather than writing to them, so the copy
+        shares all of those and only duplicates the containers that hold them.
+        """
+        draft = copy.copy(self)
+        draft.index = self.index.copy()
+        draft.stats = self.stats.copy()
+        draft.substance_name_engine = self.substance_name_engine.copy()
+        draft.synonym_engine = self.synonym_engine.copy()
+        return draft
+
+    def flush(self):
+        """Finishes deferred index work so concurrent requests only read this snapshot."""
+        self.substance_name_engine.flush()
+        self.synonym_engine.flush()
+
+    def related_synonyms(self, ref_ids: List[str]) -> List[dict]:
+        """All synonyms of the given substances, one record per Substance_Reference_ID (for /synonyms_lookup)."""
+        related = self.combined_df[self.combined_df["Substance_Reference_ID"].isin(ref_ids)]
+        grouped = related.groupby("Substance_Reference_ID").agg({
+            "Substance_Sourcing_Local_Name": lambda x: sorted(set(x.dropna())),
+            "Substance_ID": "first",
+            "Substance_Name": "first"
+        }).reset_index()
+        return grouped.to_dict(orient="records")
+
+    # ---------- Synonym (Substance_Sourcing) rows ----------
+    def add_synonym(self, sub_ref_id: str, synonym: str, source: Optional[str] = None, **columns) -> dict:
+        sub_ref_id, synonym = str(sub_ref_id).strip(), _synonym(synonym)
+        with self.lock:
+            if sub_ref_id not in self.index.references:
+                raise KeyError(f"Unknown Substance_Reference_ID '{sub_ref_id}'")
+            row = {
+                **columns,
+                "(FK) Substance_ID": sub_ref_id,
+                "Substance_Sourcing_Local_Name": synonym,
+                "Substance_Sourcing_Mapping_Reference": source,
+            }
+            if "Substance_Sourcing_ID" in self.source_df.columns:
+                row["Substance_Sourcing_ID"] = _next_id(self.source_df["Substance_Sourcing_ID"])
+            self._append_sourcing_rows([row])
+            self._bump()
+            return row
+
+    def delete_synonym(self, sub_ref_id: str, synonym: str) -> int:
+        """Deletes every sourcing row linking `synonym` to the substance; returns the number removed."""
+        sub_ref_id, synonym = str(sub_ref_id).strip(), str(synonym).strip()
+        with self.lock:
+            removed = self._drop_sourcing_rows(sub_ref_id, synonym)
+            if not removed:
+                raise KeyError(f"Synonym '{synonym}' is not linked to Substance_Reference_ID '{sub_ref_id}'")
+            self._bump()
+            return removed
+
+    def update_synonym(self, sub_ref_id: str, synonym: str, new_synonym: Optional[str] = None,
+                       new_source: Optional[str] = None) -> List[dict]:
+        """Renames and/or re-sources every sourcing row linking `synonym` to the substance."""
+        sub_ref_id, synonym = str(sub_ref_id).strip(), str(synonym).strip()
+        if new_synonym is not None:
+            new_synonym = _synonym(new_synonym)
+        with self.lock:
+            rows = self.source_df[_sourcing_mask(self.source_df, sub_ref_id, synonym)].to_dict(orient="records")
+            if not rows:
+                raise KeyError(f"Synonym '{synonym}' is not linked to Substance_Reference_ID '{sub_ref_id}'")
+            for row in rows:
+                if new_synonym is not None:
+                    row["Substance_Sourcing_Local_Name"] = new_synonym
+                if new_source is not None:
+                    row["Substance_Sourcing_Mapping_Reference"] = new_source
+            self._drop_sourcing_rows(sub_ref_id, synonym)
+            self._append_sourcing_rows(rows)
+            self._bump()
+            return rows
+
+    def sync_synonyms(self, inserts: List[dict], deletes: List[Tuple[str, str, str]],
+                      updates: List[Tuple[str, str, str, str]]) -> dict:
+        """
+        Applies a batch of sourcing-row changes as one edit (one version bump):
+        `inserts` are add_synonym-style rows, `deletes` (Substance_Reference_ID, synonym, source)
+        keys and `updates` (Substance_Reference_ID, synonym, source, new_source). Rows are
+        matched on all three key columns, so other sources' rows for a synonym are untouched.
+        """
+        with self.lock:
+            new_sources = {update[:3]: update[3] for update in updates}
+            updated_rows = self.source_df[_rows_mask(self.source_df, new_sources)].to_dict(orient="records")
+            for row in updated_rows:
+                row["Substance_Sourcing_Mapping_Reference"] = new_sources[_row_key(row)]
+
+            dropped = self._drop_where(lambda frame: _rows_mask(frame, set(deletes) | set(new_sources)))
+
+            new_rows = [dict(row) for row in inserts]
+            if "Substance_Sourcing_ID" in self.source_df.columns and new_rows:
+                first_id = _next_id(self.source_df["Substance_Sourcing_ID"])
+                for offset, row in enumerate(new_rows):
+                    row["Substance_Sourcing_ID"] = type(first_id)(int(first_id) + offset)
+            if new_rows or updated_rows:
+                self._append_sourcing_rows(updated_rows + new_rows)
+            if dropped or new_rows:
+                self._bump()
+            return {"inserted": len(new_rows), "updated": len(updated_rows), "deleted": dropped - len(updated_rows)}
+
+    def _append_sourcing_rows(self, rows: List[dict]):
+        new_rows = pd.DataFrame(rows).reindex(columns=self.source_df.columns)
+        self.source_df = pd.concat([self.source_df, new_rows], ignore_index=True)
+
+        combined_rows = pd.merge(
+            new_rows, self.ref_df, left_on="(FK) Substance_ID", right_on="Substance_Reference_ID", how="left"
+        ).reindex(columns=self.combined_df.columns).fillna("Not Available")
+        self.combined_df = pd.concat([self.combined_df, combined_rows], ignore_index=True)
+
+        for row in rows:
+            synonym = row["Substance_Sourcing_Local_Name"]
+            self.stats.add(row["(FK) Substance_ID"], synonym)
+            self.index.add_synonym(row["(FK) Substance_ID"], synonym, row.get("Substance_Sourcing_Mapping_Reference"))
+            self.synonym_engine.add(synonym)
+
+    def _drop_sourcing_rows(self, sub_ref_id: str, synonym: Optional[str] = None) -> int:
+        """Drops the substance's sourcing rows (only those for `synonym` when given)."""
+        return self._drop_where(lambda frame: _sourcing_mask(frame, sub_ref_id, synonym))
+
+    def _drop_where(self, mask_for) -> int:
+        """Drops the sourcing rows selected by `mask_for(frame)`; returns the number removed."""
+        source_mask = mask_for(self.source_df)
+        dropped = self.source_df[source_mask]
+        if dropped.empty:
+            return 0
+        self.source_df = self.source_df[~source_mask].reset_index(drop=True)
+        # combined_df is a left merge of source_df, so the same predicate selects the same rows
+        self.combined_df = self.combined_df[~mask_for(self.combined_df)].reset_index(drop=True)
+
+        for sub_ref_id, dropped_synonym in zip(dropped["(FK) Substance_ID"], dropped["Substance_Sourcing_Local_Name"]):
+            self.stats.remove(sub_ref_id, dropped_synonym)
+            self.index.remove_synonym(sub_ref_id, dropped_synonym)
+            if self.stats.rows_with_synonym(dropped_synonym) == 0:
+                self.synonym_engine.remove(dropped_synonym)
+        return len(dropped)
+
+    # ---------- Substances (Substance_Reference rows) ----------
+    def add_substance(self, substance_id: str, substance_name: str, description: Optional[str] = None,
+                      weight: Optional[str] = None, weighting_tag_id: Optional[str] = None,
+                      substance_type_id: Optional[str] = None, sub_ref_id: Optional[str] = None) -> dict:
+        with self.lock:
+            sub_ref_id = str(sub_ref_id).strip() if sub_ref_id else _next_id(self.ref_df["Substance_Reference_ID"])
+            if sub_ref_id in self.index.references:
+                raise ValueError(f"Substance_Reference_ID '{sub_ref_id}' already exists")
+            row = {column: NOT_AVAILABLE for column in self.ref_df.columns}
+            row.update({
+                "Substance_Reference_ID": sub_ref_id,
+                "Substance_ID": str(substance_id).strip(),
+                "Substance_Name": str(substance_name).strip(),
+                "Substance_Description": _clean(description),
+                "Substance_Weight": _clean(weight),
+            })
+            if "(FK) Substance_Type_ID" in row:
+                row["(FK) Substance_Type_ID"] = _clean(substance_type_id)
+            self._set_weighting_tag(row, weighting_tag_id)
+
+            self.ref_df = pd.concat([self.ref_df, pd.DataFrame([row])], ignore_index=True)
+            self.index.add_reference(row)
+            self.substance_name_engine.add(row["Substance_Name"])
+            self._bump()
+            return row
+
+    def update_substance(self, sub_ref_id: str, **fields) -> dict:
+        """`fields` uses the add_substance argument names; None leaves a field unchanged."""
+        sub_ref_id = str(sub_ref_id).strip()
+        columns = {
+            "substance_id": "Substance_ID",
+            "substance_name": "Substance_Name",
+            "description": "Substance_Description",
+            "weight": "Substance_Weight",
+            "substance_type_id": "(FK) Substance_Type_ID",
+        }
+        with self.lock:
+            if sub_ref_id not in self.index.references:
+                raise KeyError(f"Unknown Substance_Reference_ID '{sub_ref_id}'")
+            old_row = self.index.remove_reference(sub_ref_id)
+            row = dict(old_row)
+            for field, column in columns.items():
+                if fields.get(field) is not None and column in row:
+                    row[column] = _clean(fields[field])
+            if fields.get("weighting_tag_id") is not None:
+                self._set_weighting_tag(row, fields["weighting_tag_id"])
+
+            # Written in place below, so copied first: a previous snapshot may still be reading them
+            self.ref_df, self.combined_df = self.ref_df.copy(), self.combined_df.copy()
+            ref_rows = self.ref_df["Substance_Reference_ID"] == sub_ref_id
+            combined_rows = self.combined_df["Substance_Reference_ID"] == sub_ref_id
+            for column, value in row.items():
+                if old_row.get(column) == value:
+                    continue
+                _assign(self.ref_df, ref_rows, column, value)
+                if column in self.combined_df.columns:
+                    _assign(self.combined_df, combined_rows, column, value)
+
+            self.index.add_reference(row)
+            self._sync_name_pool(old_row["Substance_Name"])
+            self.substance_name_engine.add(row["Substance_Name"])
+            self._bump()
+            return row
+
+    def delete_substance(self, sub_ref_id: str) -> dict:
+        """Deletes the substance and its synonym rows."""
+        sub_ref_id = str(sub_ref_id).strip()
+        with self.lock:
+            if sub_ref_id not in self.index.references:
+                raise KeyError(f"Unknown Substance_Reference_ID '{sub_ref_id}'")
+            self._drop_sourcing_rows(sub_ref_id)
+            row = self.index.remove_reference(sub_ref_id)
+            self.index.records.pop(sub_ref_id, None)
+            self.ref_df = self.ref_df[self.ref_df["Substance_Reference_ID"] != sub_ref_id].reset_index(drop=True)
+            self._sync_name_pool(row["Substance_Name"])
+            self._bump()
+            return row
+
+    def _set_weighting_tag(self, row: dict, weighting_tag_id: Optional[str]):
+        weighting_tag_id = _clean(weighting_tag_id)
+        titles = self.weight_df.loc[self.weight_df["Weighting_Tag_ID"] == weighting_tag_id, "Weighting_Tag_Title"]
+        row["(FK) Weighting_Tag_ID"] = weighting_tag_id
+        row["Weighting_Tag_ID"] = weighting_tag_id if len(titles) else NOT_AVAILABLE
+        row["Weighting_Tag_Title"] = titles.iloc[0] if len(titles) else NOT_AVAILABLE
+
+    def _sync_name_pool(self, name: str):
+        # Drop a name from the fuzzy pool once no substance uses it any more
+        if not any(self.index.references[ref_id]["Substance_Name"] == name
+                   for ref_id in self.index.lookup_name(normalize_key(name))):
+            self.substance_name_engine.remove(name)
+
+
+def prepare_frames(tables: Dict[str, pd.DataFrame]) -> PreparedFrames:
+    """Cleans the raw sheets and builds the merged frames every storage backend serves from."""
+    ref_df = tables["Substance_Reference"].copy()
+    source_df = tables["Substance_Sourcing"].copy()
+    weight_df = tables["Weighting_Tag"].apply(lambda x: x.astype(str).str.strip())
+    substance_type_df = tables["Substance_Type"].apply(lambda x: x.astype(str).str.strip())
+
+    # Clean and standardize IDs
+    ref_df["Substance_Reference_ID"] = ref_df["Substance_Reference_ID"].astype(str).str.strip().str.replace('.0', '', regex=False)
+    ref_df["Substance_ID"] = ref_df["Substance_ID"].astype(str).str.strip()
+    ref_df["Substance_Name"] = ref_df["Substance_Name"].astype(str).fillna("Not Available").str.strip()
+    ref_df["Substance_Description"] = ref_df["Substance_Description"].astype(str).fillna("Not Available").str.strip()
+    ref_df["Substance_Weight"] = ref_df.get("Substance_Weight", "Not Available").astype(str).fillna("Not Available").str.strip()
+    ref_df["(FK) Weighting_Tag_ID"] = ref_df["(FK) Weighting_Tag_ID"].astype(str).str.strip()
+
+    source_df["(FK) Substance_ID"] = source_df["(FK) Substance_ID"].astype(str).str.strip().str.replace('.0', '', regex=False)
+    source_df["Substance_Sourcing_Local_Name"] = source_df["Substance_Sourcing_Local_Name"].astype(str).str.strip()
+
+    weight_df["Weighting_Tag_ID"] = weight_df["Weighting_Tag_ID"].astype(str).str.strip()
+
+    ref_df = ref_df.merge(
+        weight_df[["Weighting_Tag_ID", "Weighting_Tag_Title"]],
+        left_on="(FK) Weighting_Tag_ID",
+        right_on="Weighting_Tag_ID",
+        how="left"
+    ).fillna("Not Available")
+    combined_df = pd.merge(
+        source_df,
+        ref_df,
+        left_on="(FK) Substance_ID",
+        right_on="Substance_Reference_ID",
+        how="left"
+    ).fillna("Not Available")
+    return PreparedFrames(ref_df, source_df, weight_df, substance_type_df, combined_df)
+
+
+def _sourcing_mask(frame: pd.DataFrame, sub_ref_id: str, synonym: Optional[str] = None) -> pd.Series:
+    mask = frame["(FK) Substance_ID"] == sub_ref_id
+    if synonym is not None:
+        mask &= frame["Substance_Sourcing_Local_Name"] == synonym
+    return mask
+
+
+SOURCING_KEY = ["(FK) Substance_ID", "Substance_Sourcing_Local_Name", "Substance_Sourcing_Mapping_Reference"]
+
+
+def _row_key(row: dict) -> tuple:
+    return tuple(row[column] for column in SOURCING_KEY)
+
+
+def _rows_mask(frame: pd.DataFrame, keys) -> pd.Series:
+    """Rows whose (substance, synonym, source) key is in `keys`."""
+    if not keys:
+        return pd.Series(False, index=frame.index)
+    index = pd.MultiIndex.from_arrays([frame[column] for column in SOURCING_KEY])
+    return pd.Series(index.isin(list(keys)), index=frame.index)
+
+
+def _assign(frame: pd.DataFrame, rows: pd.Series, column: str, value):
+    try:
+        frame.loc[rows, column] = value
+    except (TypeError, ValueError):
+        # e.g. "Not Available" into an int64 ID column
+        frame[column] = frame[column].astype(object)
+        frame.loc[rows, column] = value
+
+
+def _synonym(value) -> str:
+    synonym = str(value).strip()
+    if not synonym:
+        raise EditValidationError("Synonym must not be blank")
+    return synonym
+
+
+def _clean(value) -> str:
+    return NOT_AVAILABLE if value is None or str(value).strip() == "" else str(value).strip()
+
+
+def _next_id(ids: pd.Series):
+    """Next free numeric ID, typed like the existing column (int or str)."""
+    numeric = pd.to_numeric(ids, errors="coerce")
+    next_id = int(numeric.max()) + 1 if numeric.notna().any() else 1
+    return next_id if pd.api.types.is_numeric_dtype(ids) else str(next_id)
@@ -9,6 +9,47 @@ import requests
 from io import BytesIO
 
 st.set_page_config(page_title="Illicit Synthetic Opioids Lookup", layout="wide")
+
+BACKEND_URL = "http://localhost:8006"
+CACHE_TTL_SECONDS = 300       # cached backend responses expire after this long
+CACHE_MAX_ENTRIES = 512       # ...and the least recently used are evicted past this many
+VERSION_CHECK_SECONDS = 5     # how often the backend data version is re-checked
+
+
+@st.cache_resource
+def api_session():
+    """One pooled session per server process, so backend calls reuse keep-alive connections."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_data(ttl=VERSION_CHECK_SECONDS, show_spinner=False)
+def backend_version():
+    """Current data version of the backend; part of every cache key below."""
+    try:
+        return api_session().get(f"{BACKEND_URL}/version").json()["data_version"]
+    except Exception:
+        return None
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def cached_get(path, params, data_version):
+    """
+    GET a backend endpoint, shared across reruns and sessions. Keyed by path,
+    params and data version, so edits or reloads on the backend start a fresh
+    set of entries. Errors raise and are never cached.
+    """
+    response = api_session().get(f"{BACKEND_URL}{path}", params=dict(params))
+    response.raise_for_status()
+    return response.json()
+
+
+def backend_get(path, **params):
+    return cached_get(path, tuple(sorted(params.items())), backend_version())
+
 st.markdown("""
 <script>
 function copyCAS(cas) {
@@ -254,8 +295,12 @@ if st.session_state.page == "home":
     #if st.session_state.query:
 if st.session_state.query:
     try:
-        response = requests.get("http://localhost:8006/match", params={"query": st.session_state.query})
-        results = response.json() if response.status_code == 200 else []
+        # /match/full returns every card's synonym list too (one round-trip instead of 1 + one per card);
+        # reruns for the same query (e.g. "Select this result") are served from the cache
+        try:
+            results = backend_get("/match/full", query=st.session_state.query)
+        except requests.HTTPError:
+            results = []
 
         #st.session_state.query = query
         #st.session_state.selected_card_index = None
@@ -296,11 +341,9 @@ if st.session_state.query:
                 encoded_name = urllib.parse.quote(substance_name)
                 top_synonyms_html, full_synonyms_html = "", ""
 
-                # Fetch synonyms
-                synonyms_response = requests.get("http://localhost:8006/synonyms_lookup", params={"term": substance_name})
-                if synonyms_response.status_code == 200:
-                    synonyms_data = synonyms_response.json()
-                    synonyms_list = synonyms_data[0].get("Substance_Sourcing_Local_Name", []) if synonyms_data else []
+                # Synonyms come with the match results
+                synonyms_list = r.get("synonyms", [])
+                if synonyms_list:
                     top_synonyms = synonyms_list[:5]
                     top_synonyms_html = ", ".join(top_synonyms)
                     full_synonyms_html = "<br>".join([f"{i+1}. {syn}" for i, syn in enumerate(synonyms_list)])
@@ -464,10 +507,12 @@ elif st.session_state.page == "synonyms":
 
     if find_clicked and term:
         try:
-            resp = requests.get("http://localhost:8006/synonyms_lookup", params={"term": term})
-            if resp.status_code == 200:
-                results = resp.json()
-                if results:
+            try:
+                results = backend_get("/synonyms_lookup", term=term)
+            except requests.HTTPError:
+                results = None
+            if results is not None:
+                if isinstance(results, list) and results:
                     for entry in results:
                         synonyms = entry.get("Substance_Sourcing_Local_Name", [])
                         synonyms_html = "".join(f"<tr><td>{i+1}</td><td>{syn}</td></tr>" for i, syn in enumerate(synonyms))
@@ -499,8 +544,8 @@ elif st.session_state.page == "synonyms":
             st.error(f"Request failed: {e}")   
     
     try:
-        response = requests.get("http://localhost:8006/synonyms")
-        data = response.json()
+        # Computed once per data version on the backend, fetched once per version here
+        data = backend_get("/synonyms")
     except Exception as e:
         st.error(f"Failed to fetch synonym insights: {e}")
         st.stop()
@@ -757,6 +802,38 @@ elif st.session_state.page == "add_delete":
     
     #margin-bottom:20px;
 
+    # Edits are applied in place by the backend (no workbook reload)
+    with st.form("add_synonym_form", clear_on_submit=True):
+        st.markdown("#### Add a synonym")
+        add_ref_id = st.text_input("Substance Reference ID", key="add_ref_id")
+        add_synonym = st.text_input("Synonym", key="add_synonym")
+        add_source = st.text_input("Source (URL or reference)", key="add_source")
+        if st.form_submit_button("Add synonym"):
+            resp = api_session().post(
+                f"{BACKEND_URL}/synonyms/records",
+                json={"substance_reference_id": add_ref_id, "synonym": add_synonym, "source": add_source or None},
+            )
+            if resp.status_code == 200:
+                backend_version.clear()  # pick up the new data version on the next render
+                st.success(f"✅ Added '{add_synonym}' (data version {resp.json()['data_version']})")
+            else:
+                st.error(f"❌ {resp.json().get('detail', resp.text)}")
+
+    with st.form("delete_synonym_form", clear_on_submit=True):
+        st.markdown("#### Delete a synonym")
+        del_ref_id = st.text_input("Substance Reference ID", key="del_ref_id")
+        del_synonym = st.text_input("Synonym", key="del_synonym")
+        if st.form_submit_button("Delete synonym"):
+            resp = api_session().delete(
+                f"{BACKEND_URL}/synonyms/records",
+                params={"substance_reference_id": del_ref_id, "synonym": del_synonym},
+            )
+            if resp.status_code == 200:
+                backend_version.clear()
+                st.success(f"✅ Deleted {resp.json()['result']} row(s) for '{del_synonym}'")
+            else:
+                st.error(f"❌ {resp.json().get('detail', resp.text)}")
+
 #------------------ data log ---------------------
 elif st.session_state.page == "data_log":
     try:
@@ -0,0 +1,297 @@
+import copy
+import os
+import re
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from fuzzywuzzy import process as fuzzywuzzy_process
+
+try:
+    from rapidfuzz import fuzz as rapidfuzz_fuzz
+    from rapidfuzz import process as rapidfuzz_process
+    from rapidfuzz import utils as rapidfuzz_utils
+except ImportError:  # rapidfuzz is optional, fuzzywuzzy stays the fallback
+    rapidfuzz_process = None
+
+FUZZY_BACKENDS = ("rapidfuzz", "fuzzywuzzy")
+DEFAULT_BACKEND = "rapidfuzz" if rapidfuzz_process is not None else "fuzzywuzzy"
+
+# Tunables (environment overrides so the API can be reconfigured without code changes)
+FUZZY_BACKEND = os.getenv("FUZZY_BACKEND", DEFAULT_BACKEND)
+FUZZY_MIN_SCORE = int(os.getenv("FUZZY_MIN_SCORE", "0"))
+# Blocking: only the top-K candidates sharing the most n-grams with the query are scored.
+# Raise it for recall, lower it for speed, 0 disables blocking.
+FUZZY_BLOCKING_TOP_K = int(os.getenv("FUZZY_BLOCKING_TOP_K", "500"))
+FUZZY_NGRAM_SIZE = int(os.getenv("FUZZY_NGRAM_SIZE", "3"))
+# Batch scoring: cores used by extract_many (-1 = all) and queries scored per cdist matrix
+FUZZY_WORKERS = int(os.getenv("FUZZY_WORKERS", "-1"))
+FUZZY_BATCH_CHUNK = int(os.getenv("FUZZY_BATCH_CHUNK", "256"))
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def resolve_backend(backend: Optional[str]) -> str:
+    backend = (backend or FUZZY_BACKEND).strip().lower()
+    if backend not in FUZZY_BACKENDS:
+        raise ValueError(f"Unknown fuzzy backend '{backend}', expected one of {FUZZY_BACKENDS}")
+    if backend == "rapidfuzz" and rapidfuzz_process is None:
+        print("⚠️ rapidfuzz is not installed, falling back to fuzzywuzzy")
+        return "fuzzywuzzy"
+    return backend
+
+
+def ngrams(text: str, size: int = FUZZY_NGRAM_SIZE) -> set:
+    """Character n-grams of the lowercased alphanumeric text, padded so short strings still produce grams."""
+    text = " " + _NON_ALNUM.sub(" ", str(text).lower()).strip() + " "
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class NgramIndex:
+    """Inverted index from character n-gram to the positions of the pool entries containing it."""
+
+    def __init__(self, choices: List[str], size: int = FUZZY_NGRAM_SIZE):
+        self.size = size
+        self.pool_size = len(choices)
+        postings: Dict[str, List[int]] = defaultdict(list)
+        for position, choice in enumerate(choices):
+            for gram in ngrams(choice, size):
+                postings[gram].append(position)
+        self.postings = {gram: np.asarray(positions, dtype=np.int32) for gram, positions in postings.items()}
+        # Entries added after the build, merged into the arrays lazily by candidates()
+        self.pending: Dict[str, List[int]] = defaultdict(list)
+
+    def copy(self) -> "NgramIndex":
+        # Merged posting arrays are replaced, never written to, so they can be shared
+        index = NgramIndex.__new__(NgramIndex)
+        index.size = self.size
+        index.pool_size = self.pool_size
+        index.postings = dict(self.postings)
+        index.pending = defaultdict(list, {gram: list(positions) for gram, positions in self.pending.items()})
+        return index
+
+    def add(self, position: int, choice: str):
+        for gram in ngrams(choice, self.size):
+            self.pending[gram].append(position)
+        self.pool_size = max(self.pool_size, position + 1)
+
+    def flush(self):
+        """Merges every pending posting, so concurrent candidates() calls only read."""
+        for gram in list(self.pending):
+            self._posting(gram)
+
+    def _posting(self, gram: str) -> Optional[np.ndarray]:
+        if gram in self.pending:
+            merged = np.asarray(self.pending.pop(gram), dtype=np.int32)
+            if gram in self.postings:
+                merged = np.concatenate([self.postings[gram], merged])
+            self.postings[gram] = merged
+        return self.postings.get(gram)
+
+    def candidates(self, query: str, top_k: int) -> np.ndarray:
+        """Positions of the `top_k` entries sharing the most n-grams with `query`, in pool order."""
+        hits = [posting for posting in map(self._posting, ngrams(query, self.size)) if posting is not None]
+        if not hits:
+            return np.empty(0, dtype=np.int32)
+        shared = np.bincount(np.concatenate(hits), minlength=self.pool_size)
+        matched = np.flatnonzero(shared)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-shared[matched], top_k - 1)[:top_k]]
+        return np.sort(matched)
+
+
+class FuzzyEngine:
+    """
+    Fuzzy matcher over a pool of candidate strings.
+
+    The pool (and, for rapidfuzz, its preprocessed form) is built once and kept
+    in memory. Scores use WRatio on both backends, so rankings line up with the
+    original fuzzywuzzy.process.extract calls. `min_score` is passed down as the
+    scorer's score_cutoff, which lets rapidfuzz skip candidates early.
+
+    Pools larger than `blocking_top_k` get an NgramIndex, and only the top-K
+    candidates by shared n-grams are scored per query.
+
+    `add` and `remove` keep the pool in step with curation edits without a
+    rebuild: new entries are appended, removed ones are tombstoned and filtered
+    out of the results. Edits go to a copy() while the original keeps serving.
+    """
+
+    def __init__(
+        self,
+        choices: Iterable[str],
+        backend: Optional[str] = None,
+        min_score: Optional[int] = None,
+        blocking_top_k: Optional[int] = None,
+    ):
+        self.choices: List[str] = list(choices)
+        self.backend = resolve_backend(backend)
+        self.min_score = FUZZY_MIN_SCORE if min_score is None else min_score
+        self.blocking_top_k = FUZZY_BLOCKING_TOP_K if blocking_top_k is None else blocking_top_k
+        self._positions: Dict[str, int] = {choice: position for position, choice in enumerate(self.choices)}
+        self._removed: set = set()
+        self.candidates_scored = 0  # running total of choices scored, reported on /metrics
+        self._processed: Optional[List[str]] = None
+        if self.backend == "rapidfuzz":
+            self._processed = [rapidfuzz_utils.default_process(choice) for choice in self.choices]
+        self.ngram_index: Optional[NgramIndex] = None
+        if 0 < self.blocking_top_k < len(self.choices):
+            self.ngram_index = NgramIndex(self.choices)
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, choice: str) -> bool:
+        return choice in self._positions
+
+    def copy(self) -> "FuzzyEngine":
+        engine = copy.copy(self)
+        engine.choices = list(self.choices)
+        engine._positions = dict(self._positions)
+        engine._removed = set(self._removed)
+        if self._processed is not None:
+            engine._processed = list(self._processed)
+        if self.ngram_index is not None:
+            engine.ngram_index = self.ngram_index.copy()
+        return engine
+
+    def flush(self):
+        """Merges the n-gram postings of added entries up front, so lookups only read."""
+        if self.ngram_index is not None:
+            self.ngram_index.flush()
+
+    def add(self, choice: str):
+        if choice in self._positions:
+            return
+        position = len(self.choices)
+        self.choices.append(choice)
+        self._positions[choice] = position
+        if self._processed is not None:
+            self._processed.append(rapidfuzz_utils.default_process(choice))
+        if self.ngram_index is not None:
+            self.ngram_index.add(position, choice)
+
+    def remove(self, choice: str):
+        position = self._positions.pop(choice, None)
+        if position is not None:
+            self._removed.add(position)
+
+    def _visible(self, hits, limit: int) -> List[Tuple[str, int]]:
+        """(position, score) hits -> (choice, score) pairs, skipping removed entries."""
+        results = []
+        for position, score in hits:
+            if position in self._removed:
+                continue
+            results.append((self.choices[position], int(round(score))))
+            if len(results) >= limit:
+                break
+        return results
+
+    def extract(self, query: str, limit: int = 10, min_score: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Return up to `limit` (choice, score) pairs, best first."""
+        score_cutoff = self.min_score if min_score is None else min_score
+        if not self._positions:
+            return []
+        fetch = limit + len(self._removed)
+
+        positions = None
+        if self.ngram_index is not None:
+            positions = self.ngram_index.candidates(query, self.blocking_top_k)
+            if len(positions) == 0:
+                return []
+
+        self.candidates_scored += len(self.choices) if positions is None else len(positions)
+        if self.backend == "rapidfuzz":
+            pool = self._processed if positions is None else [self._processed[i] for i in positions]
+            hits = rapidfuzz_process.extract(
+                rapidfuzz_utils.default_process(query),
+                pool,
+                scorer=rapidfuzz_fuzz.WRatio,
+                processor=None,
+                limit=fetch,
+                score_cutoff=score_cutoff,
+            )
+            if positions is not None:
+                return self._visible(((positions[index], score) for _, score, index in hits), limit)
+            return self._visible(((index, score) for _, score, index in hits), limit)
+
+        pool = dict(enumerate(self.choices)) if positions is None else {i: self.choices[i] for i in positions}
+        hits = fuzzywuzzy_process.extractBests(query, pool, limit=fetch, score_cutoff=score_cutoff)
+        return self._visible(((position, score) for _, score, position in hits), limit)
+
+    def extract_many(
+        self, queries: List[str], limit: int = 10, min_score: Optional[int] = None
+    ) -> List[List[Tuple[str, int]]]:
+        """
+        `extract` for a list of queries, spread over FUZZY_WORKERS cores on the rapidfuzz
+        backend. Without blocking the queries are scored as cdist score matrices; with
+        blocking each query's candidate subset is scored by its own one-row cdist, on a
+        thread pool (cdist releases the GIL, process.extract does not). Results are the
+        same as calling `extract` per query.
+        """
+        if self.backend != "rapidfuzz" or not self._positions:
+            return [self.extract(query, limit=limit, min_score=min_score) for query in queries]
+
+        score_cutoff = self.min_score if min_score is None else min_score
+        if self.ngram_index is not None:
+            return self._extract_many_blocked(queries, limit, score_cutoff)
+
+        results = []
+        for start in range(0, len(queries), FUZZY_BATCH_CHUNK):
+            chunk = [rapidfuzz_utils.default_process(query) for query in queries[start:start + FUZZY_BATCH_CHUNK]]
+            self.candidates_scored += len(chunk) * len(self._processed)
+            scores = rapidfuzz_process.cdist(
+                chunk,
+                self._processed,
+                scorer=rapidfuzz_fuzz.WRatio,
+                processor=None,
+                score_cutoff=score_cutoff,
+                dtype=np.float64,
+                workers=FUZZY_WORKERS,
+            )
+            results.extend(self._top_hits(row, limit, score_cutoff) for row in scores)
+        return results
+
+    def _extract_many_blocked(self, queries: List[str], limit: int, score_cutoff: int) -> List[List[Tuple[str, int]]]:
+        self.ngram_index.flush()
+
+        def extract_blocked(query: str):
+            candidates = self.ngram_index.candidates(query, self.blocking_top_k)
+            if len(candidates) == 0:
+                return [], 0
+            scores = rapidfuzz_process.cdist(
+                [rapidfuzz_utils.default_process(query)],
+                [self._processed[position] for position in candidates],
+                scorer=rapidfuzz_fuzz.WRatio,
+                processor=None,
+                score_cutoff=score_cutoff,
+                dtype=np.float64,
+                workers=1,
+            )[0]
+            return self._top_hits(scores, limit, score_cutoff, candidates), len(candidates)
+
+        workers = (os.cpu_count() or 1) if FUZZY_WORKERS < 0 else FUZZY_WORKERS
+        if workers > 1 and len(queries) > 1:
+            with ThreadPoolExecutor(max_workers=min(workers, len(queries))) as pool:
+                extracted = list(pool.map(extract_blocked, queries))
+        else:
+            extracted = [extract_blocked(query) for query in queries]
+        self.candidates_scored += sum(scored for _, scored in extracted)
+        return [hits for hits, _ in extracted]
+
+    def _top_hits(self, scores: np.ndarray, limit: int, score_cutoff: int,
+                  candidates: Optional[np.ndarray] = None) -> List[Tuple[str, int]]:
+        # Same ordering as process.extract: score descending, then pool order (candidates are sorted)
+        fetch = limit + len(self._removed)
+        if fetch < len(scores):
+            kth_best = np.partition(scores, -fetch)[-fetch]
+            indexes = np.flatnonzero(scores >= kth_best)
+        else:
+            indexes = np.arange(len(scores))
+        indexes = indexes[scores[indexes] >= score_cutoff]
+        indexes = indexes[np.lexsort((indexes, -scores[indexes]))]
+        positions = indexes if candidates is None else candidates[indexes]
+        return self._visible(((position, score) for position, score in zip(positions, scores[indexes])), limit)
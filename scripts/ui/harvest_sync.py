@@ -0,0 +1,230 @@
+"""
+Incremental sync of scraper/harvester output into the served data model.
+
+Reads what the scrapers produce (pubchem_harvester.py NDJSON, chemical_identifiers.csv,
+substance_data.csv, substance_data_with_sources.csv), matches each harvested
+substance to its Substance_Reference rows (by CAS number, then by name) and
+diffs its synonyms against the Substance_Sourcing rows:
+
+- insert: a harvested synonym the substance does not have yet
+- update: a harvested synonym whose harvest-owned row cites a different source
+- delete: a harvest-owned row whose synonym the new harvest no longer lists
+
+"Harvest-owned" rows are those whose mapping reference starts with one of
+HARVEST_SOURCE_PREFIXES (PubChem and Wikipedia by default); curated rows from
+other sources and primary rows are never updated or deleted. Updates and
+deletes stay within a source family (the prefix a row's source starts with):
+a Wikipedia harvest only touches a substance's Wikipedia rows, never its
+PubChem ones. Substances and families the harvest found nothing for are left
+alone. The changes are applied in one
+DataSnapshot.sync_synonyms call, i.e. one new data version, no rebuild.
+
+    python harvest_sync.py harvest.ndjson substance_data_with_sources.csv --dry-run
+    python harvest_sync.py harvest.ndjson --backend http://127.0.0.1:8006
+"""
+import argparse
+import ast
+import json
+import os
+import re
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+import requests
+
+from lookup_index import cas_key, normalize_key
+
+HARVEST_SOURCE_PREFIXES = tuple(
+    os.getenv("HARVEST_SOURCE_PREFIXES", "https://pubchem.ncbi.nlm.nih.gov/,https://en.wikipedia.org/").split(",")
+)
+PUBCHEM_SYNONYM_SOURCE = "https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/name/{cas}/synonyms/JSON"
+PUBCHEM_CID_SYNONYM_SOURCE = re.compile(r"https://pubchem\.ncbi\.nlm\.nih\.gov/rest/pug/compound/cid/\d+/synonyms/JSON")
+HARVEST_COLUMNS = ["substance", "cas", "synonym", "source"]
+MISSING = {"", "N/A", "nan", "None", "Not Available"}
+
+
+class SyncPlan(NamedTuple):
+    inserts: List[dict]
+    updates: List[Tuple[str, str, str, str]]  # (Substance_Reference_ID, synonym, source, new source)
+    deletes: List[Tuple[str, str, str]]  # (Substance_Reference_ID, synonym, source)
+    unmatched: List[str]
+
+    def summary(self) -> dict:
+        return {
+            "inserts": len(self.inserts),
+            "updates": len(self.updates),
+            "deletes": len(self.deletes),
+            "unmatched": len(self.unmatched),
+        }
+
+
+# ---------- Reading harvester output ----------
+def read_harvest(path: str) -> pd.DataFrame:
+    """One row per (substance, CAS, synonym, source) from any of the scraper output formats."""
+    if path.lower().endswith((".ndjson", ".jsonl")):
+        with open(path, encoding="utf-8") as handle:
+            records = [json.loads(line) for line in handle if line.strip()]
+        return harvest_frame(records)
+    frame = pd.read_csv(path, dtype=str, keep_default_na=False)
+    return harvest_frame(frame.to_dict(orient="records"))
+
+
+def harvest_frame(records: List[dict]) -> pd.DataFrame:
+    """Normalizes harvester records / scraper CSV rows into HARVEST_COLUMNS."""
+    rows = []
+    for record in records:
+        if record.get("Status") not in (None, "ok"):
+            continue  # not found / failed lookups carry no synonyms
+        substance = _value(record.get("Substance", record.get("Substance Name")))
+        cas = _value(record.get("CAS Number"))
+        source = _synonym_source(_value(record.get("Synonym Source")), cas)
+        synonyms = record.get("Synonyms", record.get("Synonym"))
+        if isinstance(synonyms, str) and synonyms.startswith("["):
+            synonyms = ast.literal_eval(synonyms)  # a list written to CSV by pandas
+        for synonym in synonyms if isinstance(synonyms, list) else [synonyms]:
+            synonym = _value(synonym)
+            if substance and synonym:
+                rows.append({"substance": substance, "cas": cas, "synonym": synonym, "source": source})
+    return pd.DataFrame(rows, columns=HARVEST_COLUMNS).drop_duplicates(["substance", "cas", "synonym"])
+
+
+def _synonym_source(source, cas):
+    """
+    The workbook cites PubChem synonyms as name/{CAS}; older harvester output cites cid/{CID}.
+    Both name the same list, so the CID form is rewritten when the CAS number is known,
+    otherwise re-syncing an unchanged harvest would re-source every row.
+    """
+    if cas and (source is None or PUBCHEM_CID_SYNONYM_SOURCE.fullmatch(source)):
+        return PUBCHEM_SYNONYM_SOURCE.format(cas=cas)
+    return source
+
+
+def _value(value):
+    value = None if value is None else str(value).strip()
+    return None if value is None or value in MISSING else value
+
+
+# ---------- Diffing against the data model ----------
+def match_references(snap, substance: str, cas) -> List[str]:
+    """Substance_Reference_IDs for a harvested substance: CAS matches, narrowed by name when ambiguous."""
+    by_cas = snap.index.lookup_cas(cas_key(cas)) if cas else []
+    by_name = snap.index.lookup_name(normalize_key(substance), substance)
+    both = [ref_id for ref_id in by_cas if ref_id in by_name]
+    return list(dict.fromkeys(both or by_cas or by_name))
+
+
+def plan_sync(snap, harvest: pd.DataFrame) -> SyncPlan:
+    """Inserts/updates/deletes that bring the snapshot's synonyms in line with `harvest`."""
+    source_df = snap.source_df
+    primary = set()
+    if "Substance_Sourcing_Primary" in source_df.columns:
+        flagged = source_df[source_df["Substance_Sourcing_Primary"] == True]  # noqa: E712 (object column)
+        primary = set(zip(flagged["(FK) Substance_ID"], flagged["Substance_Sourcing_Local_Name"]))
+    templates = _row_templates(source_df)
+
+    harvested: Dict[str, Dict[str, dict]] = defaultdict(dict)  # ref_id -> synonym key -> harvest row
+    by_family = defaultdict(lambda: defaultdict(dict))  # ref_id -> source family -> synonym key -> harvest row
+    unmatched = []
+    for (substance, cas), rows in harvest.groupby(["substance", "cas"], dropna=False, sort=False):
+        ref_ids = match_references(snap, substance, None if pd.isna(cas) else cas)
+        if not ref_ids:
+            unmatched.append(substance)
+        for ref_id in ref_ids:
+            for row in rows.to_dict(orient="records"):
+                key = normalize_key(row["synonym"])
+                harvested[ref_id].setdefault(key, row)
+                family = _source_family(row["source"])
+                if family:
+                    by_family[ref_id][family].setdefault(key, row)
+
+    inserts, updates, deletes = [], [], []
+    for ref_id, synonyms in harvested.items():
+        existing = {}  # synonym key -> [(synonym, source), ...] as stored
+        for pair in snap.index.record(ref_id).synonym_source_pairs:
+            existing.setdefault(normalize_key(pair["synonym"]), []).append((pair["synonym"], pair["source"]))
+
+        for key, row in synonyms.items():
+            if key not in existing:
+                inserts.append({
+                    **templates.get(ref_id, {}),
+                    "(FK) Substance_ID": ref_id,
+                    "Substance_Sourcing_Local_Name": row["synonym"],
+                    "Substance_Sourcing_Mapping_Reference": row["source"],
+                })
+
+        # Only rows of a family this harvest covers are re-sourced or deleted, and only by that family's rows
+        families = by_family[ref_id]
+        for key, stored in existing.items():
+            for synonym, source in stored:
+                family = _source_family(source)
+                if family not in families:
+                    continue
+                row = families[family].get(key)
+                if row is None:
+                    if (ref_id, synonym) not in primary:
+                        deletes.append((ref_id, synonym, source))
+                elif source != row["source"]:
+                    updates.append((ref_id, synonym, source, row["source"]))
+
+    return SyncPlan(inserts, list(dict.fromkeys(updates)), list(dict.fromkeys(deletes)), unmatched)
+
+
+def _harvest_owned(source) -> bool:
+    return _source_family(source) is not None
+
+
+def _source_family(source) -> Optional[str]:
+    """The HARVEST_SOURCE_PREFIXES entry `source` starts with (None for curated sources)."""
+    if isinstance(source, str):
+        for prefix in HARVEST_SOURCE_PREFIXES:
+            if source.startswith(prefix):
+                return prefix
+    return None
+
+
+def _row_templates(source_df: pd.DataFrame) -> Dict[str, dict]:
+    """Type/data-source/local-ID columns of an existing harvest-owned, non-primary row per substance, for new rows."""
+    columns = [column for column in ("(FK) Substance_Sourcing_Type_ID", "(FK) Data_Source_ID",
+                                     "Substance_Sourcing_Primary", "Substance_Sourcing_Local_ID",
+                                     "Substance_Sourcing_Local_ID_Attribute") if column in source_df.columns]
+    if not columns or "Substance_Sourcing_Mapping_Reference" not in source_df.columns:
+        return {}
+    rows = source_df[source_df["Substance_Sourcing_Mapping_Reference"].map(_harvest_owned)]
+    if "Substance_Sourcing_Primary" in rows.columns:
+        rows = rows[rows["Substance_Sourcing_Primary"] != True]  # noqa: E712 (object column)
+    rows = rows.drop_duplicates("(FK) Substance_ID")
+    return dict(zip(rows["(FK) Substance_ID"], rows[columns].to_dict(orient="records")))
+
+
+def sync_harvest(snap, harvest: pd.DataFrame, dry_run: bool = False) -> dict:
+    """Plans and (unless dry_run) applies the sync; returns the counts and the resulting data version."""
+    with snap.lock:
+        plan = plan_sync(snap, harvest)
+        applied = None if dry_run else snap.sync_synonyms(plan.inserts, plan.deletes, plan.updates)
+        return {
+            "planned": plan.summary(),
+            "applied": applied,
+            "unmatched": plan.unmatched[:100],
+            "data_version": snap.version,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync harvested synonyms into the running backend.")
+    parser.add_argument("files", nargs="+", help="Harvester NDJSON and/or scraper CSV outputs")
+    parser.add_argument("--backend", default=os.getenv("BACKEND_URL", "http://127.0.0.1:8006"), help="Backend URL")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+    args = parser.parse_args(argv)
+
+    harvest = pd.concat([read_harvest(path) for path in args.files], ignore_index=True)
+    harvest = harvest.drop_duplicates(["substance", "cas", "synonym"])
+    records = harvest.astype(object).where(harvest.notna(), None).to_dict(orient="records")
+    response = requests.post(f"{args.backend}/harvest/sync", params={"dry_run": args.dry_run},
+                             json={"records": records}, timeout=600)
+    response.raise_for_status()
+    print(json.dumps(response.json(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from cas_number import parse_cas
+from chemical_names import canonical_name
+
+
+def normalize_key(text) -> str:
+    """Normalization shared by the index keys and the incoming queries (canonical chemical names, see chemical_names.py)."""
+    return canonical_name(text)
+
+
+def literal_key(text) -> str:
+    """The key before canonicalization: only case and surrounding whitespace ignored."""
+    return str(text).strip().casefold()
+
+
+def literal_first(entries: List[Tuple[str, str]], query: Optional[str]) -> List[Tuple[str, str]]:
+    """
+    (Substance_Reference_ID, synonym) entries of one canonical-key bucket, those spelled
+    like `query` (ignoring case) first, so "PB-22" reports "PB-22" rather than "PB-22,".
+    """
+    if query is None:
+        return entries
+    literal = literal_key(query)
+    return sorted(entries, key=lambda entry: literal_key(entry[1]) != literal)
+
+
+def split_keys(spellings: Iterable[Tuple[str, str, str]]) -> Set[str]:
+    """
+    Canonical keys whose spellings name different substances, from (key, name or synonym,
+    Substance_Reference_ID) triples. "china-white" and "china white" share a key, but the
+    workbook links them to different sets of substances; for such keys the lookups only
+    return entries spelled like the query (see spelled_like), as before canonicalization.
+    """
+    substances = defaultdict(lambda: defaultdict(set))  # key -> literal spelling -> Substance_Reference_IDs
+    for key, text, sub_ref_id in spellings:
+        substances[key][literal_key(text)].add(sub_ref_id)
+    return {key for key, spelled in substances.items() if len({frozenset(ids) for ids in spelled.values()}) > 1}
+
+
+def spelled_like(entries: list, query: str, spelling) -> list:
+    """The entries whose spelling(entry) is `query` up to case and surrounding whitespace."""
+    literal = literal_key(query)
+    return [entry for entry in entries if literal_key(spelling(entry)) == literal]
+
+
+def cas_key(text) -> str:
+    """CAS index key: the canonical CAS number when `text` is shaped like one (see cas_number.py), else normalize_key."""
+    cas = parse_cas(text)
+    return cas.canonical if cas else normalize_key(text)
+
+
+@dataclass
+class SubstanceRecord:
+    """Per-substance synonym data attached to every MatchResult for that substance."""
+    synonym_count: int = 0
+    synonym_sources: List[str] = field(default_factory=list)
+    synonym_source_pairs: List[dict] = field(default_factory=list)
+
+
+EMPTY_RECORD = SubstanceRecord()
+
+
+class SubstanceIndex:
+    """
+    Hash indexes over the data model, built once at load time so the exact
+    /match scenarios are dictionary hits instead of full-column scans.
+
+    - cas:       canonical CAS number   -> [Substance_Reference_ID, ...]
+    - names:     canonical name         -> [Substance_Reference_ID, ...]
+    - synonyms:  canonical synonym      -> [(Substance_Reference_ID, synonym), ...]
+    - references: Substance_Reference_ID -> reference row (first occurrence)
+    - records:   Substance_Reference_ID -> SubstanceRecord
+    - split:     name/synonym keys whose spellings name different substances (see split_keys)
+
+    Lists keep the row order of the source tables so results come back in the
+    same order the DataFrame scans produced.
+    """
+
+    def __init__(self, ref_df: pd.DataFrame, source_df: pd.DataFrame, combined_df: pd.DataFrame):
+        self.cas: Dict[str, List[str]] = defaultdict(list)
+        self.names: Dict[str, List[str]] = defaultdict(list)
+        self.synonyms: Dict[str, List[Tuple[str, str]]] = defaultdict(list)
+        self.references: Dict[str, dict] = {}
+        self.records: Dict[str, SubstanceRecord] = {}
+
+        for row in ref_df.to_dict(orient="records"):
+            sub_ref_id = row["Substance_Reference_ID"]
+            self.cas[cas_key(row["Substance_ID"])].append(sub_ref_id)
+            self.names[normalize_key(row["Substance_Name"])].append(sub_ref_id)
+            self.references.setdefault(sub_ref_id, row)
+
+        for sub_ref_id, synonym in zip(
+            combined_df["Substance_Reference_ID"], combined_df["Substance_Sourcing_Local_Name"]
+        ):
+            self.synonyms[normalize_key(synonym)].append((sub_ref_id, synonym))
+
+        self._build_records(source_df, combined_df)
+        self.split = split_keys(self._spellings(set(self.names) | set(self.synonyms)))
+
+    def _build_records(self, source_df: pd.DataFrame, combined_df: pd.DataFrame):
+        # One pass over Substance_Sourcing instead of three filtered scans per returned hit
+        has_mapping = self.has_mapping = "Substance_Sourcing_Mapping_Reference" in source_df.columns
+        if has_mapping:
+            mapping_refs = source_df["Substance_Sourcing_Mapping_Reference"]
+        else:
+            mapping_refs = ["Not Available"] * len(source_df)
+
+        for sub_ref_id, synonym, source in zip(
+            source_df["(FK) Substance_ID"], source_df["Substance_Sourcing_Local_Name"], mapping_refs
+        ):
+            record = self.records.get(sub_ref_id)
+            if record is None:
+                record = self.records[sub_ref_id] = SubstanceRecord()
+            record.synonym_source_pairs.append({"synonym": synonym, "source": source})
+            if has_mapping and pd.notna(source) and source not in record.synonym_sources:
+                record.synonym_sources.append(source)
+
+        synonym_counts = combined_df.groupby("Substance_Reference_ID")["Substance_Sourcing_Local_Name"].nunique()
+        for sub_ref_id, count in synonym_counts.items():
+            record = self.records.get(sub_ref_id)
+            if record is None:
+                record = self.records[sub_ref_id] = SubstanceRecord()
+            record.synonym_count = int(count)
+
+    def lookup_cas(self, query_key: str) -> List[str]:
+        return self.cas.get(query_key, [])
+
+    def lookup_name(self, query_key: str, query: Optional[str] = None) -> List[str]:
+        ref_ids = self.names.get(query_key, [])
+        if query is not None and query_key in self.split:
+            ref_ids = spelled_like(ref_ids, query, lambda sub_ref_id: self.references[sub_ref_id]["Substance_Name"])
+        return ref_ids
+
+    def lookup_synonym(self, query_key: str, query: Optional[str] = None) -> List[Tuple[str, str]]:
+        entries = self.synonyms.get(query_key, [])
+        if query is not None and query_key in self.split:
+            entries = spelled_like(entries, query, lambda entry: entry[1])
+        return literal_first(entries, query)
+
+    def reference(self, sub_ref_id: str) -> dict:
+        return self.references[sub_ref_id]
+
+    def record(self, sub_ref_id: str) -> SubstanceRecord:
+        return self.records.get(str(sub_ref_id).strip(), EMPTY_RECORD)
+
+    # ---------- Incremental maintenance (curation edits) ----------
+    # Edits replace the lists and records they change instead of mutating them, so a
+    # copy() shares everything else with the index it came from (see DataSnapshot.draft)
+    def copy(self) -> "SubstanceIndex":
+        index = SubstanceIndex.__new__(SubstanceIndex)
+        index.has_mapping = self.has_mapping
+        index.cas = defaultdict(list, self.cas)
+        index.names = defaultdict(list, self.names)
+        index.synonyms = defaultdict(list, self.synonyms)
+        index.references = dict(self.references)
+        index.records = dict(self.records)
+        index.split = set(self.split)
+        return index
+
+    def add_reference(self, row: dict):
+        sub_ref_id = row["Substance_Reference_ID"]
+        self.references[sub_ref_id] = row
+        _append(self.cas, cas_key(row["Substance_ID"]), sub_ref_id)
+        _append(self.names, normalize_key(row["Substance_Name"]), sub_ref_id)
+        self._refresh_split(normalize_key(row["Substance_Name"]))
+
+    def remove_reference(self, sub_ref_id: str) -> dict:
+        row = self.references.pop(sub_ref_id)
+        _discard(self.cas, cas_key(row["Substance_ID"]), sub_ref_id)
+        _discard(self.names, normalize_key(row["Substance_Name"]), sub_ref_id)
+        self._refresh_split(normalize_key(row["Substance_Name"]))
+        return row
+
+    def add_synonym(self, sub_ref_id: str, synonym: str, source):
+        # Same shape as the combined_df rows: unknown substances are "Not Available"
+        indexed_id = sub_ref_id if sub_ref_id in self.references else "Not Available"
+        _append(self.synonyms, normalize_key(synonym), (indexed_id, synonym))
+        self._refresh_split(normalize_key(synonym))
+        pairs = self.records.get(sub_ref_id, EMPTY_RECORD).synonym_source_pairs
+        self.records[sub_ref_id] = self._record(pairs + [{"synonym": synonym, "source": source}])
+
+    def remove_synonym(self, sub_ref_id: str, synonym: str):
+        indexed_id = sub_ref_id if sub_ref_id in self.references else "Not Available"
+        _discard(self.synonyms, normalize_key(synonym), (indexed_id, synonym))
+        self._refresh_split(normalize_key(synonym))
+        record = self.records.get(sub_ref_id)
+        if record is not None:
+            pairs = list(record.synonym_source_pairs)
+            for position, pair in enumerate(pairs):
+                if pair["synonym"] == synonym:
+                    del pairs[position]
+                    break
+            self.records[sub_ref_id] = self._record(pairs)
+
+    def _spellings(self, keys: Iterable[str]):
+        for key in keys:
+            for sub_ref_id in self.names.get(key, []):
+                yield key, self.references[sub_ref_id]["Substance_Name"], sub_ref_id
+            for sub_ref_id, synonym in self.synonyms.get(key, []):
+                if sub_ref_id != "Not Available":
+                    yield key, synonym, sub_ref_id
+
+    def _refresh_split(self, key: str):
+        if split_keys(self._spellings([key])):
+            self.split.add(key)
+        else:
+            self.split.discard(key)
+
+    def _record(self, pairs: List[dict]) -> SubstanceRecord:
+        sources = []
+        if self.has_mapping:
+            for pair in pairs:
+                if pd.notna(pair["source"]) and pair["source"] not in sources:
+                    sources.append(pair["source"])
+        return SubstanceRecord(len({pair["synonym"] for pair in pairs}), sources, pairs)
+
+
+def _append(mapping: dict, key: str, value):
+    mapping[key] = mapping.get(key, []) + [value]
+
+
+def _discard(mapping: dict, key: str, value):
+    """Removes one occurrence of `value` from mapping[key], dropping the key once it is empty."""
+    values = mapping.get(key)
+    if values and value in values:
+        values = list(values)
+        values.remove(value)
+        if values:
+            mapping[key] = values
+        else:
+            del mapping[key]
@@ -0,0 +1,77 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+# Tunables (environment overrides, like the fuzzy_engine settings); MATCH_CACHE_SIZE=0 disables the cache
+MATCH_CACHE_SIZE = int(os.getenv("MATCH_CACHE_SIZE", "4096"))
+MATCH_CACHE_TTL = float(os.getenv("MATCH_CACHE_TTL", "3600"))
+
+
+class MatchCache:
+    """
+    Bounded LRU cache with per-entry TTL for /match results.
+
+    Entries belong to one data version: the first lookup with a different
+    version drops every entry at once (under the lock), so a reload or edit can
+    never serve results computed against the old data.
+    """
+
+    def __init__(self, max_entries: int = MATCH_CACHE_SIZE, ttl_seconds: float = MATCH_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, version: str, key: Hashable):
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, version: str, key: Hashable, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self, version: Optional[str] = None):
+        with self._lock:
+            self._entries.clear()
+            self.version = version
+
+    def _check_version(self, version: str):
+        if version != self.version:
+            self._entries.clear()
+            self.version = version
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "version": self.version,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
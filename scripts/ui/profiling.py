@@ -0,0 +1,173 @@
+"""
+Opt-in per-request profiling for the backend.
+
+With PROFILING_ENABLED=1, a /match or /synonyms request sent with an
+`X-Profile: 1` header (or a `profile=1` query parameter) runs under cProfile.
+The profile is stored under PROFILE_DIR twice: as `<id>.prof` (pstats, for
+snakeviz / flameprof / gprof2dot) and as `<id>.collapsed` (folded stacks, for
+flamegraph.pl or speedscope). The response carries the id in `X-Profile-Id`,
+and GET /debug/profiles/{id} serves the files.
+
+When disabled (the default) nothing is installed: `profiled` returns the
+endpoint unchanged and the backend adds no middleware or routes.
+
+    curl -H "X-Profile: 1" "http://127.0.0.1:8006/match?query=carfentanil%20citrate" -D -
+    curl "http://127.0.0.1:8006/debug/profiles/<id>?format=collapsed" | flamegraph.pl > match.svg
+"""
+import contextvars
+import cProfile
+import functools
+import os
+import pstats
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from data_loader import CACHE_DIR
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", CACHE_DIR / "profiles"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))  # newest profiles kept on disk
+PROFILED_PATHS = tuple(os.getenv("PROFILED_PATHS", "/match,/synonyms").split(","))
+
+PROFILE_ID = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$")
+_TRUTHY = {"1", "true", "yes", "on"}
+
+# The profiler of the request being handled; set by the middleware, read by `profiled` in the worker thread
+_current_profile: contextvars.ContextVar[Optional[cProfile.Profile]] = contextvars.ContextVar(
+    "current_profile", default=None
+)
+
+
+def requested(path: str, headers, query_params) -> bool:
+    if path not in PROFILED_PATHS:
+        return False
+    flag = headers.get("x-profile") or query_params.get("profile") or ""
+    return flag.lower() in _TRUTHY
+
+
+def start() -> contextvars.Token:
+    return _current_profile.set(cProfile.Profile())
+
+
+def active() -> bool:
+    return _current_profile.get() is not None
+
+
+def profiled(function):
+    """
+    Runs the endpoint under the request's profiler, if it has one.
+
+    cProfile only sees the thread it is enabled in, and FastAPI runs sync endpoints
+    in a worker thread, so the profiler is switched on here rather than in the middleware.
+    """
+    if not PROFILING_ENABLED:
+        return function
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        profile = _current_profile.get()
+        if profile is None:
+            return function(*args, **kwargs)
+        profile.enable()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profile.disable()
+
+    return wrapper
+
+
+def finish(token: contextvars.Token, label: str) -> str:
+    """Stores the request's profile (.prof and .collapsed) and returns its id."""
+    profile = _current_profile.get()
+    _current_profile.reset(token)
+    profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    stats = pstats.Stats(profile)
+    stats.dump_stats(PROFILE_DIR / f"{profile_id}.prof")
+    with open(PROFILE_DIR / f"{profile_id}.collapsed", "w", encoding="utf-8") as handle:
+        handle.write(f"# {label}\n")
+        for stack, microseconds in collapsed_stacks(stats).items():
+            handle.write(f"{stack} {microseconds}\n")
+    _prune()
+    return profile_id
+
+
+def profile_path(profile_id: str, fmt: str) -> Optional[Path]:
+    if not PROFILE_ID.match(profile_id) or fmt not in ("prof", "collapsed"):
+        return None
+    path = PROFILE_DIR / f"{profile_id}.{fmt}"
+    return path if path.exists() else None
+
+
+def list_profiles() -> List[dict]:
+    if not PROFILE_DIR.exists():
+        return []
+    profiles = []
+    for path in sorted(PROFILE_DIR.glob("*.collapsed"), reverse=True):
+        with open(path, encoding="utf-8") as handle:
+            label = handle.readline()[2:].strip()
+        profiles.append({"id": path.stem, "request": label})
+    return profiles
+
+
+def _prune():
+    stored = sorted(PROFILE_DIR.glob("*.prof"))
+    for path in stored[:max(0, len(stored) - PROFILE_KEEP)]:
+        path.unlink(missing_ok=True)
+        path.with_suffix(".collapsed").unlink(missing_ok=True)
+
+
+# ---------- Folded stacks ----------
+def _frame_label(function: tuple) -> str:
+    filename, line, name = function
+    if filename == "~":
+        return name  # built-ins, e.g. <built-in method builtins.sorted>
+    return f"{name} ({os.path.basename(filename)}:{line})".replace(";", ",")
+
+
+def collapsed_stacks(stats: pstats.Stats, max_depth: int = 64, min_fraction: float = 0.0005) -> Dict[str, int]:
+    """
+    Folded stacks ("root;caller;callee self-microseconds") rebuilt from cProfile's call graph.
+
+    cProfile records caller -> callee edges, not whole stacks, so a function called
+    from several places has its own time split across those paths in proportion
+    to the time each call edge accounts for (the same approximation flameprof uses).
+    Subtrees under `min_fraction` of the total time are folded into their top frame,
+    which keeps the walk bounded on large call graphs (pandas, pydantic) without
+    losing their time.
+    """
+    callees: Dict[tuple, Dict[tuple, float]] = {}
+    for function, (_, _, _, _, callers) in stats.stats.items():
+        for caller, (_, _, _, cumulative) in callers.items():
+            callees.setdefault(caller, {})[function] = cumulative
+    roots = [function for function, entry in stats.stats.items() if not entry[4]]
+    threshold = sum(stats.stats[root][3] for root in roots) * min_fraction
+
+    folded: Dict[str, int] = {}
+
+    def add(stack, seconds):
+        microseconds = int(seconds * 1_000_000)
+        if microseconds:
+            key = ";".join(stack)
+            folded[key] = folded.get(key, 0) + microseconds
+
+    def walk(function, path, share):
+        _, _, own, cumulative, _ = stats.stats[function]
+        stack = path + [_frame_label(function)]
+        if len(stack) >= max_depth or cumulative * share < threshold:
+            add(stack, cumulative * share)
+            return
+        add(stack, own * share)
+        for callee, edge_cumulative in callees.get(function, {}).items():
+            callee_cumulative = stats.stats[callee][3]
+            if callee_cumulative <= 0 or _frame_label(callee) in stack:
+                continue  # recursion: its time is already attributed on the way down
+            walk(callee, stack, share * min(1.0, edge_cumulative / callee_cumulative))
+
+    for root in roots:
+        walk(root, [], 1.0)
+    return folded
@@ -0,0 +1,358 @@
+"""
+SQLite storage backend for the data model (STORAGE_BACKEND=sqlite).
+
+The cleaned Substance_Reference / Substance_Sourcing frames and the small lookup
+sheets are written once per data version to their own SQLite file
+(data_model-<version>-f<format>.sqlite next to SQLITE_STORE_PATH), with indexes
+on the CAS, normalized-name and normalized-synonym keys and an FTS5 table for
+token search. Every API worker opens the file read-only (one connection per
+thread), so only the fuzzy candidate strings stay in process memory. A reload
+opens the new version's file; the old one is left in place for requests and
+workers still reading it, and only the newest SQLITE_STORE_KEEP files are kept.
+
+    python sqlite_store.py      # build (or refresh) the store and print a summary
+"""
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from data_loader import CACHE_DIR, DataModel, data_model_version, load_data_model
+from data_snapshot import prepare_frames
+from fuzzy_engine import FuzzyEngine
+from lookup_index import EMPTY_RECORD, SubstanceRecord, cas_key, literal_first, normalize_key, spelled_like, split_keys
+
+STORE_PATH = Path(os.getenv("SQLITE_STORE_PATH", CACHE_DIR / "data_model.sqlite"))
+STORE_KEEP = int(os.getenv("SQLITE_STORE_KEEP", "3"))  # newest versioned store files kept on disk
+
+# Sheets /synonyms reads as-is (the big tables are only queried through SQL)
+LOOKUP_SHEETS = ["Substance_Type", "Substance_Sourcing_Type", "Substance_Weighting_Tag", "Weighting_Tag"]
+
+# Bumped whenever the key normalization or schema changes, so older stores are rebuilt
+STORE_FORMAT = "4"
+
+# Bookkeeping columns added next to the data-model columns
+_REFERENCE_KEYS = ("_pos", "_cas_key", "_name_key")
+
+_SCHEMA = """
+CREATE INDEX idx_reference_id ON substance_reference ("Substance_Reference_ID", _pos);
+CREATE INDEX idx_reference_cas ON substance_reference (_cas_key, _pos);
+CREATE INDEX idx_reference_name ON substance_reference (_name_key, _pos);
+CREATE INDEX idx_sourcing_substance ON substance_sourcing ("(FK) Substance_ID", _pos);
+CREATE INDEX idx_sourcing_synonym ON substance_sourcing (_synonym_key, _pos);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE split_key (key TEXT PRIMARY KEY);
+"""
+
+_SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE substance_search USING fts5(text, substance_reference_id UNINDEXED, kind UNINDEXED);
+INSERT INTO substance_search
+    SELECT "Substance_Name", "Substance_Reference_ID", 'substance name' FROM substance_reference;
+INSERT INTO substance_search
+    SELECT "Substance_Sourcing_Local_Name", "(FK) Substance_ID", 'synonym' FROM substance_sourcing;
+"""
+
+
+def build_store(path: Path, data_model: DataModel):
+    """Writes the data model to `path` (built next to it and swapped in atomically)."""
+    frames = prepare_frames(data_model.tables)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.unlink(missing_ok=True)
+
+    ref_df = frames.ref_df.reset_index(drop=True)
+    ref_df = ref_df.assign(
+        _cas_key=ref_df["Substance_ID"].map(cas_key),
+        _name_key=ref_df["Substance_Name"].map(normalize_key),
+    )
+    source_df = frames.source_df.reset_index(drop=True)
+    source_df = source_df.assign(_synonym_key=source_df["Substance_Sourcing_Local_Name"].map(normalize_key))
+    has_mapping = "Substance_Sourcing_Mapping_Reference" in source_df.columns
+    known = source_df["(FK) Substance_ID"].isin(ref_df["Substance_Reference_ID"])
+    split = split_keys([
+        *zip(ref_df["_name_key"], ref_df["Substance_Name"], ref_df["Substance_Reference_ID"]),
+        *zip(source_df.loc[known, "_synonym_key"], source_df.loc[known, "Substance_Sourcing_Local_Name"],
+             source_df.loc[known, "(FK) Substance_ID"]),
+    ])
+
+    con = sqlite3.connect(tmp_path)
+    try:
+        ref_df.to_sql("substance_reference", con, index_label="_pos")
+        source_df.to_sql("substance_sourcing", con, index_label="_pos")
+        for sheet in LOOKUP_SHEETS:
+            data_model.tables[sheet].to_sql(sheet, con, index=False)
+        con.executescript(_SCHEMA)
+        try:
+            con.executescript(_SEARCH_SCHEMA)
+            has_search = True
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ SQLite build without FTS5, /search is disabled: {e}")
+            has_search = False
+        con.executemany("INSERT INTO split_key VALUES (?)", [(key,) for key in sorted(split)])
+        con.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("version", data_model.version),
+            ("format", STORE_FORMAT),
+            ("has_mapping", str(int(has_mapping))),
+            ("has_search", str(int(has_search))),
+        ])
+        con.commit()
+    finally:
+        con.close()
+    os.replace(tmp_path, path)
+
+
+class SqliteStore:
+    """
+    Read-only queries over a store written by build_store.
+
+    Implements the SubstanceIndex lookups (lookup_cas/lookup_name/lookup_synonym,
+    reference, record) and the SynonymStats frames with the same row order and
+    shapes as the in-memory backend, so backend.py serves either one unchanged.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._local = threading.local()
+        meta = dict(self._execute("SELECT key, value FROM meta").fetchall())
+        self.version = meta["version"]
+        self.format = meta.get("format", "1")
+        self.has_mapping = meta.get("has_mapping") == "1"
+        self.has_search = meta.get("has_search") == "1"
+        self.split = {row[0] for row in self._execute("SELECT key FROM split_key")} if self.format == STORE_FORMAT else set()
+
+    def connection(self) -> sqlite3.Connection:
+        # One connection per thread (and per process: bulk_match forks workers)
+        con = getattr(self._local, "connection", None)
+        if con is None or self._local.pid != os.getpid():
+            con = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True)
+            self._local.connection, self._local.pid = con, os.getpid()
+        return con
+
+    def _execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        return self.connection().execute(sql, params)
+
+    # ---------- Exact lookups (SubstanceIndex interface) ----------
+    def lookup_cas(self, query_key: str) -> List[str]:
+        rows = self._execute(
+            'SELECT "Substance_Reference_ID" FROM substance_reference WHERE _cas_key = ? ORDER BY _pos', (query_key,)
+        )
+        return [row[0] for row in rows]
+
+    def lookup_name(self, query_key: str, query: Optional[str] = None) -> List[str]:
+        rows = self._execute(
+            'SELECT "Substance_Reference_ID", "Substance_Name" FROM substance_reference WHERE _name_key = ? ORDER BY _pos',
+            (query_key,)
+        ).fetchall()
+        if query is not None and query_key in self.split:
+            rows = spelled_like(rows, query, lambda row: row[1])
+        return [row[0] for row in rows]
+
+    def lookup_synonym(self, query_key: str, query: Optional[str] = None) -> List[Tuple[str, str]]:
+        # Same rows as the combined_df left merge: synonyms of unknown substances map to "Not Available"
+        rows = self._execute(
+            """
+            SELECT COALESCE(r."Substance_Reference_ID", 'Not Available'), s."Substance_Sourcing_Local_Name"
+            FROM substance_sourcing s
+            LEFT JOIN substance_reference r ON r."Substance_Reference_ID" = s."(FK) Substance_ID"
+            WHERE s._synonym_key = ?
+            ORDER BY s._pos, r._pos
+            """,
+            (query_key,)
+        )
+        entries = [(row[0], row[1]) for row in rows]
+        if query is not None and query_key in self.split:
+            entries = spelled_like(entries, query, lambda entry: entry[1])
+        return literal_first(entries, query)
+
+    def reference(self, sub_ref_id: str) -> dict:
+        cursor = self._execute(
+            'SELECT * FROM substance_reference WHERE "Substance_Reference_ID" = ? ORDER BY _pos LIMIT 1', (sub_ref_id,)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            raise KeyError(sub_ref_id)
+        columns = [column[0] for column in cursor.description]
+        return {column: value for column, value in zip(columns, row) if column not in _REFERENCE_KEYS}
+
+    def record(self, sub_ref_id: str) -> SubstanceRecord:
+        source_column = '"Substance_Sourcing_Mapping_Reference"' if self.has_mapping else "'Not Available'"
+        rows = self._execute(
+            f'SELECT "Substance_Sourcing_Local_Name", {source_column} FROM substance_sourcing '
+            'WHERE "(FK) Substance_ID" = ? ORDER BY _pos',
+            (str(sub_ref_id).strip(),)
+        ).fetchall()
+        if not rows:
+            return EMPTY_RECORD
+        record = SubstanceRecord(synonym_count=len({synonym for synonym, _ in rows}))
+        for synonym, source in rows:
+            record.synonym_source_pairs.append({"synonym": synonym, "source": source})
+            if self.has_mapping and source is not None and source not in record.synonym_sources:
+                record.synonym_sources.append(source)
+        return record
+
+    def related_synonyms(self, ref_ids: List[str]) -> List[dict]:
+        """Same records DataSnapshot.related_synonyms builds with a groupby on combined_df."""
+        ids = [ref_id for ref_id in ref_ids if ref_id != "Not Available"]
+        placeholders = ", ".join("?" for _ in ids) or "NULL"
+        rows = self._execute(
+            f"""
+            SELECT COALESCE(r."Substance_Reference_ID", 'Not Available'), s."Substance_Sourcing_Local_Name",
+                   COALESCE(r."Substance_ID", 'Not Available'), COALESCE(r."Substance_Name", 'Not Available')
+            FROM substance_sourcing s
+            LEFT JOIN substance_reference r ON r."Substance_Reference_ID" = s."(FK) Substance_ID"
+            WHERE s."(FK) Substance_ID" IN ({placeholders}) OR (r._pos IS NULL AND ?)
+            ORDER BY s._pos, r._pos
+            """,
+            (*ids, "Not Available" in ref_ids)
+        )
+        grouped: Dict[str, dict] = {}
+        for ref_id, synonym, substance_id, substance_name in rows:
+            group = grouped.setdefault(ref_id, {
+                "Substance_Reference_ID": ref_id,
+                "Substance_Sourcing_Local_Name": set(),
+                "Substance_ID": substance_id,
+                "Substance_Name": substance_name,
+            })
+            group["Substance_Sourcing_Local_Name"].add(synonym)
+        for group in grouped.values():
+            group["Substance_Sourcing_Local_Name"] = sorted(group["Substance_Sourcing_Local_Name"])
+        return [grouped[ref_id] for ref_id in sorted(grouped)]
+
+    # ---------- Token search (FTS5) ----------
+    def search(self, query: str, limit: int = 20) -> List[dict]:
+        """Names/synonyms containing every token of `query` (prefix match), best BM25 rank first."""
+        tokens = re.findall(r"\w+", query.lower())
+        if not tokens or not self.has_search:
+            return []
+        match = " ".join(f'"{token}"*' for token in tokens)
+        rows = self._execute(
+            """
+            SELECT f.substance_reference_id, r."Substance_ID", r."Substance_Name", f.text, f.kind
+            FROM substance_search f
+            JOIN substance_reference r ON r."Substance_Reference_ID" = f.substance_reference_id
+            WHERE substance_search MATCH ?
+            ORDER BY f.rank, r._pos
+            LIMIT ?
+            """,
+            (match, limit)
+        )
+        return [
+            {"substance_reference_id": ref_id, "substance_id": substance_id, "substance_name": name,
+             "matched_text": text, "match_type": f"token-{kind}"}
+            for ref_id, substance_id, name, text, kind in rows
+        ]
+
+    # ---------- Synonym aggregates (SynonymStats interface) ----------
+    @property
+    def row_count(self) -> int:
+        return self._execute("SELECT COUNT(*) FROM substance_sourcing").fetchone()[0]
+
+    def synonym_counts_frame(self) -> pd.DataFrame:
+        return pd.read_sql(
+            """
+            SELECT "Substance_Sourcing_Local_Name", COUNT(DISTINCT "(FK) Substance_ID") AS "Distinct Substance Count"
+            FROM substance_sourcing GROUP BY 1 ORDER BY 1
+            """,
+            self.connection()
+        )
+
+    def synonyms_per_substance_frame(self, unique: bool) -> pd.DataFrame:
+        count = 'COUNT(DISTINCT "Substance_Sourcing_Local_Name")' if unique else 'COUNT("Substance_Sourcing_Local_Name")'
+        return pd.read_sql(
+            f'SELECT "(FK) Substance_ID", {count} AS "Synonym Count" FROM substance_sourcing GROUP BY 1 ORDER BY 1',
+            self.connection()
+        )
+
+    # ---------- Whole-table reads ----------
+    def reference_frame(self) -> pd.DataFrame:
+        frame = pd.read_sql("SELECT * FROM substance_reference ORDER BY _pos", self.connection())
+        return frame.drop(columns=list(_REFERENCE_KEYS))
+
+    def read_table(self, sheet: str) -> pd.DataFrame:
+        return pd.read_sql(f'SELECT * FROM "{sheet}"', self.connection())
+
+    def distinct_names(self) -> List[str]:
+        # First-occurrence order, like Series.unique() on the frames
+        rows = self._execute(
+            'SELECT "Substance_Name" FROM substance_reference GROUP BY 1 ORDER BY MIN(_pos)'
+        )
+        return [row[0] for row in rows]
+
+    def distinct_synonyms(self) -> List[str]:
+        rows = self._execute(
+            'SELECT "Substance_Sourcing_Local_Name" FROM substance_sourcing GROUP BY 1 ORDER BY MIN(_pos)'
+        )
+        return [row[0] for row in rows]
+
+
+class StoreSnapshot:
+    """
+    The DataSnapshot counterpart for the SQLite backend: `index` and `stats` are
+    the store itself, the fuzzy pools are built from its distinct names/synonyms.
+    Read-only; curation edits need STORAGE_BACKEND=memory.
+    """
+
+    editable = False
+
+    def __init__(self, store: SqliteStore):
+        self.store = store
+        self.path = store.path  # this version's file: every thread's connection reads the same data
+        self.index = store
+        self.stats = store
+        self.base_version = self.version = store.version
+        self.tables = {sheet: store.read_table(sheet) for sheet in LOOKUP_SHEETS}
+        self.substance_name_engine = FuzzyEngine(store.distinct_names())
+        self.synonym_engine = FuzzyEngine(store.distinct_synonyms())
+
+    @property
+    def ref_df(self) -> pd.DataFrame:
+        return self.store.reference_frame()
+
+    def related_synonyms(self, ref_ids: List[str]) -> List[dict]:
+        return self.store.related_synonyms(ref_ids)
+
+
+def versioned_path(path: Path, version: str) -> Path:
+    """The store file for one data version (and store format) next to `path`."""
+    return path.with_name(f"{path.stem}-{version}-f{STORE_FORMAT}{path.suffix}")
+
+
+def open_store(path: Path = STORE_PATH, source: Optional[str] = None) -> SqliteStore:
+    """
+    Opens the store of the workbook's current version, building it first when it
+    is missing. Each version gets its own file, so a rebuild never replaces a file
+    that other threads or workers are still reading.
+    """
+    current = versioned_path(path, data_model_version(source))
+    if current.exists():
+        try:
+            store = SqliteStore(current)
+            if store.format == STORE_FORMAT:
+                return store
+        except sqlite3.DatabaseError as e:
+            print(f"⚠️ Rebuilding unreadable SQLite store {current}: {e}")
+    data_model = load_data_model(source)
+    current = versioned_path(path, data_model.version)
+    build_store(current, data_model)
+    _prune(path, keep=current)
+    return SqliteStore(current)
+
+
+def _prune(path: Path, keep: Path):
+    # Oldest first; files of replaced versions stay until STORE_KEEP newer ones exist
+    stored = sorted(path.parent.glob(f"{path.stem}-*{path.suffix}"), key=lambda stored: stored.stat().st_mtime)
+    stale = [stored_path for stored_path in stored if stored_path != keep]
+    for stored_path in stale[:max(0, len(stored) - STORE_KEEP)]:
+        stored_path.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    store = open_store()
+    print(f"✅ SQLite store {store.path} (data model {store.version})")
+    print(f"   substance_reference: {len(store.distinct_names())} distinct names")
+    print(f"   substance_sourcing: {store.row_count} rows, {len(store.distinct_synonyms())} distinct synonyms")
+    print(f"   FTS5 token search: {'on' if store.has_search else 'off'}")
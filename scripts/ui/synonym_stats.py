@@ -0,0 +1,98 @@
+from collections import Counter, defaultdict
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+
+class SynonymStats:
+    """
+    Synonym aggregates behind /synonyms, kept up to date as sourcing rows are
+    added or removed instead of re-grouping Substance_Sourcing on every change.
+
+    - substances_by_synonym: synonym -> Counter(Substance_Reference_ID -> rows)
+    - synonyms_by_substance: Substance_Reference_ID -> Counter(synonym -> rows)
+    - row_count: number of Substance_Sourcing rows
+
+    The *_frame helpers return the same frames the original groupbys produced
+    (keys sorted, same column names), so the downstream pandas code is unchanged.
+
+    `add` and `remove` replace the Counters they change rather than updating them,
+    so a copy() stays unaffected by edits made to the original and vice versa.
+    """
+
+    def __init__(self, source_df: pd.DataFrame):
+        self.substances_by_synonym: Dict[str, Counter] = defaultdict(Counter)
+        self.synonyms_by_substance: Dict[str, Counter] = defaultdict(Counter)
+        self.row_count = 0
+        self.synonym_dtype = source_df["Substance_Sourcing_Local_Name"].dtype
+        self.substance_dtype = source_df["(FK) Substance_ID"].dtype
+        for sub_ref_id, synonym in zip(source_df["(FK) Substance_ID"], source_df["Substance_Sourcing_Local_Name"]):
+            self.substances_by_synonym[synonym][sub_ref_id] += 1
+            self.synonyms_by_substance[sub_ref_id][synonym] += 1
+            self.row_count += 1
+
+    def copy(self) -> "SynonymStats":
+        stats = SynonymStats.__new__(SynonymStats)
+        stats.substances_by_synonym = defaultdict(Counter, self.substances_by_synonym)
+        stats.synonyms_by_substance = defaultdict(Counter, self.synonyms_by_substance)
+        stats.row_count = self.row_count
+        stats.synonym_dtype = self.synonym_dtype
+        stats.substance_dtype = self.substance_dtype
+        return stats
+
+    def add(self, sub_ref_id: str, synonym: str):
+        _increment(self.substances_by_synonym, synonym, sub_ref_id)
+        _increment(self.synonyms_by_substance, sub_ref_id, synonym)
+        self.row_count += 1
+
+    def remove(self, sub_ref_id: str, synonym: str):
+        if self.substances_by_synonym.get(synonym, Counter())[sub_ref_id] > 0:
+            self.row_count -= 1
+        _decrement(self.substances_by_synonym, synonym, sub_ref_id)
+        _decrement(self.synonyms_by_substance, sub_ref_id, synonym)
+
+    def rows_with_synonym(self, synonym: str) -> int:
+        return sum(self.substances_by_synonym.get(synonym, Counter()).values())
+
+    def synonym_counts_frame(self) -> pd.DataFrame:
+        """groupby(Substance_Sourcing_Local_Name)[(FK) Substance_ID].nunique()"""
+        synonyms = sorted(self.substances_by_synonym)
+        return pd.DataFrame({
+            "Substance_Sourcing_Local_Name": pd.Series(synonyms, dtype=self.synonym_dtype),
+            "Distinct Substance Count": np.array(
+                [len(self.substances_by_synonym[synonym]) for synonym in synonyms], dtype=np.int64
+            ),
+        })
+
+    def synonyms_per_substance_frame(self, unique: bool) -> pd.DataFrame:
+        """groupby((FK) Substance_ID)[Substance_Sourcing_Local_Name].nunique() (or .count())"""
+        substances = sorted(self.synonyms_by_substance)
+        counts = [
+            len(self.synonyms_by_substance[sub_ref_id]) if unique else sum(self.synonyms_by_substance[sub_ref_id].values())
+            for sub_ref_id in substances
+        ]
+        return pd.DataFrame({
+            "(FK) Substance_ID": pd.Series(substances, dtype=self.substance_dtype),
+            "Synonym Count": np.array(counts, dtype=np.int64),
+        })
+
+
+def _increment(mapping: Dict[str, Counter], key: str, member: str):
+    counter = Counter(mapping.get(key, ()))
+    counter[member] += 1
+    mapping[key] = counter
+
+
+def _decrement(mapping: Dict[str, Counter], key: str, member: str):
+    counter = mapping.get(key)
+    if counter is None or counter[member] <= 0:
+        return
+    counter = Counter(counter)
+    counter[member] -= 1
+    if counter[member] == 0:
+        del counter[member]
+    if counter:
+        mapping[key] = counter
+    else:
+        del mapping[key]
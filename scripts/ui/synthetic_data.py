@@ -0,0 +1,164 @@
+"""
+Synthetic data model for benchmarks.
+
+Generates the six data-model sheets at a chosen scale (number of
+Substance_Sourcing synonym rows), with the same columns and dtypes as the real
+workbook: chemical-looking substance names, valid CAS numbers (check digit
+included), 10 synonyms per substance on average (name variants, trade-name
+style words, codes) and weighting tags. The same scale and seed always
+produce the same tables.
+
+    python synthetic_data.py --synonyms 100000 --output synthetic_100k.xlsx
+"""
+import argparse
+import random
+from typing import Dict
+
+import pandas as pd
+
+LOCANTS = ["", "2-", "3-", "4-", "N-", "1-", "3,4-", "2,5-", "alpha-", "beta-"]
+SUBSTITUENTS = [
+    "methyl", "ethyl", "propyl", "butyl", "isopropyl", "chloro", "bromo", "fluoro", "iodo", "nitro", "amino",
+    "hydroxy", "methoxy", "ethoxy", "phenyl", "benzyl", "acetyl", "cyano", "oxo", "carboxy", "sulfonyl",
+    "dimethyl", "diethyl", "trifluoromethyl", "cyclopropyl",
+]
+CORES = [
+    "piperidine", "benzene", "fentanyl", "amine", "propanamide", "morphinan", "tryptamine", "cathinone",
+    "pyrrolidine", "indole", "oxazole", "phenethylamine", "benzodiazepine", "acetamide", "aniline", "toluene",
+    "pyridine", "quinoline", "ketamine", "amphetamine",
+]
+SYLLABLES = ["ra", "to", "fen", "zol", "ca", "mi", "dex", "lo", "pra", "vin", "ta", "sub", "li", "ma", "nor", "ox", "cet", "dur"]
+SOURCES = [
+    "https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/name/{cas}/synonyms/JSON",
+    "https://www.deadiversion.usdoj.gov/schedules/orangebook/c_cs_alpha.pdf",
+]
+
+
+def cas_number(rng: random.Random, used: set) -> str:
+    """A unique, check-digit-valid CAS Registry Number."""
+    while True:
+        body = str(rng.randint(50, 9999999)) + f"{rng.randint(0, 99):02d}"
+        check = sum(int(digit) * position for position, digit in enumerate(reversed(body), start=1)) % 10
+        cas = f"{body[:-2]}-{body[-2:]}-{check}"
+        if cas not in used:
+            used.add(cas)
+            return cas
+
+
+def substance_name(rng: random.Random, used: set) -> str:
+    while True:
+        name = (f"{rng.choice(LOCANTS)}{rng.choice(SUBSTITUENTS)}-{rng.choice(LOCANTS)}"
+                f"{rng.choice(SUBSTITUENTS)}{rng.choice(CORES)}").replace("--", "-").lstrip("-")
+        if name not in used:
+            used.add(name)
+            return name
+
+
+def synonyms_for(rng: random.Random, name: str, count: int) -> list:
+    variants = [name, name.upper(), name.replace("-", " "), name.capitalize()]
+    while len(variants) < count:
+        kind = rng.random()
+        if kind < 0.4:
+            variants.append("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize())
+        elif kind < 0.7:
+            variants.append(f"{''.join(rng.choice('ABCDEFGHKLMNPRSTUVWXZ') for _ in range(rng.randint(2, 4)))}-{rng.randint(1, 99999)}")
+        else:
+            variants.append(f"{rng.choice(SUBSTITUENTS)}{rng.choice(CORES)} {rng.choice(['hydrochloride', 'citrate', 'base', 'sulfate'])}")
+    return list(dict.fromkeys(variants))[:count]
+
+
+def generate_tables(synonym_rows: int, synonyms_per_substance: int = 10, seed: int = 0) -> Dict[str, pd.DataFrame]:
+    """Every data-model sheet, sized to about `synonym_rows` Substance_Sourcing rows (1 to 2x-1 synonyms each)."""
+    rng = random.Random(seed)
+    substances = max(1, synonym_rows // synonyms_per_substance)
+    weighting_tags = pd.DataFrame({
+        "Weighting_Tag_ID": range(1, 29),
+        "(FK) Weighting_Tag_Category_ID": [float(1 + tag % 5) for tag in range(28)],
+        "Weighting_Tag_Title": [f"Synthetic Tag {tag}" for tag in range(1, 29)],
+        "Weighting_Tag_Weight": [float(5 * (1 + tag % 6)) for tag in range(28)],
+        "Weighting_Tag_Notes": pd.array([None] * 28, dtype="string"),
+    })
+    substance_types = pd.DataFrame({
+        "Substance_Type_ID": range(1, 10),
+        "Substance_Type_Title": [f"Type_{kind}" for kind in range(1, 10)],
+        "Substance_Type_Description": pd.array([None] * 9, dtype="string"),
+    })
+    sourcing_types = pd.DataFrame({
+        "Substance_Sourcing_Type_ID": range(1, 6),
+        "Substance_Sourcing_Type_Title": ["Registry", "Reference", "Synonym", "CAS", "Other"],
+        "Substance_Type_Description": pd.array([None] * 5, dtype="string"),
+        "Data_Source_ID": [12.0, None, None, None, None],
+    })
+
+    used_cas, used_names = set(), set()
+    references, sourcing, tag_links = [], [], []
+    for ref_id in range(1, substances + 1):
+        cas = cas_number(rng, used_cas)
+        name = substance_name(rng, used_names)
+        tag_id = rng.randint(1, 28)
+        references.append({
+            "Substance_Reference_ID": ref_id,
+            "Substance_ID": cas,
+            "(FK) Substance_Type_ID": rng.randint(1, 9),
+            "Substance_Name": name,
+            "Substance_Description": f"{name} is a synthetic benchmark substance with CAS number {cas}.",
+            "Substance_Weight": rng.randint(1, 10),
+        })
+        tag_links.append({"Substance_Weighting_Tag_ID": ref_id, "(FK) Substance_Reference_ID": ref_id,
+                          "(FK) Weighting_Tag_ID": tag_id})
+        source = rng.choice(SOURCES).format(cas=cas)
+        count = rng.randint(1, 2 * synonyms_per_substance - 1)  # averages synonyms_per_substance
+        for position, synonym in enumerate(synonyms_for(rng, name, count)):
+            sourcing.append({
+                "Substance_Sourcing_ID": len(sourcing) + 1,
+                "(FK) Substance_ID": ref_id,
+                "(FK) Substance_Sourcing_Type_ID": 1 if position == 0 else 3,
+                "(FK) Data_Source_ID": 23,
+                "Substance_Sourcing_Primary": position == 0,
+                "Substance_Sourcing_Local_ID": cas,
+                "Substance_Sourcing_Local_ID_Attribute": "CAS" if position == 0 else "Synonym",
+                "Substance_Sourcing_Local_Name": synonym,
+                "Substance_Sourcing_Local_Description": float("nan"),
+                "Substance_Sourcing_Mapping_Reference": source,
+                "Substance_Sourcing_Notes": float("nan"),
+            })
+
+    reference_df = pd.DataFrame(references)
+    for column in ("Substance_ID", "Substance_Name", "Substance_Description"):
+        reference_df[column] = reference_df[column].astype("string")
+    sourcing_df = pd.DataFrame(sourcing)
+    for column in ("Substance_Sourcing_Local_ID", "Substance_Sourcing_Local_ID_Attribute",
+                   "Substance_Sourcing_Mapping_Reference"):
+        sourcing_df[column] = sourcing_df[column].astype("string")
+    return {
+        "Substance_Reference": reference_df,
+        "Substance_Sourcing": sourcing_df,
+        "Substance_Type": substance_types,
+        "Substance_Sourcing_Type": sourcing_types,
+        "Substance_Weighting_Tag": pd.DataFrame(tag_links),
+        "Weighting_Tag": weighting_tags,
+    }
+
+
+def write_workbook(tables: Dict[str, pd.DataFrame], path: str):
+    """Writes the sheets as a data-model workbook (what DATA_MODEL_PATH points at)."""
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        for sheet, table in tables.items():
+            table.to_excel(writer, sheet_name=sheet, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic data-model workbook.")
+    parser.add_argument("--synonyms", type=int, default=10000, help="Substance_Sourcing rows (1k to 1M)")
+    parser.add_argument("--per-substance", type=int, default=10, help="Synonyms per substance")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", required=True, help="Workbook (.xlsx) to write")
+    args = parser.parse_args(argv)
+
+    tables = generate_tables(args.synonyms, args.per_substance, args.seed)
+    write_workbook(tables, args.output)
+    print(f"✅ {len(tables['Substance_Reference'])} substances, {len(tables['Substance_Sourcing'])} synonyms -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+/match/batch/upload: streamed CSV/NDJSON parsing, per-line validation errors and
+parity with /match/batch (backend.py).
+
+    cd scripts/ui && python -m pytest -q test_batch_upload.py
+"""
+import json
+
+import pytest
+
+NDJSON = {"content-type": "application/x-ndjson"}
+CSV = {"content-type": "text/csv"}
+
+
+def upload(client, body, headers, **params):
+    return client.post("/match/batch/upload", content=body.encode("utf-8"), headers=headers, params=params)
+
+
+def streamed(response):
+    assert response.status_code == 200, response.text
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_ndjson_matches_like_the_batch_endpoint(client):
+    queries = ["fentanyl", "437-38-7", "carfentanyl", "no such substance", "fentanyl"]
+    body = "\n".join(json.dumps({"query": query}) if i % 2 else json.dumps(query) for i, query in enumerate(queries))
+    expected = client.post("/match/batch", json={"queries": queries}).json()
+    assert streamed(upload(client, body, NDJSON, chunk_size=2)) == expected
+
+
+def test_csv_quoted_fields_may_span_lines(client):
+    body = 'id,Query\n1,fentanyl\n2,"carfentanil\ncitrate"\n\n3,"the ""china white"""\r\n4,PB-22\n'
+    queries = [result["query"] for result in streamed(upload(client, body, CSV, chunk_size=3))]
+    assert queries == ["fentanyl", "carfentanil\ncitrate", 'the "china white"', "PB-22"]
+
+
+@pytest.mark.parametrize("body, headers, detail", [
+    ('{"query": "fentanyl"}\n{"query": 5}\n', NDJSON, "Line 2: query must be a string, got number"),
+    ('"fentanyl"\n\n[\"fentanyl\"]\n', NDJSON, "Line 3: query must be a string, got array"),
+    ('{"query": "fentanyl"}\n{"query": \n', NDJSON, "Line 2: invalid JSON (Expecting value)"),
+    ('{"name": "fentanyl"}\n', NDJSON, 'Line 1: expected a "query" field'),
+    ('query\nfentanyl\n"carfentanil\n', CSV, "Line 3: unterminated quoted field"),
+])
+def test_bad_lines_are_rejected_with_their_line_number(client, body, headers, detail):
+    response = upload(client, body, headers)
+    assert response.status_code == 422
+    assert response.json() == {"detail": detail}
+
+
+def test_bad_line_after_streaming_started_ends_the_stream(client):
+    body = '"fentanyl"\n' * 3 + '{"query": null}\n"carfentanil"\n'
+    lines = streamed(upload(client, body, NDJSON, chunk_size=2))
+    assert [line["query"] for line in lines[:-1]] == ["fentanyl"] * 3
+    assert lines[-1] == {"error": "Line 4: query must be a string, got null", "status_code": 422}
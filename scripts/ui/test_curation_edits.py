@@ -0,0 +1,133 @@
+"""
+Curation edits maintain the lookup index and the synonym aggregates incrementally
+(data_snapshot.py); after every edit they must equal a rebuild from the edited
+frames. Also pins the copy-on-write drafts and the HTTP codes of failed edits.
+
+    cd scripts/ui && python -m pytest -q test_curation_edits.py
+"""
+from collections import Counter
+
+import pytest
+
+from data_snapshot import EditValidationError
+from lookup_index import SubstanceIndex
+from synonym_stats import SynonymStats
+
+FENTANYL = "436"
+
+
+def index_state(index: SubstanceIndex) -> dict:
+    return {
+        "cas": {key: Counter(ids) for key, ids in index.cas.items() if ids},
+        "names": {key: Counter(ids) for key, ids in index.names.items() if ids},
+        "synonyms": {key: Counter(entries) for key, entries in index.synonyms.items() if entries},
+        "references": {ref_id: {column: str(value) for column, value in row.items()}
+                       for ref_id, row in index.references.items()},
+        "records": {ref_id: (record.synonym_count, Counter(map(str, record.synonym_sources)),
+                             Counter((pair["synonym"], str(pair["source"])) for pair in record.synonym_source_pairs))
+                    for ref_id, record in index.records.items()},
+        "split": index.split,
+    }
+
+
+def stats_state(stats: SynonymStats) -> dict:
+    return {
+        "substances_by_synonym": {synonym: dict(ids) for synonym, ids in stats.substances_by_synonym.items() if ids},
+        "synonyms_by_substance": {ref_id: dict(names) for ref_id, names in stats.synonyms_by_substance.items() if names},
+        "row_count": stats.row_count,
+    }
+
+
+def assert_matches_rebuild(snap):
+    rebuilt_index = SubstanceIndex(snap.ref_df, snap.source_df, snap.combined_df)
+    assert index_state(snap.index) == index_state(rebuilt_index)
+    assert stats_state(snap.stats) == stats_state(SynonymStats(snap.source_df))
+
+
+def first_synonym(snap, ref_id=FENTANYL):
+    return snap.index.record(ref_id).synonym_source_pairs[0]
+
+
+EDITS = {
+    "add_synonym": lambda snap: snap.add_synonym(FENTANYL, "Zz curated synonym", "https://example.org/curated"),
+    "add_shared_synonym": lambda snap: snap.add_synonym(FENTANYL, "China White", "https://example.org/curated"),
+    "rename_synonym": lambda snap: snap.update_synonym(FENTANYL, first_synonym(snap)["synonym"],
+                                                       new_synonym="Zz renamed synonym"),
+    "resource_synonym": lambda snap: snap.update_synonym(FENTANYL, first_synonym(snap)["synonym"],
+                                                         new_source="https://example.org/moved"),
+    "delete_synonym": lambda snap: snap.delete_synonym(FENTANYL, first_synonym(snap)["synonym"]),
+    "add_substance": lambda snap: snap.add_substance("50-00-0", "Zz Formaldehyde", "A curated substance", "1"),
+    "rename_substance": lambda snap: snap.update_substance(FENTANYL, substance_name="Zz Fentanyl",
+                                                           substance_id="999-99-9"),
+    "delete_substance": lambda snap: snap.delete_substance(FENTANYL),
+    "sync_synonyms": lambda snap: snap.sync_synonyms(
+        inserts=[{"(FK) Substance_ID": FENTANYL, "Substance_Sourcing_Local_Name": "Zz harvested",
+                  "Substance_Sourcing_Mapping_Reference": "https://pubchem.ncbi.nlm.nih.gov/x"}],
+        deletes=[(FENTANYL, first_synonym(snap)["synonym"], first_synonym(snap)["source"])],
+        updates=[],
+    ),
+}
+
+
+def test_loaded_snapshot_matches_rebuild(snapshot):
+    assert_matches_rebuild(snapshot)
+
+
+@pytest.mark.parametrize("edit", EDITS)
+def test_edit_matches_rebuild(snapshot, edit):
+    version = snapshot.version
+    EDITS[edit](snapshot)
+    assert snapshot.version != version
+    assert_matches_rebuild(snapshot)
+
+
+def test_edits_in_sequence_match_rebuild(snapshot):
+    for edit in ("add_substance", "add_synonym", "rename_synonym", "rename_substance", "delete_synonym"):
+        EDITS[edit](snapshot)
+    new_id = snapshot.index.lookup_name("zz formaldehyde")[0]
+    snapshot.add_synonym(new_id, "Zz formalin", "https://example.org/curated")
+    snapshot.delete_substance(new_id)
+    assert_matches_rebuild(snapshot)
+
+
+@pytest.mark.parametrize("edit", EDITS)
+def test_draft_edits_leave_the_original_untouched(snapshot, edit):
+    before = index_state(snapshot.index), stats_state(snapshot.stats), len(snapshot.source_df), len(snapshot.ref_df)
+    draft = snapshot.draft()
+    EDITS[edit](draft)
+    draft.flush()
+    after = index_state(snapshot.index), stats_state(snapshot.stats), len(snapshot.source_df), len(snapshot.ref_df)
+    assert after == before
+    assert_matches_rebuild(draft)
+
+
+@pytest.mark.parametrize("synonym", ["", "   ", "\t"])
+def test_blank_synonyms_are_rejected(snapshot, synonym):
+    with pytest.raises(EditValidationError):
+        snapshot.add_synonym(FENTANYL, synonym)
+    with pytest.raises(EditValidationError):
+        snapshot.update_synonym(FENTANYL, first_synonym(snapshot)["synonym"], new_synonym=synonym)
+
+
+# ---------- HTTP codes (failed edits never swap the served snapshot) ----------
+def test_blank_synonym_is_a_validation_error(client):
+    version = client.get("/version").json()["data_version"]
+    response = client.post("/synonyms/records", json={"substance_reference_id": FENTANYL, "synonym": "  "})
+    assert response.status_code == 422 and response.json() == {"detail": "Synonym must not be blank"}
+    response = client.put("/synonyms/records", json={"substance_reference_id": FENTANYL, "synonym": "Fentanyl",
+                                                     "new_synonym": ""})
+    assert response.status_code == 422
+    assert client.get("/version").json()["data_version"] == version
+
+
+def test_duplicate_substance_id_is_a_conflict(client):
+    response = client.post("/substances", json={"substance_id": "437-38-7", "substance_name": "Fentanyl",
+                                                "substance_reference_id": FENTANYL})
+    assert response.status_code == 409
+    assert response.json() == {"detail": f"Substance_Reference_ID '{FENTANYL}' already exists"}
+
+
+def test_unknown_substance_is_not_found(client):
+    response = client.post("/synonyms/records", json={"substance_reference_id": "no-such-id", "synonym": "x"})
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Unknown Substance_Reference_ID 'no-such-id'"}
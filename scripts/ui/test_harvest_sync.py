@@ -0,0 +1,67 @@
+"""
+Re-syncing a harvest that matches the workbook must plan no changes, whichever
+scraper format it comes in (harvest_sync.py).
+
+    cd scripts/ui && python -m pytest -q test_harvest_sync.py
+"""
+import pytest
+
+from harvest_sync import PUBCHEM_SYNONYM_SOURCE, _source_family, harvest_frame, plan_sync
+
+PUBCHEM = "https://pubchem.ncbi.nlm.nih.gov/"
+NO_CHANGES = {"inserts": 0, "updates": 0, "deletes": 0, "unmatched": 0}
+
+
+def pubchem_synonyms(snap, ref_id):
+    pairs = snap.index.record(ref_id).synonym_source_pairs
+    return [pair["synonym"] for pair in pairs if _source_family(pair["source"]) == PUBCHEM]
+
+
+def harvester_record(name, cas, synonyms, synonym_source):
+    return {"Substance": name, "CAS Number": cas, "Synonyms": synonyms, "PubChem CID": 3345,
+            "Synonym Source": synonym_source, "Status": "ok"}
+
+
+@pytest.fixture
+def fentanyl(snapshot):
+    ref_id, = snapshot.index.lookup_name("fentanyl")
+    cas = snapshot.index.reference(ref_id)["Substance_ID"]
+    return cas, pubchem_synonyms(snapshot, ref_id)
+
+
+@pytest.mark.parametrize("synonym_source", [
+    PUBCHEM_SYNONYM_SOURCE,  # what pubchem_harvester.py writes
+    "https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/cid/3345/synonyms/JSON",  # older harvester output
+    None,
+])
+def test_unchanged_ndjson_harvest_plans_no_changes(snapshot, fentanyl, synonym_source):
+    cas, synonyms = fentanyl
+    source = synonym_source and synonym_source.format(cas=cas)
+    harvest = harvest_frame([harvester_record("Fentanyl", cas, synonyms, source)])
+    assert plan_sync(snapshot, harvest).summary() == NO_CHANGES
+
+
+def test_unchanged_csv_harvest_plans_no_changes(snapshot, fentanyl):
+    cas, synonyms = fentanyl
+    harvest = harvest_frame([{"Substance Name": "Fentanyl", "CAS Number": cas, "Synonym": synonym}
+                             for synonym in synonyms])
+    assert plan_sync(snapshot, harvest).summary() == NO_CHANGES
+
+
+def test_unchanged_harvest_of_the_whole_workbook_plans_no_changes(snapshot):
+    records = []
+    for ref_id, reference in snapshot.index.references.items():
+        synonyms = pubchem_synonyms(snapshot, ref_id)
+        if synonyms:
+            records.append(harvester_record(reference["Substance_Name"], reference["Substance_ID"], synonyms,
+                                            "https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/cid/1/synonyms/JSON"))
+    assert records
+    assert plan_sync(snapshot, harvest_frame(records)).summary() == NO_CHANGES
+
+
+def test_changed_source_is_still_an_update(snapshot, fentanyl):
+    cas, synonyms = fentanyl
+    moved = "https://pubchem.ncbi.nlm.nih.gov/compound/3345"
+    plan = plan_sync(snapshot, harvest_frame([harvester_record("Fentanyl", cas, synonyms, moved)]))
+    assert len(plan.updates) == len(synonyms)
+    assert not plan.inserts and not plan.deletes
@@ -0,0 +1,113 @@
+"""
+Hot reload of the workbook (backend.reload_snapshot, /reload and the
+DATA_MODEL_WATCH_SECONDS watcher): a failed reload keeps the serving snapshot,
+a successful one swaps a new snapshot in with one assignment.
+
+    cd scripts/ui && python -m pytest -q test_hot_reload.py
+"""
+import os
+import shutil
+
+import pytest
+
+import data_loader
+from data_loader import DEFAULT_WORKBOOK
+
+FENTANYL = "436"
+RENAMED = "Zz Reloaded Fentanyl"
+
+
+@pytest.fixture(scope="module")
+def edited_workbook(data_model, tmp_path_factory):
+    """The shipped workbook with Fentanyl renamed, saved once for the module."""
+    import openpyxl
+    workbook = openpyxl.load_workbook(DEFAULT_WORKBOOK)
+    for row in workbook["Substance_Reference"].iter_rows(min_row=2):
+        if str(row[0].value) == FENTANYL:
+            row[3].value = RENAMED
+    path = tmp_path_factory.mktemp("edited") / "edited.xlsx"
+    workbook.save(path)
+    return path.read_bytes()
+
+
+@pytest.fixture
+def workbook(backend, tmp_path):
+    """A copy of the workbook the backend reloads from; the shipped one is reloaded afterwards."""
+    path = tmp_path / "Data Model Tables.xlsx"
+    shutil.copyfile(DEFAULT_WORKBOOK, path)
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("DATA_MODEL_PATH", str(path))
+        patch.setattr(data_loader, "CACHE_DIR", tmp_path / "cache")  # keep the real snapshot pickle
+        yield path
+    backend.reload_snapshot(force=True)
+
+
+def write(path, content: bytes, mtime: float):
+    path.write_bytes(content)
+    os.utime(path, (mtime, mtime))
+
+
+def names(client, query):
+    return [(result["match_type"], result["substance_reference_id"])
+            for result in client.get("/match", params={"query": query}).json()]
+
+
+@pytest.mark.parametrize("corrupt", [
+    lambda raw: b"not a workbook",
+    lambda raw: raw[:len(raw) // 2],  # a half-written save
+])
+def test_failed_reload_keeps_the_serving_snapshot(backend, client, workbook, corrupt):
+    serving = backend.snapshot
+    workbook.write_bytes(corrupt(workbook.read_bytes()))
+
+    response = client.post("/reload")
+    assert response.status_code == 500 and response.json()["error"]
+    assert backend.snapshot is serving
+    assert client.get("/version").json()["data_version"] == serving.version
+    assert names(client, "Fentanyl")[0] == ("exact-substance name", FENTANYL)
+
+
+def test_reload_swaps_the_new_snapshot_in(backend, client, workbook, edited_workbook):
+    serving = backend.snapshot
+    old_names = dict(serving.index.names)
+    workbook.write_bytes(edited_workbook)
+
+    reload = client.post("/reload").json()
+    assert reload["reloaded"] is True and reload["previous_version"] == serving.version
+    assert backend.snapshot is not serving and backend.snapshot.version == reload["data_version"]
+    assert client.get("/version").json()["data_version"] == reload["data_version"]
+    assert names(client, RENAMED)[0] == ("exact-substance name", FENTANYL)
+
+    # A request still holding the old snapshot keeps reading it unchanged
+    assert serving.index.names == old_names
+    assert backend.match_query(RENAMED, snap=serving)[0].match_type != "exact-substance name"
+    assert client.post("/reload").json() == {"reloaded": False, "data_version": reload["data_version"]}
+
+
+class StopWatching(Exception):
+    pass
+
+
+def test_watcher_retries_until_the_workbook_reloads(backend, workbook, edited_workbook, monkeypatch):
+    serving = backend.snapshot
+    raw = workbook.read_bytes()
+    mtime = os.stat(workbook).st_mtime
+    steps = [
+        lambda: write(workbook, raw[:len(raw) // 2], mtime + 1),  # the watcher sees a half-written save...
+        lambda: None,  # ...fails to load it, and tries again on the next tick
+        lambda: write(workbook, edited_workbook, mtime + 1),  # the save completes within the same second
+    ]
+    snapshots = []
+
+    def tick(seconds):
+        snapshots.append(backend.snapshot)
+        if not steps:
+            raise StopWatching
+        steps.pop(0)()
+
+    monkeypatch.setattr(backend.time, "sleep", tick)
+    with pytest.raises(StopWatching):
+        backend._watch_workbook(0.01)
+    assert snapshots[:3] == [serving] * 3
+    assert snapshots[3] is not serving
+    assert backend.snapshot.index.lookup_name("zz reloaded fentanyl") == [FENTANYL]
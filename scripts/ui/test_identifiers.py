@@ -0,0 +1,166 @@
+"""
+Pins the CAS number and chemical-name canonicalization the exact-match
+indexes are keyed on (cas_number.py, chemical_names.py, lookup_index.py).
+
+    cd scripts/ui && python -m pytest -q test_identifiers.py
+"""
+from collections import defaultdict
+
+import pytest
+
+from cas_number import CasNumber, check_digit, find_cas, is_valid_cas, near_cas, parse_cas
+from chemical_names import canonical_name
+from lookup_index import cas_key, literal_first, literal_key, normalize_key, split_keys
+from sqlite_store import SqliteStore, build_store
+
+
+# ---------- CAS numbers ----------
+@pytest.mark.parametrize("text", [
+    "50-00-0",
+    "50000",
+    "0000050-00-0",  # leading zeros
+    "00050000",
+    "50‐00‐0",  # U+2010 hyphen
+    "50–00–0",  # en dash
+    "50−00−0",  # minus sign
+    "50 00 0",
+    " CAS 50-00-0 ",
+    "CAS RN: 50-00-0",
+    "'50-00-0'",
+])
+def test_parse_cas_canonicalizes(text):
+    assert parse_cas(text) == CasNumber("50-00-0", True)
+
+
+@pytest.mark.parametrize("text", [None, "", "1234", "50-0-0", "12345678901-00-0", "formaldehyde", "50-00-0x"])
+def test_parse_cas_rejects_non_cas(text):
+    assert parse_cas(text) is None
+
+
+def test_check_digit():
+    assert check_digit("5000") == 0
+    assert check_digit("773218") == 5
+    assert parse_cas("7732-18-5").valid
+
+
+def test_wrong_check_digit_is_parsed_but_invalid():
+    cas = parse_cas("50-00-1")
+    assert cas == CasNumber("50-00-1", False)
+    assert not is_valid_cas("50-00-1")
+
+
+def test_wrong_check_digit_goes_to_near_cas():
+    candidates = near_cas(parse_cas("50-00-1"))
+    assert candidates[0] == ("50-00-0", 95)  # corrected check digit first
+    assert all(parse_cas(candidate).valid for candidate, _ in candidates)
+
+
+def test_near_cas_ranks_swapped_digits_above_other_typos():
+    candidates = dict(near_cas(parse_cas("7732-81-5")))
+    assert candidates["7732-18-5"] == 90
+    assert max(candidates.values()) == 95
+    assert len(candidates) <= 100
+
+
+def test_is_valid_cas_strict_needs_hyphens():
+    assert is_valid_cas("50000")
+    assert not is_valid_cas("50000", strict=True)
+    assert is_valid_cas("50-00-0", strict=True)
+
+
+def test_find_cas():
+    assert find_cas(["Formalin", "50000", "0050-00-0"]) == "50-00-0"
+    assert find_cas(["Formalin", "50-00-1"], "N/A") == "N/A"
+    assert find_cas([None, 50000]) is None
+
+
+def test_cas_key():
+    assert cas_key("0000050-00-0") == "50-00-0"
+    assert cas_key("Formaldehyde") == "formaldehyde"
+
+
+# ---------- Chemical names ----------
+@pytest.mark.parametrize("texts, canonical", [
+    (["(2-Bromoethyl)Benzene", "(2-bromoethyl)-benzene", "(2-bromoethyl) benzene", "[2-bromoethyl]benzene",
+      "Benzene, (2-bromoethyl)-"], "(2-bromoethyl)benzene"),
+    (["α-Methylfentanyl", "alpha‐methylfentanyl"], "alpha methylfentanyl"),
+    (["Δ9-THC", "delta-9-THC"], "delta9-thc"),
+    (["Ketamine, (S)-", "(S)-Ketamine", "ketamine (S)"], "(s)ketamine"),
+    (["(+/-)-Ketamine", "(±)-ketamine"], "(±)ketamine"),
+    (["Acetyl-fentanyl", "acetyl  fentanyl"], "acetyl fentanyl"),
+    (["Benzene, 1,2-dichloro-"], "1,2-dichlorobenzene"),
+])
+def test_canonical_name_docstring_examples(texts, canonical):
+    assert [canonical_name(text) for text in texts] == [canonical] * len(texts)
+
+
+@pytest.mark.parametrize("text, canonical", [
+    ("Fentanyl", "fentanyl"),
+    ("  carfentanil   citrate ", "carfentanil citrate"),
+    ("PB-22,", "pb-22"),
+    ("2,2'-Azobis(2-methylpropanenitrile)", "2,2'-azobis(2-methylpropanenitrile)"),
+])
+def test_canonical_name(text, canonical):
+    assert canonical_name(text) == canonical
+
+
+def test_literal_first_prefers_the_query_spelling():
+    bucket = [("138", "PB-22,"), ("139", "PB-22,"), ("138", "pb-22")]
+    assert literal_first(bucket, "PB-22") == [("138", "pb-22"), ("138", "PB-22,"), ("139", "PB-22,")]
+    assert literal_first(bucket, None) == bucket
+
+
+def test_split_keys_only_flags_spellings_of_different_substances():
+    spellings = [("china white", "China White", "7"), ("china white", "China-White", "670"),
+                 ("pb-22", "PB-22", "138"), ("pb-22", "pb-22", "138"), ("pb-22", "PB-22,", "138")]
+    assert split_keys(spellings) == {"china white"}
+
+
+# ---------- Exact-match buckets of the workbook ----------
+@pytest.fixture(scope="module")
+def sqlite_store(data_model, tmp_path_factory):
+    path = tmp_path_factory.mktemp("store") / "data_model.sqlite"
+    build_store(path, data_model)
+    return SqliteStore(path)
+
+
+@pytest.mark.parametrize("backend_name", ["memory", "sqlite"])
+def test_canonical_keys_never_merge_different_substances(snapshot, sqlite_store, backend_name):
+    """Every name or synonym in the workbook finds exactly the substances it is linked to there."""
+    index = snapshot.index
+    linked = defaultdict(set)  # literal spelling -> Substance_Reference_IDs
+    for ref_id, reference in index.references.items():
+        linked[reference["Substance_Name"]].add(ref_id)
+    for entries in index.synonyms.values():
+        for ref_id, synonym in entries:
+            if ref_id != "Not Available":
+                linked[synonym].add(ref_id)
+    by_literal = defaultdict(set)
+    for spelling, ref_ids in linked.items():
+        by_literal[literal_key(spelling)] |= ref_ids
+
+    lookups = index if backend_name == "memory" else sqlite_store
+    merged = []
+    for spelling in linked:
+        key = normalize_key(spelling)
+        found = set(lookups.lookup_name(key, spelling))
+        found |= {ref_id for ref_id, _ in lookups.lookup_synonym(key, spelling) if ref_id != "Not Available"}
+        if found != by_literal[literal_key(spelling)]:
+            merged.append((spelling, sorted(found - by_literal[literal_key(spelling)])))
+    assert merged == []
+
+
+@pytest.mark.parametrize("spelling, other", [
+    ("China-White", "China White"),
+    ("Phenyl-ethanol", "Phenyl ethanol"),
+    ("UR-144;", "UR-144"),
+    ("PB-22,", "PB-22"),
+])
+def test_reported_collisions_stay_apart(snapshot, spelling, other):
+    index = snapshot.index
+    assert normalize_key(spelling) == normalize_key(other) and normalize_key(spelling) in index.split
+
+    def ids(text):
+        return {ref_id for ref_id, _ in index.lookup_synonym(normalize_key(text), text)} | \
+            set(index.lookup_name(normalize_key(text), text))
+    assert ids(spelling) != ids(other)
@@ -0,0 +1,107 @@
+"""
+The /match result cache (match_cache.py): LRU and TTL eviction, and dropping
+every entry once a reload or curation edit changes the data version.
+
+    cd scripts/ui && python -m pytest -q test_match_cache.py
+"""
+import pytest
+
+import match_cache
+from match_cache import MatchCache
+
+FENTANYL = "436"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(match_cache.time, "monotonic", clock)
+    return clock
+
+
+# ---------- MatchCache ----------
+def test_least_recently_used_entry_is_evicted_first():
+    cache = MatchCache(max_entries=2, ttl_seconds=60)
+    cache.put("v1", "a", 1)
+    cache.put("v1", "b", 2)
+    assert cache.get("v1", "a") == 1  # "b" is now the least recently used
+    cache.put("v1", "c", 3)
+    assert cache.get("v1", "b") is None
+    assert (cache.get("v1", "a"), cache.get("v1", "c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1 and cache.stats()["entries"] == 2
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = MatchCache(max_entries=10, ttl_seconds=60)
+    cache.put("v1", "a", 1)
+    clock.now += 59
+    assert cache.get("v1", "a") == 1
+    clock.now += 2
+    assert cache.get("v1", "a") is None
+    assert cache.stats()["entries"] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_a_new_version_drops_every_entry():
+    cache = MatchCache(max_entries=10, ttl_seconds=60)
+    cache.put("v1", "a", 1)
+    cache.put("v1", "b", 2)
+    assert cache.get("v2", "a") is None
+    assert cache.stats()["version"] == "v2" and cache.stats()["entries"] == 0
+    cache.put("v2", "a", 3)
+    assert cache.get("v1", "a") is None  # an old-version lookup never sees newer results either
+
+
+def test_size_zero_disables_the_cache():
+    cache = MatchCache(max_entries=0)
+    cache.put("v1", "a", 1)
+    assert cache.get("v1", "a") is None and cache.stats()["entries"] == 0
+
+
+# ---------- /match served from the cache ----------
+def match_types(client, query):
+    return [(result["match_type"], result["substance_reference_id"])
+            for result in client.get("/match", params={"query": query}).json()]
+
+
+def cache_stats(client):
+    return client.get("/cache/stats").json()["match"]
+
+
+def test_edit_invalidates_cached_matches(client):
+    query = "Zz cache probe"
+    before = match_types(client, query)
+    hits = cache_stats(client)["hits"]
+    assert match_types(client, query) == before
+    assert cache_stats(client)["hits"] == hits + 1
+    assert ("exact-synonym", FENTANYL) not in before
+
+    version = client.post("/synonyms/records", json={"substance_reference_id": FENTANYL,
+                                                     "synonym": query}).json()["data_version"]
+    try:
+        assert match_types(client, query)[0] == ("exact-synonym", FENTANYL)
+        assert cache_stats(client)["version"] == version
+    finally:
+        client.delete("/synonyms/records", params={"substance_reference_id": FENTANYL, "synonym": query})
+    assert match_types(client, query) == before
+
+
+def test_reload_invalidates_cached_matches(client):
+    assert match_types(client, "Fentanyl")[0] == ("exact-substance name", FENTANYL)
+    assert cache_stats(client)["entries"] > 0
+
+    reload = client.post("/reload", params={"force": True}).json()
+    assert reload["reloaded"] is True
+    stats = cache_stats(client)
+    assert stats["entries"] == 0 and stats["version"] == reload["data_version"]
+    misses = stats["misses"]
+    assert match_types(client, "Fentanyl")[0] == ("exact-substance name", FENTANYL)
+    assert cache_stats(client)["misses"] == misses + 1